@@ -0,0 +1,6 @@
+"""
+Benchmarks for the quiz workflow.
+
+Run from the project directory, e.g. ``python -m benchmarks.query_plans``.
+Each benchmark works on a throwaway test database, never on db.sqlite3.
+"""
@@ -0,0 +1,69 @@
+"""
+Cohort certificate throughput (certificates per second) by render pool size.
+
+    python -m benchmarks.certificates --students 300 --workers 0 1 2 4 --json certs.json
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from .common import setup_django, temporary_database, write_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=15, help="questions in the quiz")
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, os.cpu_count() or 4],
+                        help="pool sizes to compare; 0 renders in the calling process")
+    parser.add_argument('--json', help="write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import override_settings
+
+    from benchmarks.seed import seed
+    from quizapp.certificates import CertificateRenderer
+    from quizapp.cohorts import render_cohort_timed, stream_cohort_zip
+    from quizapp.models import Quiz
+
+    report = {'dataset': vars(args), 'runs': []}
+    with temporary_database():
+        # One quiz, one attempt per student
+        seed(args.students, 1, args.questions, args.students)
+        quiz = Quiz.objects.get()
+
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as spool, override_settings(CERTIFICATE_DIR=spool):
+                renderer = CertificateRenderer(workers)
+                try:
+                    count, seconds = render_cohort_timed(quiz, renderer=renderer)
+                    # Second pass is served from disk
+                    _, cached_seconds = render_cohort_timed(quiz, renderer=renderer)
+                    start = time.perf_counter()
+                    zip_bytes = sum(len(chunk) for chunk in stream_cohort_zip(quiz, renderer=renderer))
+                    zip_seconds = time.perf_counter() - start
+                finally:
+                    renderer.shutdown()
+            report['runs'].append({
+                'workers': workers,
+                'certificates': count,
+                'render_seconds': round(seconds, 3),
+                'certificates_per_second': round(count / seconds, 1) if seconds else None,
+                'cached_seconds': round(cached_seconds, 3),
+                'zip_seconds': round(zip_seconds, 3),
+                'zip_bytes': zip_bytes,
+            })
+
+    write_report(report, args.json)
+    for run in report['runs']:
+        print(
+            f"workers={run['workers']:<3} {run['certificates']:5} certificates"
+            f"  {run['certificates_per_second']:8} /s  cached {run['cached_seconds']:.3f}s"
+            f"  zip {run['zip_seconds']:.3f}s ({run['zip_bytes']} bytes)"
+        )
+
+
+if __name__ == '__main__':
+    main()
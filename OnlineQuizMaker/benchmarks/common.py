@@ -0,0 +1,73 @@
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizproject.settings')
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def temporary_database(verbosity=0):
+    """Create a fully migrated throwaway database for the default alias"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def timed(func, repeat=20):
+    """Run func repeatedly and return the median wall time in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Nearest-rank percentiles of samples, as {'p50': ..., ...}"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{point}': None for point in points}
+    return {
+        f'p{point}': ordered[max(0, -(-point * len(ordered) // 100) - 1)]
+        for point in points
+    }
+
+
+def git_revision():
+    """Short hash of the checked-out commit, or None outside a git tree"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(report, path=None):
+    text = json.dumps(report, indent=2, default=str)
+    if path:
+        Path(path).write_text(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,161 @@
+"""
+Write throughput of concurrent take_quiz submissions, with and without the
+database profile's tuning.
+
+    python -m benchmarks.concurrency --submitters 1 4 8 --seconds 5 --json concurrency.json
+    QUIZ_DATABASE=postgres python -m benchmarks.concurrency
+
+Submitters are separate processes, like web workers, each opening the quiz
+and posting a graded attempt for its own user against a throwaway database
+file; only the submissions are timed. On SQLite the
+untuned profile is Django's stock setup (rollback journal, deferred
+transactions, 5 s lock timeout); on PostgreSQL it opens a connection per
+request (CONN_MAX_AGE=0).
+"""
+import argparse
+import copy
+import multiprocessing
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from .common import git_revision, percentiles, setup_django, temporary_database, write_report
+
+
+def profiles(vendor):
+    """(name, settings_dict changes, SQLITE_PRAGMAS) to compare on this database"""
+    from django.conf import settings
+
+    if vendor == 'sqlite':
+        return [
+            ('sqlite-default', {'OPTIONS': {}}, {}),
+            ('sqlite-tuned', {}, settings.SQLITE_PRAGMAS),
+        ]
+    return [
+        ('postgres-no-persistent', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}, {}),
+        ('postgres-persistent', {}, {}),
+    ]
+
+
+def submitter(user_id, quiz_id, question_ids, seconds, seed, results):
+    """Post graded attempts until the time is up; runs in a child process"""
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connections
+    from django.test import Client
+    from django.urls import reverse
+
+    rng = random.Random(seed)
+    client = Client()
+    client.force_login(User.objects.get(pk=user_id))
+    url = reverse('take_quiz', args=[quiz_id])
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        answers = {f'question_{question_id}': str(rng.randint(1, 4)) for question_id in question_ids}
+        try:
+            # Opening the quiz starts the attempt session the submission is graded through
+            answers['session_id'] = str(client.get(url).context['session'].pk)
+        except OperationalError:
+            errors += 1
+            continue
+        start = time.perf_counter()
+        try:
+            ok = client.post(url, answers).status_code == 200
+        except OperationalError:
+            # "database is locked" on SQLite
+            ok = False
+        if ok:
+            latencies.append((time.perf_counter() - start) * 1000)
+        else:
+            errors += 1
+    connections.close_all()
+    results.put((latencies, errors))
+
+
+def run(submitters, seconds, user_ids, quiz_id, question_ids):
+    from django.db import connections
+
+    from quizapp.models import QuizAttempt
+
+    before = QuizAttempt.objects.count()
+    # Children must open their own connections, never share the parent's
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [
+        context.Process(target=submitter, args=(user_ids[i], quiz_id, question_ids, seconds, i, results))
+        for i in range(submitters)
+    ]
+    for worker in workers:
+        worker.start()
+    latencies, errors = [], 0
+    for _ in workers:
+        worker_latencies, worker_errors = results.get()
+        latencies += worker_latencies
+        errors += worker_errors
+    for worker in workers:
+        worker.join()
+
+    saved = QuizAttempt.objects.count() - before
+    return {
+        'submitters': submitters,
+        'submissions': len(latencies),
+        'saved_attempts': saved,
+        'errors': errors,
+        'submissions_per_second': round(len(latencies) / seconds, 1),
+        **{key: round(value, 2) if value is not None else None for key, value in percentiles(latencies).items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--submitters', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=5.0, help="how long each run posts for")
+    parser.add_argument('--questions', type=int, default=15, help="questions in the quiz")
+    parser.add_argument('--json', help="write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connections
+    from django.test.utils import override_settings
+
+    from benchmarks.seed import seed
+    from quizapp.answer_keys import get_answer_key
+
+    default = connections.settings['default']
+    original = copy.deepcopy(default)
+    report = {'revision': git_revision(), 'vendor': connections['default'].vendor, 'dataset': vars(args), 'profiles': {}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, changes, pragmas in profiles(report['vendor']):
+            # Connections are built from this dict, in this process and in
+            # the forked submitters
+            default.clear()
+            default.update(copy.deepcopy(original), **copy.deepcopy(changes))
+            if report['vendor'] == 'sqlite':
+                # A file, so separate processes share it; WAL mode sticks to the file
+                default['TEST'] = dict(default.get('TEST') or {}, NAME=str(Path(workdir) / f'{name}.sqlite3'))
+            connections['default'].close()
+
+            with override_settings(SQLITE_PRAGMAS=pragmas, CERTIFICATE_PRERENDER=False), temporary_database():
+                user_ids, quiz_ids = seed(max(args.submitters), 1, args.questions, 0)
+                question_ids = [question_id for question_id, _ in get_answer_key(quiz_ids[0])]
+                report['profiles'][name] = [
+                    run(submitters, args.seconds, user_ids, quiz_ids[0], question_ids)
+                    for submitters in args.submitters
+                ]
+        default.clear()
+        default.update(original)
+
+    write_report(report, args.json)
+    for name, runs in report['profiles'].items():
+        for result in runs:
+            print(
+                f"{name:24} {result['submitters']:3} submitters  {result['submissions_per_second']:8} /s"
+                f"  p95 {result['p95']} ms  errors {result['errors']}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Scripted load over the quiz workflow, driven through Django's test client.
+
+    python -m benchmarks.load --requests 200 --json load.json
+    python -m benchmarks.load --requests 200 --baseline load.json
+
+Each scenario is requested by randomly picked seeded users against a
+throwaway database. The report has p50/p95/p99 latency, queries per request
+and throughput per scenario, plus the git revision, so a run on one commit
+can be compared with --baseline against a report saved on another.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from .common import git_revision, percentiles, setup_django, temporary_database, write_report
+
+DEMO_TOPICS = ['astronomy', 'cooking', 'databases', 'geography', 'music']
+
+
+class LoadContext:
+    """Seeded ids and one logged-in test client per user"""
+
+    def __init__(self, user_ids, quiz_ids, attempted, demo_quizzes, rng):
+        self.user_ids = user_ids
+        self.quiz_ids = quiz_ids
+        self.attempted = attempted
+        self.demo_quizzes = demo_quizzes
+        self.rng = rng
+        self._clients = {}
+
+    def client(self, user_id=None):
+        from django.contrib.auth.models import User
+        from django.test import Client
+
+        user_id = user_id or self.rng.choice(self.user_ids)
+        if user_id not in self._clients:
+            client = Client()
+            client.force_login(User.objects.get(pk=user_id))
+            self._clients[user_id] = client
+        return self._clients[user_id]
+
+
+# Each scenario does its unmeasured setup and returns the request to time
+
+def home(ctx):
+    client = ctx.client()
+    return lambda: client.get('/')
+
+
+def take_quiz_get(ctx):
+    from django.urls import reverse
+
+    client, url = ctx.client(), reverse('take_quiz', args=[ctx.rng.choice(ctx.quiz_ids)])
+    return lambda: client.get(url)
+
+
+def take_quiz_post(ctx):
+    from django.urls import reverse
+
+    from quizapp.answer_keys import get_answer_key
+
+    client = ctx.client()
+    quiz_id = ctx.rng.choice(ctx.quiz_ids)
+    url = reverse('take_quiz', args=[quiz_id])
+    session = client.get(url).context['session']
+    question_ids = session.question_ids if session and session.question_ids else [
+        question_id for question_id, _ in get_answer_key(quiz_id)
+    ]
+    data = {f'question_{question_id}': str(ctx.rng.randint(1, 4)) for question_id in question_ids}
+    if session:
+        data['session_id'] = str(session.pk)
+    return lambda: client.post(url, data)
+
+
+def leaderboard(ctx):
+    from django.urls import reverse
+
+    client = ctx.client()
+    if ctx.rng.random() < 0.5:
+        url = reverse('leaderboard')
+    else:
+        url = reverse('quiz_leaderboard', args=[ctx.rng.choice(ctx.quiz_ids)])
+    return lambda: client.get(url)
+
+
+def profile(ctx):
+    from django.urls import reverse
+
+    client = ctx.client()
+    return lambda: client.get(reverse('profile'))
+
+
+def save_ai_quiz(ctx):
+    from django.urls import reverse
+
+    client = ctx.client()
+    topic, quiz = ctx.rng.choice(ctx.demo_quizzes)
+    body = json.dumps({'quiz': quiz, 'topic': topic, 'difficulty': 'medium'})
+    return lambda: client.post(reverse('save_ai_quiz'), body, content_type='application/json')
+
+
+def export_certificate(ctx):
+    from django.urls import reverse
+
+    user_id, quiz_id = ctx.rng.choice(ctx.attempted)
+    client = ctx.client(user_id)
+    return lambda: client.get(reverse('export_certificate', args=[quiz_id]))
+
+
+SCENARIOS = {
+    'home': home,
+    'take_quiz_get': take_quiz_get,
+    'take_quiz_post': take_quiz_post,
+    'leaderboard': leaderboard,
+    'profile': profile,
+    'save_ai_quiz': save_ai_quiz,
+    'export_certificate': export_certificate,
+}
+
+
+def demo_quizzes(questions):
+    """Quizzes from the generator's demo mode, so no API is ever called"""
+    from quizapp.ai_quiz_generator import AIQuizGenerator
+
+    # load_dotenv leaves variables that are already set alone
+    os.environ['GOOGLE_API_KEY'] = ''
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator = AIQuizGenerator()
+        return [(topic, generator.generate_quiz(topic, 'medium', questions)) for topic in DEMO_TOPICS]
+
+
+def run_request(request):
+    """Perform one request; returns (milliseconds, queries, status)"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = request()
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = (time.perf_counter() - start) * 1000
+    response.close()
+    return elapsed, len(queries.captured_queries), response.status_code
+
+
+def run_scenario(name, ctx, requests, warmup):
+    scenario = SCENARIOS[name]
+    for _ in range(warmup):
+        run_request(scenario(ctx))
+    latencies, query_counts, errors = [], [], 0
+    for _ in range(requests):
+        elapsed, queries, status = run_request(scenario(ctx))
+        latencies.append(elapsed)
+        query_counts.append(queries)
+        errors += status >= 400
+    total_seconds = sum(latencies) / 1000
+    return {
+        'requests': requests,
+        'errors': errors,
+        **{key: round(value, 2) for key, value in percentiles(latencies).items()},
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'queries_per_request': round(sum(query_counts) / len(query_counts), 2),
+        'max_queries': max(query_counts),
+        'requests_per_second': round(requests / total_seconds, 1) if total_seconds else None,
+    }
+
+
+def compare(report, baseline):
+    """Print each scenario's p95 and queries against a saved report"""
+    for name, run in report['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            print(f"{name:20} p95 {run['p95']:8.2f} ms  (not in baseline)")
+            continue
+        change = (run['p95'] - before['p95']) / before['p95'] * 100 if before['p95'] else 0.0
+        print(
+            f"{name:20} p95 {before['p95']:8.2f} -> {run['p95']:8.2f} ms ({change:+6.1f}%)"
+            f"  queries {before['queries_per_request']:6.2f} -> {run['queries_per_request']:6.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--quizzes', type=int, default=100)
+    parser.add_argument('--questions', type=int, default=15, help="questions per quiz")
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=100, help="measured requests per scenario")
+    parser.add_argument('--warmup', type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--json', help="write the report to this file instead of stdout")
+    parser.add_argument('--baseline', help="a report from an earlier run to compare against")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.test.utils import override_settings
+
+    from benchmarks.seed import seed
+    from quizapp.models import QuizAttempt
+
+    rng = random.Random(args.seed)
+    report = {'revision': git_revision(), 'dataset': vars(args), 'scenarios': {}}
+    with temporary_database() as connection, tempfile.TemporaryDirectory() as spool, \
+            override_settings(CERTIFICATE_DIR=spool, CERTIFICATE_RENDER_WORKERS=0):
+        user_ids, quiz_ids = seed(args.users, args.quizzes, args.questions, args.attempts, rng=rng)
+        # seed() bulk inserts, so rebuild what signals would have maintained
+        for command in ('reconcile_stats', 'rebuild_leaderboards', 'rebuild_search_index'):
+            call_command(command, stdout=io.StringIO())
+        attempted = list(QuizAttempt.objects.values_list('user_id', 'quiz_id').distinct()[:1000])
+        ctx = LoadContext(user_ids, quiz_ids, attempted, demo_quizzes(args.questions), rng)
+
+        report['vendor'] = connection.vendor
+        start = time.perf_counter()
+        for name in args.scenarios:
+            report['scenarios'][name] = run_scenario(name, ctx, args.requests, args.warmup)
+        report['wall_seconds'] = round(time.perf_counter() - start, 2)
+
+    write_report(report, args.json)
+    if args.baseline:
+        compare(report, json.loads(Path(args.baseline).read_text()))
+
+
+if __name__ == '__main__':
+    main()
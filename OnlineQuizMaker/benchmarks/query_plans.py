@@ -0,0 +1,104 @@
+"""
+EXPLAIN QUERY PLAN and timings for the hot access paths, with and without
+the composite indexes from migration 0008.
+
+    python -m benchmarks.query_plans --attempts 200000 --json plans.json
+"""
+import argparse
+from importlib import import_module
+
+from .common import setup_django, temporary_database, timed, write_report
+
+INDEX_MIGRATION = 'quizapp.migrations.0008_access_path_indexes'
+
+
+def access_path_indexes():
+    """(model, index) for every index migration 0008 adds"""
+    from django.apps import apps
+
+    operations = import_module(INDEX_MIGRATION).Migration.operations
+    return [(apps.get_model('quizapp', operation.model_name), operation.index) for operation in operations]
+
+
+def access_paths(quiz_id, user_id):
+    from quizapp.catalog import catalog_queryset
+    from quizapp.models import Question, QuizAttempt
+
+    return {
+        'quiz_leaderboard': QuizAttempt.objects.filter(quiz_id=quiz_id).order_by('-score', 'attempted_at')[:10],
+        'profile_recent_attempts': QuizAttempt.objects.filter(user_id=user_id).order_by('-attempted_at')[:5],
+        'certificate_best_attempt': QuizAttempt.objects.filter(quiz_id=quiz_id, user_id=user_id).order_by('-score', '-attempted_at')[:1],
+        'answer_key': Question.objects.filter(quiz_id=quiz_id).order_by('id').values_list('id', 'correct_option'),
+        'catalog_first_page': catalog_queryset()[:13],
+        'my_quizzes': catalog_queryset().filter(created_by_id=user_id).order_by('-created_at')[:20],
+    }
+
+
+def measure(quiz_id, user_id, repeat):
+    results = {}
+    for name, queryset in access_paths(quiz_id, user_id).items():
+        plan = queryset.explain()
+        results[name] = {
+            'plan': plan.splitlines(),
+            'temp_sort': 'TEMP B-TREE' in plan,
+            'full_scan': any(line.strip(' -|`').startswith('SCAN') for line in plan.splitlines()),
+            'median_ms': round(timed(lambda: list(queryset.all()), repeat), 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--quizzes', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=15, help="questions per quiz")
+    parser.add_argument('--attempts', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', help="write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import Count
+
+    from benchmarks.seed import seed
+    from quizapp.models import QuizAttempt
+
+    with temporary_database() as connection:
+        # Seed the current schema, then take out only the 0008 indexes;
+        # rolling the whole app back would leave seed() without its tables
+        seed(args.users, args.quizzes, args.questions, args.attempts)
+        indexes = access_path_indexes()
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        # The busiest quiz and user are the worst case for each path
+        quiz_id = QuizAttempt.objects.values('quiz_id').annotate(n=Count('id')).order_by('-n')[0]['quiz_id']
+        user_id = QuizAttempt.objects.values('user_id').annotate(n=Count('id')).order_by('-n')[0]['user_id']
+
+        report = {
+            'vendor': connection.vendor,
+            'dataset': vars(args),
+            'before': measure(quiz_id, user_id, args.repeat),
+        }
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        report['after'] = measure(quiz_id, user_id, args.repeat)
+
+    write_report(report, args.json)
+    for name in report['before']:
+        before, after = report['before'][name], report['after'][name]
+        print(
+            f"{name:26} {before['median_ms']:9.3f} ms -> {after['median_ms']:9.3f} ms"
+            f"  sort {before['temp_sort']!s:5} -> {after['temp_sort']!s:5}"
+            f"  scan {before['full_scan']!s:5} -> {after['full_scan']!s:5}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Quiz search latency: the FTS5 index against icontains filters.
+
+    python -m benchmarks.search --quizzes 2000 --questions 50 --json search.json
+"""
+import argparse
+
+from .common import setup_django, temporary_database, timed, write_report
+
+QUERIES = ['photosynthesis', 'quantum optics', 'thermo', 'history of volcanoes', 'benchmark quiz 7']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quizzes', type=int, default=2000)
+    parser.add_argument('--questions', type=int, default=50, help="questions per quiz")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--json', help="write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_django()
+    from benchmarks.seed import seed
+    from quizapp import search
+
+    report = {'dataset': vars(args), 'queries': []}
+    with temporary_database():
+        seed(100, args.quizzes, args.questions, 0)
+        # seed() bulk inserts, so the index is built in one go here
+        report['index_rows'] = search.rebuild()
+        report['rebuild_ms'] = round(timed(search.rebuild, repeat=1), 1)
+
+        for query in QUERIES:
+            terms = search.search_terms(query)
+            fts_ms = timed(lambda: search.search_quizzes(query), args.repeat)
+            scan_ms = timed(lambda: search._search_fallback(terms, None, None, 12), args.repeat)
+            filtered_ms = timed(lambda: search.search_quizzes(query, difficulty='hard'), args.repeat)
+            report['queries'].append({
+                'query': query,
+                'results': len(search.search_quizzes(query)[0]),
+                'fts_ms': round(fts_ms, 2),
+                'fts_hard_only_ms': round(filtered_ms, 2),
+                'icontains_ms': round(scan_ms, 2),
+                'speedup': round(scan_ms / fts_ms, 1) if fts_ms else None,
+            })
+
+    write_report(report, args.json)
+
+
+if __name__ == '__main__':
+    main()
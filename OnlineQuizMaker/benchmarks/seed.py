@@ -0,0 +1,84 @@
+"""Synthetic data seeding with bulk_create"""
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+# Question texts draw from this vocabulary so text search has realistic hits
+TOPIC_WORDS = (
+    'algebra', 'biology', 'chemistry', 'democracy', 'ecology', 'fractions', 'geometry', 'history',
+    'infrared', 'journalism', 'kinetics', 'literature', 'magnetism', 'nutrition', 'optics', 'photosynthesis',
+    'quantum', 'renaissance', 'statistics', 'thermodynamics', 'urbanism', 'volcanoes', 'weather', 'zoology',
+)
+
+
+def bulk_insert(model, rows, batch_size):
+    """bulk_create from an iterable without materializing it all at once"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch)
+
+
+def seed(users=100, quizzes=50, questions_per_quiz=15, attempts=10000, batch_size=2000, rng=None):
+    """
+    Fill the database with synthetic users, quizzes, questions and attempts.
+
+    Rows are inserted with bulk_create, so no signals fire; rebuild the
+    derived tables afterwards if a benchmark reads them.
+    """
+    from quizapp.models import Quiz, Question, QuizAttempt
+
+    rng = rng or random.Random(1234)
+    now = timezone.now()
+
+    # Unusable passwords keep seeding fast; benchmarks log in with force_login
+    User.objects.bulk_create(
+        [User(username=f'bench_user_{i}', password='!') for i in range(users)],
+        batch_size=batch_size,
+    )
+    user_ids = list(User.objects.filter(username__startswith='bench_user_').values_list('id', flat=True))
+
+    Quiz.objects.bulk_create(
+        [
+            Quiz(
+                title=f'Benchmark Quiz {i}',
+                description=f'Synthetic quiz number {i} about topic {i % 17}',
+                difficulty=rng.choice(['easy', 'medium', 'hard']),
+                created_by_id=rng.choice(user_ids),
+            )
+            for i in range(quizzes)
+        ],
+        batch_size=batch_size,
+    )
+    quiz_ids = list(Quiz.objects.filter(title__startswith='Benchmark Quiz ').values_list('id', flat=True))
+
+    questions = (
+        Question(
+            quiz_id=quiz_id,
+            question_text=f'Synthetic question {n} of quiz {quiz_id} about {rng.choice(TOPIC_WORDS)} and {rng.choice(TOPIC_WORDS)}?',
+            option1='Alpha', option2='Beta', option3='Gamma', option4='Delta',
+            correct_option=rng.randint(1, 4),
+            explanation='Synthetic explanation.',
+        )
+        for quiz_id in quiz_ids
+        for n in range(questions_per_quiz)
+    )
+    bulk_insert(Question, questions, batch_size)
+
+    attempt_rows = (
+        QuizAttempt(
+            quiz_id=rng.choice(quiz_ids),
+            user_id=rng.choice(user_ids),
+            score=rng.randint(0, questions_per_quiz),
+            attempted_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+        )
+        for _ in range(attempts)
+    )
+    bulk_insert(QuizAttempt, attempt_rows, batch_size)
+
+    return user_ids, quiz_ids
@@ -0,0 +1,98 @@
+"""
+Worker startup cost: import time and peak RSS of a fresh process that loads
+Django and the URLconf, as a WSGI worker does before its first response.
+
+    python -m benchmarks.startup --compare baseline --repeat 5 --json startup.json
+
+--compare checks out another git revision into a temporary worktree and
+measures it the same way, for a before/after comparison.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from .common import PROJECT_DIR, write_report
+
+HEAVY_MODULES = ('google.generativeai', 'reportlab', 'dotenv')
+
+# Runs in a fresh interpreter inside the project directory being measured
+PROBE = f"""
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import resolve
+resolve('/')
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'import_ms': elapsed * 1000,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+    'heavy_loaded': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def probe(project_dir, repeat):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'quizproject.settings', 'PYTHONDONTWRITEBYTECODE': '1'}
+    # The first run warms the bytecode and file system caches
+    runs = []
+    for _ in range(repeat + 1):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE], cwd=project_dir, env=env,
+            capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    runs = runs[1:]
+    return {
+        'median_import_ms': round(statistics.median(run['import_ms'] for run in runs), 1),
+        'median_max_rss_mb': round(statistics.median(run['max_rss_kb'] for run in runs) / 1024, 1),
+        'modules': runs[-1]['modules'],
+        'heavy_loaded': runs[-1]['heavy_loaded'],
+    }
+
+
+def probe_revision(revision, repeat):
+    repo = Path(subprocess.run(
+        ['git', 'rev-parse', '--show-toplevel'], cwd=PROJECT_DIR, capture_output=True, text=True, check=True,
+    ).stdout.strip())
+    subdir = PROJECT_DIR.relative_to(repo)
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = Path(tmp) / 'tree'
+        subprocess.run(['git', 'worktree', 'add', '--detach', str(worktree), revision],
+                       cwd=repo, capture_output=True, check=True)
+        try:
+            return probe(worktree / subdir, repeat)
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', str(worktree)], cwd=repo, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', metavar='REVISION', help="git revision to measure as the 'before' tree")
+    parser.add_argument('--json', help="write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = {'repeat': args.repeat}
+    if args.compare:
+        report['before'] = dict(probe_revision(args.compare, args.repeat), revision=args.compare)
+    report['after'] = probe(PROJECT_DIR, args.repeat)
+
+    write_report(report, args.json)
+    for label in ('before', 'after'):
+        if label in report:
+            run = report[label]
+            print(
+                f"{label:6} {run['median_import_ms']:8.1f} ms  {run['median_max_rss_mb']:6.1f} MB RSS"
+                f"  {run['modules']:5} modules  heavy: {', '.join(run['heavy_loaded']) or 'none'}"
+            )
+
+
+if __name__ == '__main__':
+    main()
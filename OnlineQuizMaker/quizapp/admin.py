@@ -1,7 +1,10 @@
 # Register your models here.
 from django.contrib import admin
-from .models import Quiz, Question, QuizAttempt
+from .models import Quiz, Question, QuizAttempt, SiteStats, GeneratedQuizCacheEntry, QuestionStats
 
 admin.site.register(Quiz)
 admin.site.register(Question)
-admin.site.register(QuizAttempt)
\ No newline at end of file
+admin.site.register(QuizAttempt)
+admin.site.register(SiteStats)
+admin.site.register(GeneratedQuizCacheEntry)
+admin.site.register(QuestionStats)
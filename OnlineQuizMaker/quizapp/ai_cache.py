@@ -0,0 +1,99 @@
+import hashlib
+import json
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GeneratedQuizCacheEntry
+
+
+class QuizResultCache:
+    """
+    Persistent cache of AI-generated quizzes in the database.
+
+    Entries expire after `ttl` seconds; with `serve_stale` an expired entry
+    is still returned (flagged as stale) so the caller can refresh it in the
+    background. Past `max_entries`, the least recently used entries go.
+    """
+
+    def __init__(self, ttl=7 * 24 * 60 * 60, max_entries=1000, serve_stale=True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.serve_stale = serve_stale
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            ttl=settings.AI_CACHE_TTL,
+            max_entries=settings.AI_CACHE_MAX_ENTRIES,
+            serve_stale=settings.AI_CACHE_SERVE_STALE,
+        )
+
+    @staticmethod
+    def make_key(request_key, prompt_version):
+        raw = json.dumps([list(request_key), prompt_version])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _count(self, metric, amount=1):
+        with self._lock:
+            self._metrics[metric] += amount
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        lookups = metrics['hits'] + metrics['stale_hits'] + metrics['misses']
+        metrics['hit_ratio'] = (metrics['hits'] + metrics['stale_hits']) / lookups if lookups else 0.0
+        return metrics
+
+    def get(self, key):
+        """Return (payload, is_fresh), or None on a miss"""
+        entry = GeneratedQuizCacheEntry.objects.filter(key=key).only('payload', 'created_at').first()
+        now = timezone.now()
+        if entry is None:
+            self._count('misses')
+            return None
+
+        fresh = entry.created_at + timedelta(seconds=self.ttl) > now
+        if not fresh and not self.serve_stale:
+            entry.delete()
+            self._count('misses')
+            return None
+
+        GeneratedQuizCacheEntry.objects.filter(pk=entry.pk).update(
+            last_used_at=now, hit_count=F('hit_count') + 1
+        )
+        self._count('hits' if fresh else 'stale_hits')
+        return entry.payload, fresh
+
+    def set(self, key, request_key, prompt_version, payload):
+        topic, difficulty, num_questions = request_key[:3]
+        now = timezone.now()
+        GeneratedQuizCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={
+                'topic': topic[:200],
+                'difficulty': difficulty[:10],
+                'num_questions': num_questions,
+                'prompt_version': prompt_version,
+                'payload': payload,
+                'created_at': now,
+                'last_used_at': now,
+            },
+        )
+        self._count('stores')
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries beyond max_entries"""
+        stale_ids = list(
+            GeneratedQuizCacheEntry.objects.order_by('-last_used_at')
+            .values_list('id', flat=True)[self.max_entries:]
+        )
+        if stale_ids:
+            GeneratedQuizCacheEntry.objects.filter(id__in=stale_ids).delete()
+            self._count('evictions', len(stale_ids))
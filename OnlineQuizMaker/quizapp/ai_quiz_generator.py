@@ -1,15 +1,68 @@
 import os
 import json
-import google.generativeai as genai
+import asyncio
+import copy
+import hashlib
+import re
+import threading
+import weakref
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from dotenv import load_dotenv
+from django.db import close_old_connections
+from .ai_cache import QuizResultCache
+from .ai_streaming import QuestionStreamParser
+from .instrumentation import timed_iter, upstream_call
+
+
+def _genai():
+    """google.generativeai, imported on first use (it is slow to import)"""
+    import google.generativeai as genai
+    return genai
+
+
+class _AsyncState:
+    """Per event loop concurrency limiter and in-flight request table"""
+    def __init__(self, max_concurrent_calls):
+        self.semaphore = asyncio.Semaphore(max_concurrent_calls)
+        self.inflight = {}
+    
+    @contextmanager
+    def thread_slot(self, loop):
+        """Hold one of the loop's call slots from a worker thread"""
+        asyncio.run_coroutine_threadsafe(self.semaphore.acquire(), loop).result()
+        try:
+            yield
+        finally:
+            loop.call_soon_threadsafe(self.semaphore.release)
 
-load_dotenv()
 
 class AIQuizGenerator:
-    def __init__(self):
+    def __init__(self, model=None, max_concurrent_calls=None, result_cache=None):
+        """
+        `model` stands in for genai.GenerativeModel (e.g. a fake in tests);
+        without it the model is configured from GOOGLE_API_KEY.
+        `result_cache` is an optional QuizResultCache for generated quizzes.
+        """
+        self.max_concurrent_calls = max_concurrent_calls or getattr(settings, 'AI_MAX_CONCURRENT_CALLS', 4)
+        self.result_cache = result_cache
+        self.chunk_size = getattr(settings, 'AI_CHUNK_SIZE', 10)
+        self.chunk_workers = getattr(settings, 'AI_CHUNK_WORKERS', 4)
+        self.top_up_rounds = getattr(settings, 'AI_TOP_UP_ROUNDS', 2)
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._loop_states = weakref.WeakKeyDictionary()
+        if model is None:
+            from dotenv import load_dotenv
+            load_dotenv()
         self.api_key = os.getenv('GOOGLE_API_KEY')
-        if self.api_key and self.api_key != 'your_google_ai_studio_key_here':
+        if model is not None:
+            self.model = model
+            self.ai_enabled = True
+        elif self.api_key and self.api_key != 'your_google_ai_studio_key_here':
+            genai = _genai()
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel('gemini-pro')
             self.ai_enabled = True
@@ -17,6 +70,69 @@ class AIQuizGenerator:
             self.ai_enabled = False
             print("⚠️  Google AI API key not found. Using demo mode.")
     
+    def _generation_config(self, max_output_tokens=4000):
+        return _genai().types.GenerationConfig(
+            max_output_tokens=max_output_tokens,
+            temperature=0.7,
+        )
+    
+    @staticmethod
+    def _request_key(topic, difficulty, num_questions, question_type):
+        """Normalized request parameters; equal keys get the same quiz"""
+        return (' '.join(topic.split()).casefold(), difficulty.casefold(), int(num_questions), question_type)
+    
+    def prompt_version(self):
+        """Fingerprint of the _build_prompt template, part of every cache key"""
+        template = self._build_prompt('{topic}', '{difficulty}', 0, '{question_type}')
+        return hashlib.sha256(template.encode()).hexdigest()[:16]
+    
+    def _cache_key(self, request_key):
+        return self.result_cache.make_key(request_key, self.prompt_version())
+    
+    def _cache_lookup(self, topic, difficulty, num_questions, question_type):
+        """Cached quiz for the request or None; stale hits are refreshed in the background"""
+        if self.result_cache is None:
+            return None
+        request_key = self._request_key(topic, difficulty, num_questions, question_type)
+        cached = self.result_cache.get(self._cache_key(request_key))
+        if cached is None:
+            return None
+        quiz_data, fresh = cached
+        if fresh:
+            print(f"💾 BACKEND: Cache hit for '{topic}'")
+        else:
+            print(f"💾 BACKEND: Stale cache hit for '{topic}', refreshing")
+            self._refresh_in_background(topic, difficulty, num_questions, question_type)
+        return quiz_data
+    
+    def _cache_store(self, topic, difficulty, num_questions, question_type, quiz_data):
+        # Demo fallbacks stand in for a failed generation, and a short quiz
+        # means some chunks failed; never keep either
+        if self.result_cache is None or quiz_data.get('demo') or len(quiz_data['questions']) < num_questions:
+            return
+        request_key = self._request_key(topic, difficulty, num_questions, question_type)
+        self.result_cache.set(self._cache_key(request_key), request_key, self.prompt_version(), quiz_data)
+    
+    def _refresh_in_background(self, topic, difficulty, num_questions, question_type):
+        request_key = self._request_key(topic, difficulty, num_questions, question_type)
+        with self._refresh_lock:
+            if request_key in self._refreshing:
+                return
+            self._refreshing.add(request_key)
+        
+        def refresh():
+            try:
+                quiz_data = self._generate_uncached(topic, difficulty, num_questions, question_type)
+                self._cache_store(topic, difficulty, num_questions, question_type, quiz_data)
+            except Exception as e:
+                print(f"❌ BACKEND: Cache refresh failed: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(request_key)
+                close_old_connections()
+        
+        threading.Thread(target=refresh, name='ai-cache-refresh', daemon=True).start()
+    
     def generate_quiz(self, topic, difficulty='medium', num_questions=5, question_type='multiple_choice'):
         """
         Generate quiz questions using Google Gemini AI
@@ -28,17 +144,28 @@ class AIQuizGenerator:
             print(f"📊 BACKEND: Demo mode - Generated {len(quiz_data['questions'])} questions")
             return quiz_data
         
+        cached = self._cache_lookup(topic, difficulty, num_questions, question_type)
+        if cached is not None:
+            return cached
+        
+        quiz_data = self._generate_uncached(topic, difficulty, num_questions, question_type)
+        self._cache_store(topic, difficulty, num_questions, question_type, quiz_data)
+        return quiz_data
+    
+    def _generate_uncached(self, topic, difficulty, num_questions, question_type):
+        """One upstream Gemini call, falling back to demo questions on failure"""
+        if num_questions > self.chunk_size:
+            return self._generate_chunked(topic, difficulty, num_questions, question_type)
+        
         try:
             prompt = self._build_prompt(topic, difficulty, num_questions, question_type)
             print(f"🔍 BACKEND: Sending request to AI for {num_questions} questions...")
             
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=4000,
-                    temperature=0.7,
+            with upstream_call():
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config=self._generation_config()
                 )
-            )
             
             content = response.text
             print(f"📝 BACKEND: Raw AI response received")
@@ -53,8 +180,295 @@ class AIQuizGenerator:
             print(f"📊 BACKEND: Fallback to demo - {len(quiz_data['questions'])} questions")
             return quiz_data
     
-    def _build_prompt(self, topic, difficulty, num_questions, question_type):
-        return f"""
+    def stream_quiz(self, topic, difficulty='medium', num_questions=5, question_type='multiple_choice'):
+        """
+        Generate a quiz and yield events as soon as each part is known.
+        
+        Yields {'type': 'title'}, then one {'type': 'question'} per question
+        as it completes in the model's streamed output (or, for quizzes
+        larger than one chunk, as each chunk call finishes), and finally
+        {'type': 'done', 'quiz': ...} with the whole quiz.
+        """
+        print(f"🎯 BACKEND: Requested {num_questions} questions about '{topic}' (streaming)")
+        
+        if not self.ai_enabled:
+            yield from self._replay_events(self._get_demo_questions(topic, difficulty, num_questions))
+            return
+        
+        cached = self._cache_lookup(topic, difficulty, num_questions, question_type)
+        if cached is not None:
+            yield from self._replay_events(cached)
+            return
+        
+        questions = []
+        seen = set()
+        titles = []
+        
+        def publish(new_questions, title=None):
+            """Events for the questions not seen yet, preceded by the title once"""
+            if title and not titles:
+                titles.append(title)
+            for question in new_questions:
+                fingerprint = self._question_fingerprint(question) if self._is_valid_question(question) else None
+                if fingerprint is None or fingerprint in seen or len(questions) >= num_questions:
+                    continue
+                seen.add(fingerprint)
+                questions.append(question)
+                if len(questions) == 1:
+                    yield {'type': 'title', 'quiz_title': self._quiz_title(titles, topic, difficulty)}
+                yield {'type': 'question', 'index': len(questions) - 1, 'question': question}
+        
+        if num_questions > self.chunk_size:
+            # One call per chunk; each chunk's questions go out as soon as it finishes
+            sizes = self._chunk_sizes(num_questions)
+            print(f"🧩 BACKEND: Streaming {num_questions} questions as {len(sizes)} chunks")
+            for _, (title, chunk_questions) in self._run_chunks(topic, difficulty, sizes, question_type):
+                yield from publish(chunk_questions, title)
+        else:
+            parser = QuestionStreamParser()
+            try:
+                prompt = self._build_prompt(topic, difficulty, num_questions, question_type)
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config=self._generation_config(),
+                    stream=True
+                )
+                for chunk in timed_iter(response):
+                    yield from publish(parser.feed(chunk.text), parser.title)
+            except Exception as e:
+                print(f"❌ BACKEND: AI Streaming Error: {e}")
+            parser.close()
+        
+        # Ask only for what is still missing instead of starting over
+        for _ in range(self.top_up_rounds):
+            missing = num_questions - len(questions)
+            if not questions or missing <= 0:
+                break
+            print(f"➕ BACKEND: Topping up {missing} missing questions")
+            avoid = [question['question_text'] for question in questions]
+            for _, (_, extra) in self._run_chunks(topic, difficulty, self._chunk_sizes(missing), question_type, avoid=avoid):
+                yield from publish(extra)
+        
+        if not questions:
+            # Nothing usable was generated; replace it all with demo questions
+            yield from self._replay_events(self._get_demo_questions(topic, difficulty, num_questions))
+            return
+        
+        quiz_data = {
+            "quiz_title": self._quiz_title(titles, topic, difficulty),
+            "questions": questions
+        }
+        if len(questions) == num_questions:
+            self._cache_store(topic, difficulty, num_questions, question_type, quiz_data)
+        print(f"✅ BACKEND: Streamed {len(questions)} questions")
+        yield {'type': 'done', 'quiz': quiz_data}
+    
+    @staticmethod
+    def _quiz_title(titles, topic, difficulty):
+        return titles[0] if titles else f"{topic.title()} Quiz - {difficulty.title()}"
+    
+    @staticmethod
+    def _replay_events(quiz_data):
+        """Stream events for a quiz that is already complete"""
+        yield {'type': 'title', 'quiz_title': quiz_data['quiz_title']}
+        for index, question in enumerate(quiz_data['questions']):
+            yield {'type': 'question', 'index': index, 'question': question}
+        yield {'type': 'done', 'quiz': quiz_data}
+    
+    async def agenerate_quiz(self, topic, difficulty='medium', num_questions=5, question_type='multiple_choice'):
+        """
+        Async version of generate_quiz for ASGI views.
+        
+        Concurrent identical requests share one upstream call, and at most
+        max_concurrent_calls calls are outstanding per event loop.
+        """
+        print(f"🎯 BACKEND: Requested {num_questions} questions about '{topic}' (async)")
+        
+        if not self.ai_enabled:
+            return self._get_demo_questions(topic, difficulty, num_questions)
+        
+        if self.result_cache is not None:
+            cached = await sync_to_async(self._cache_lookup)(topic, difficulty, num_questions, question_type)
+            if cached is not None:
+                return cached
+        
+        state = self._async_state()
+        key = self._request_key(topic, difficulty, num_questions, question_type)
+        task = state.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._agenerate(state, topic, difficulty, num_questions, question_type))
+            state.inflight[key] = task
+            task.add_done_callback(lambda _: state.inflight.pop(key, None))
+        else:
+            print(f"🔗 BACKEND: Joined in-flight request for '{topic}'")
+        
+        # Shield so one client disconnecting doesn't cancel the shared call
+        quiz_data = await asyncio.shield(task)
+        return copy.deepcopy(quiz_data)
+    
+    def _async_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loop_states.get(loop)
+        if state is None:
+            state = self._loop_states[loop] = _AsyncState(self.max_concurrent_calls)
+        return state
+    
+    async def _agenerate(self, state, topic, difficulty, num_questions, question_type):
+        try:
+            prompt = self._build_prompt(topic, difficulty, num_questions, question_type)
+            if num_questions > self.chunk_size:
+                # Every chunk call takes its own slot, so parallel chunks
+                # count against max_concurrent_calls too
+                loop = asyncio.get_running_loop()
+                quiz_data = await asyncio.to_thread(
+                    self._generate_chunked, topic, difficulty, num_questions, question_type,
+                    slot=lambda: state.thread_slot(loop),
+                )
+            else:
+                async with state.semaphore:
+                    print(f"🔍 BACKEND: Sending async request to AI for {num_questions} questions...")
+                    response = await self._call_model_async(prompt)
+                quiz_data = self._parse_response(response.text, topic, difficulty, num_questions)
+            print(f"✅ BACKEND: Final quiz has {len(quiz_data['questions'])} questions")
+            
+        except Exception as e:
+            print(f"❌ BACKEND: AI Generation Error: {e}")
+            return self._get_demo_questions(topic, difficulty, num_questions)
+        
+        if self.result_cache is not None:
+            await sync_to_async(self._cache_store)(topic, difficulty, num_questions, question_type, quiz_data)
+        return quiz_data
+    
+    async def _call_model_async(self, prompt):
+        generate_async = getattr(self.model, 'generate_content_async', None)
+        with upstream_call():
+            if generate_async is not None:
+                return await generate_async(prompt, generation_config=self._generation_config())
+            # Models without an async API run on a worker thread
+            return await asyncio.to_thread(
+                self.model.generate_content, prompt, generation_config=self._generation_config()
+            )
+    
+    def _chunk_sizes(self, num_questions):
+        chunks = [self.chunk_size] * (num_questions // self.chunk_size)
+        if num_questions % self.chunk_size:
+            chunks.append(num_questions % self.chunk_size)
+        return chunks
+    
+    def _generate_chunked(self, topic, difficulty, num_questions, question_type, slot=nullcontext):
+        """
+        Generate a large quiz as several smaller calls run in parallel.
+        
+        Valid questions from every chunk are kept and deduplicated, and only
+        the shortfall is requested again (also split into chunks), instead of
+        discarding a whole response whose count is off. `slot()` is entered
+        around each call (e.g. a concurrency limit shared with other requests).
+        """
+        sizes = self._chunk_sizes(num_questions)
+        print(f"🧩 BACKEND: Splitting {num_questions} questions into {len(sizes)} chunks")
+        
+        chunks = [chunk for _, chunk in sorted(self._run_chunks(topic, difficulty, sizes, question_type, slot=slot))]
+        titles = [title for title, _ in chunks if title]
+        questions = self._merge_questions([chunk_questions for _, chunk_questions in chunks])
+        
+        for _ in range(self.top_up_rounds):
+            missing = num_questions - len(questions)
+            if missing <= 0:
+                break
+            print(f"➕ BACKEND: Topping up {missing} missing questions")
+            avoid = [question['question_text'] for question in questions]
+            extra = self._run_chunks(topic, difficulty, self._chunk_sizes(missing), question_type, avoid=avoid, slot=slot)
+            questions = self._merge_questions([questions] + [chunk_questions for _, (_, chunk_questions) in extra])
+        
+        if not questions:
+            return self._get_demo_questions(topic, difficulty, num_questions)
+        
+        return {
+            "quiz_title": self._quiz_title(titles, topic, difficulty),
+            "questions": questions[:num_questions]
+        }
+    
+    def _run_chunks(self, topic, difficulty, sizes, question_type, avoid=None, slot=nullcontext):
+        """
+        One parallel call per chunk size, yielding (index, (title, questions))
+        as each call finishes. Top-ups pass `avoid` instead of a part number.
+        """
+        pool = ThreadPoolExecutor(max_workers=min(self.chunk_workers, len(sizes)))
+        try:
+            # Each chunk runs in a copy of this context, so its upstream time
+            # is still counted against the request
+            futures = {
+                pool.submit(
+                    contextvars.copy_context().run,
+                    self._generate_chunk, topic, difficulty, size, question_type,
+                    part=None if avoid else (i + 1, len(sizes)), avoid=avoid, slot=slot,
+                ): i
+                for i, size in enumerate(sizes)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # A consumer that stops early (a closed stream) skips chunks not yet started
+            pool.shutdown(cancel_futures=True)
+    
+    def _generate_chunk(self, topic, difficulty, num_questions, question_type, part=None, avoid=None, slot=nullcontext):
+        """One call for part of a quiz; returns (title, valid questions) and never raises"""
+        try:
+            prompt = self._build_prompt(topic, difficulty, num_questions, question_type, part=part, avoid=avoid)
+            with slot(), upstream_call():
+                response = self.model.generate_content(
+                    prompt,
+                    # Roughly 300 tokens per question, so small chunks stay cheap
+                    generation_config=self._generation_config(min(4000, 300 * num_questions + 200))
+                )
+            return self._extract_questions(response.text)
+        except Exception as e:
+            print(f"❌ BACKEND: Chunk generation error: {e}")
+            return None, []
+    
+    @staticmethod
+    def _is_valid_question(question):
+        if not isinstance(question, dict) or not str(question.get('question_text', '')).strip():
+            return False
+        options = question.get('options')
+        answer = question.get('correct_answer')
+        return (
+            isinstance(options, list) and len(options) == 4
+            and isinstance(answer, int) and not isinstance(answer, bool) and 0 <= answer <= 3
+        )
+    
+    def _extract_questions(self, content):
+        """Title and every well-formed question in a response, whatever the count"""
+        start = content.find('{')
+        end = content.rfind('}') + 1
+        if start == -1 or end == 0:
+            return None, []
+        try:
+            data = json.loads(content[start:end])
+        except json.JSONDecodeError:
+            return None, []
+        if not isinstance(data, dict):
+            return None, []
+        questions = [q for q in data.get('questions') or [] if self._is_valid_question(q)]
+        return data.get('quiz_title'), questions
+    
+    @staticmethod
+    def _question_fingerprint(question):
+        return re.sub(r'\W+', ' ', question['question_text']).strip().casefold()
+    
+    def _merge_questions(self, question_lists):
+        merged = []
+        seen = set()
+        for questions in question_lists:
+            for question in questions:
+                fingerprint = self._question_fingerprint(question)
+                if fingerprint not in seen:
+                    seen.add(fingerprint)
+                    merged.append(question)
+        return merged
+    
+    def _build_prompt(self, topic, difficulty, num_questions, question_type, part=None, avoid=None):
+        prompt = f"""
 IMPORTANT: Generate EXACTLY {num_questions} multiple choice questions about "{topic}".
 
 DIFFICULTY: {difficulty}
@@ -87,6 +501,17 @@ DIFFICULTY: {difficulty}
 
 CRITICAL: Generate exactly {num_questions} questions. Do not stop early.
 """
+        if part:
+            prompt += f"""
+This is part {part[0]} of {part[1]} of a larger quiz. Cover aspects of the topic that other parts are unlikely to, so questions do not repeat.
+"""
+        if avoid:
+            existing = "\n".join(f"- {text}" for text in avoid)
+            prompt += f"""
+Do NOT repeat any of these existing questions:
+{existing}
+"""
+        return prompt
     
     def _parse_response(self, content, topic, difficulty, num_questions):
         """Parse AI response and validate structure"""
@@ -281,8 +706,25 @@ CRITICAL: Generate exactly {num_questions} questions. Do not stop early.
         
         return {
             "quiz_title": f"{topic.title()} Quiz - {difficulty.title()}",
-            "questions": questions
+            "questions": questions,
+            "demo": True  # Marks a fallback, so it is never cached as a real result
         }
 
-# Singleton instance
-ai_generator = AIQuizGenerator()
\ No newline at end of file
+_ai_generator = None
+_ai_generator_lock = threading.Lock()
+
+
+def get_ai_generator():
+    """
+    The shared generator, created on first use.
+
+    Building it loads .env, imports google.generativeai and configures the
+    client, so workers that never generate a quiz never pay for any of it.
+    """
+    global _ai_generator
+    with _ai_generator_lock:
+        if _ai_generator is None:
+            _ai_generator = AIQuizGenerator(
+                result_cache=QuizResultCache.from_settings() if getattr(settings, 'AI_CACHE_ENABLED', False) else None
+            )
+        return _ai_generator
\ No newline at end of file
@@ -0,0 +1,77 @@
+import json
+import re
+
+QUESTIONS_ARRAY = re.compile(r'"questions"\s*:\s*\[')
+QUIZ_TITLE = re.compile(r'"quiz_title"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+class QuestionStreamParser:
+    """
+    Incrementally pull question objects out of a streamed JSON quiz.
+
+    Text is fed in as it arrives; each call returns the question objects
+    inside the "questions" array that became complete with that text, so
+    they can be shown before the rest of the response has been generated.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.title = None
+        self.finished = False
+        self._pos = None  # scan position once inside the questions array
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+
+    def _find_title(self, text):
+        match = QUIZ_TITLE.search(text)
+        if match and self.title is None:
+            try:
+                self.title = json.loads(f'"{match.group(1)}"')
+            except ValueError:
+                pass
+
+    def feed(self, text):
+        self.buffer += text
+        if self._pos is None:
+            match = QUESTIONS_ARRAY.search(self.buffer)
+            if not match:
+                return []
+            self._find_title(self.buffer[:match.start()])
+            self._pos = match.end()
+
+        questions = []
+        buffer = self.buffer
+        while self._pos < len(buffer) and not self.finished:
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        questions.append(json.loads(buffer[self._object_start:self._pos + 1]))
+                    except ValueError:
+                        pass
+                    self._object_start = None
+            elif char == ']' and self._depth == 0:
+                self.finished = True
+            self._pos += 1
+        return questions
+
+    def close(self):
+        """Pick up a title that came after the questions array"""
+        if self.title is None:
+            self._find_title(self.buffer)
@@ -0,0 +1,116 @@
+"""AI quiz generation views; the Gemini client loads on the first request that needs it"""
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+import json
+from .models import Quiz
+from .ai_quiz_generator import get_ai_generator
+from .bulk import DIFFICULTIES, TITLE_MAX_LENGTH, PayloadError, create_quiz_with_questions, question_from_ai, read_json_body
+
+
+def ai_quiz_generator_page(request):
+    """Render AI quiz generator page"""
+    return render(request, 'ai_quiz_generator.html')
+
+async def generate_ai_quiz(request):
+    """API endpoint to generate quiz using AI (async, so ASGI workers aren't held)"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            topic = data.get('topic', '').strip()
+            difficulty = data.get('difficulty', 'medium')
+            num_questions = int(data.get('num_questions', 5))
+            
+            print(f"🎯 VIEWS: Request received - {num_questions} questions about '{topic}'")
+            
+            if not topic:
+                return JsonResponse({'error': 'Topic is required'}, status=400)
+            
+            # Generate quiz using AI
+            ai_quiz = await get_ai_generator().agenerate_quiz(topic, difficulty, num_questions)
+            
+            # Double-check we have the right number of questions
+            actual_questions = len(ai_quiz.get('questions', []))
+            print(f"✅ VIEWS: Sending {actual_questions} questions to frontend")
+            
+            return JsonResponse({
+                'success': True,
+                'quiz': ai_quiz,
+                'generated_questions': actual_questions,
+                'requested_questions': num_questions
+            })
+            
+        except Exception as e:
+            print(f"❌ VIEWS: Error: {e}")
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Only POST requests allowed'}, status=405)
+def stream_ai_quiz(request):
+    """Streaming variant of generate_ai_quiz: NDJSON events as questions are produced"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST requests allowed'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        topic = data.get('topic', '').strip()
+        difficulty = data.get('difficulty', 'medium')
+        num_questions = int(data.get('num_questions', 5))
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if not topic:
+        return JsonResponse({'error': 'Topic is required'}, status=400)
+    
+    events = get_ai_generator().stream_quiz(topic, difficulty, num_questions)
+    response = StreamingHttpResponse(
+        (json.dumps(event) + '\n' for event in events),
+        content_type='application/x-ndjson'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx hold events back
+    return response
+
+def save_ai_quiz(request):
+    """Save AI-generated quiz to database"""
+    if request.method == 'POST' and request.user.is_authenticated:
+        try:
+            data = read_json_body(request, settings.AI_QUIZ_MAX_PAYLOAD_BYTES)
+            if not isinstance(data, dict) or not isinstance(data.get('quiz'), dict):
+                raise PayloadError("'quiz' must be an object")
+            quiz_data = data['quiz']
+            topic = data.get('topic', 'general knowledge')
+            difficulty = data.get('difficulty', 'medium')
+            if difficulty not in DIFFICULTIES:
+                raise PayloadError(f"Unknown difficulty '{difficulty}'")
+            
+            title = quiz_data.get('quiz_title')
+            if not isinstance(title, str) or not title.strip():
+                raise PayloadError("'quiz_title' is required")
+            q_list = quiz_data.get('questions')
+            if not isinstance(q_list, list) or not q_list:
+                raise PayloadError("'questions' must be a non-empty list")
+            if len(q_list) > settings.AI_QUIZ_MAX_QUESTIONS:
+                raise PayloadError(f"At most {settings.AI_QUIZ_MAX_QUESTIONS} questions can be saved at once")
+            
+            # Validate everything before touching the database
+            questions = [question_from_ai(q_data, index) for index, q_data in enumerate(q_list)]
+            quiz = Quiz(
+                title=title[:TITLE_MAX_LENGTH],
+                description=f"AI-generated quiz about {topic}",
+                difficulty=difficulty,
+                created_by=request.user
+            )
+            create_quiz_with_questions(quiz, questions)
+            
+            return JsonResponse({
+                'success': True,
+                'quiz_id': quiz.id,
+                'message': 'Quiz saved successfully!'
+            })
+            
+        except PayloadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Authentication required'}, status=401)
@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Question
+
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+def answer_key_cache_key(quiz_id):
+    return f"quizapp:answer_key:{quiz_id}"
+
+
+def get_answer_key(quiz_id):
+    """
+    Return the quiz's answer key as a list of (question_id, correct_option).
+
+    Only the two columns needed for grading are loaded, and the result is
+    kept in the cache until a question of the quiz is saved or deleted.
+    It is read from the primary even in @replica_reads views: a key cached
+    from a lagging replica would grade against old answers until the next
+    question change.
+    """
+    key = answer_key_cache_key(quiz_id)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = list(
+            Question.objects.using(DEFAULT_DB_ALIAS).filter(quiz_id=quiz_id)
+            .order_by('id')
+            .values_list('id', 'correct_option')
+        )
+        cache.set(key, answer_key, ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def invalidate_answer_key(quiz_id):
+    cache.delete(answer_key_cache_key(quiz_id))
+
+
+def grade(answer_key, answers):
+    """Score submitted answers ({'question_<id>': '<option>'}) against a key"""
+    score = 0
+    for question_id, correct_option in answer_key:
+        if answers.get(f'question_{question_id}') == str(correct_option):
+            score += 1
+    return score
+
+
+def grade_compact(answer_key, answers):
+    """Score a compact answer store ({'<question id>': <option>}) against a key"""
+    return sum(1 for question_id, correct_option in answer_key if answers.get(str(question_id)) == correct_option)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class QuizappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quizapp'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks, signals  # noqa: F401
+        from .database import configure_sqlite
+        from .instrumentation import install_query_recorder
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,221 @@
+"""
+Server-side quiz attempt sessions.
+
+Opening a quiz starts an AttemptSession with a server-side deadline. While
+it runs, the page autosaves small batches of answers; they are merged into
+a compact {question id: option} store in the cache, and a timer thread in
+each worker writes sessions with new answers back to the database in
+batches (bulk_update) every ATTEMPT_AUTOSAVE_FLUSH_INTERVAL seconds, so
+autosaves rarely touch the database at all. An autosave whose session's
+database copy is older than ATTEMPT_AUTOSAVE_WRITE_THROUGH_AGE (several
+intervals, so a live timer always gets there first) writes it through
+itself, which bounds how far behind the copy gets if a worker dies before
+its timer fires.
+
+The store must be in a cache shared by all workers (check quizapp.E001),
+so a submission handled by any worker grades the latest answers.
+Submitting grades the stored answers, which keeps the final POST small
+however long the quiz is, and anything that arrives past the deadline
+(plus a short grace for latency) is ignored. The attempt is recorded with
+the session id as its ingest_id: saved in the same transaction as the
+session, or under batched ingestion queued, with session.attempt set once
+the ingestor writes it.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .answer_keys import get_answer_key, grade_compact
+from .ingestion import record_attempt
+from .item_analysis import pack_answers
+from .models import AttemptSession
+from .sampling import draw_question_ids, restrict_answer_key
+
+logger = logging.getLogger(__name__)
+
+ANSWERS_TIMEOUT = 60 * 60 * 6
+
+
+class SessionClosed(Exception):
+    """The session was already submitted or its time is up"""
+
+
+def answers_cache_key(session_id):
+    return f"quizapp:attempt_answers:{session_id}"
+
+
+def start_session(quiz, user):
+    """Resume the user's running session on the quiz, or start a new one"""
+    now = timezone.now()
+    session = (
+        AttemptSession.objects.filter(quiz=quiz, user=user, submitted_at__isnull=True)
+        .order_by('-started_at')
+        .first()
+    )
+    if session is not None and not is_expired(session, now):
+        return session
+    deadline = now + timedelta(minutes=quiz.time_limit) if quiz.has_time_limit else None
+    return AttemptSession.objects.create(
+        quiz=quiz, user=user, started_at=now, deadline=deadline,
+        question_ids=draw_question_ids(quiz),
+    )
+
+
+def is_expired(session, now=None):
+    if session.deadline is None:
+        return False
+    grace = timedelta(seconds=settings.ATTEMPT_SESSION_GRACE)
+    return (now or timezone.now()) > session.deadline + grace
+
+
+def remaining_seconds(session, now=None):
+    """Seconds left on the clock, or None without a time limit"""
+    if session.deadline is None:
+        return None
+    return max(0, int((session.deadline - (now or timezone.now())).total_seconds()))
+
+
+def get_answers(session):
+    """The session's answers: the cached store, or the last flushed copy"""
+    answers = cache.get(answers_cache_key(session.pk))
+    return dict(session.answers) if answers is None else answers
+
+
+def clean_answers(session, raw):
+    """Keep only {question id: option 1-4} pairs for questions of the attempt"""
+    answer_key = restrict_answer_key(get_answer_key(session.quiz_id), session.question_ids)
+    question_ids = {str(question_id) for question_id, _ in answer_key}
+    answers = {}
+    for question_id, option in (raw or {}).items():
+        question_id = str(question_id)
+        try:
+            option = int(option)
+        except (TypeError, ValueError):
+            continue
+        if question_id in question_ids and 1 <= option <= 4:
+            answers[question_id] = option
+    return answers
+
+
+# Sessions with cached answers newer than their database copy
+_dirty = set()
+_dirty_lock = threading.Lock()
+_flusher_pid = None
+_atexit_registered = False
+
+
+def autosave(session, raw_answers):
+    """Merge answers into the session's store; returns the stored answers"""
+    if session.submitted_at is not None or is_expired(session):
+        raise SessionClosed()
+    answers = get_answers(session)
+    answers.update(clean_answers(session, raw_answers))
+    cache.set(answers_cache_key(session.pk), answers, ANSWERS_TIMEOUT)
+    if _write_through_due(session):
+        AttemptSession.objects.filter(pk=session.pk, submitted_at__isnull=True).update(
+            answers=answers, answers_saved_at=timezone.now(),
+        )
+    else:
+        _mark_dirty(session.pk)
+    return answers
+
+
+def _write_through_due(session, now=None):
+    """Whether the session's database copy is older than the write-through age"""
+    saved_at = session.answers_saved_at or session.started_at
+    max_age = timedelta(seconds=settings.ATTEMPT_AUTOSAVE_WRITE_THROUGH_AGE)
+    return (now or timezone.now()) - saved_at >= max_age
+
+
+def _mark_dirty(session_id):
+    global _flusher_pid, _atexit_registered
+    with _dirty_lock:
+        _dirty.add(session_id)
+        if _flusher_pid != os.getpid():
+            # One timer per process, started again in a forked worker
+            threading.Thread(target=_run_flusher, name='attempt-autosave-flush', daemon=True).start()
+            _flusher_pid = os.getpid()
+        if not _atexit_registered:
+            atexit.register(flush)
+            _atexit_registered = True
+
+
+def _run_flusher():
+    while True:
+        time.sleep(settings.ATTEMPT_AUTOSAVE_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            # Logged by flush(); the sessions stay dirty for the next round
+            pass
+        finally:
+            close_old_connections()
+
+
+def flush():
+    """Write every dirty session's cached answers to the database in one batch"""
+    with _dirty_lock:
+        session_ids = list(_dirty)
+        _dirty.clear()
+    if not session_ids:
+        return 0
+
+    now = timezone.now()
+    sessions = []
+    for session in AttemptSession.objects.filter(pk__in=session_ids, submitted_at__isnull=True).only('pk', 'answers'):
+        answers = cache.get(answers_cache_key(session.pk))
+        if answers is not None:
+            session.answers = answers
+            session.answers_saved_at = now
+            sessions.append(session)
+    try:
+        AttemptSession.objects.bulk_update(sessions, ['answers', 'answers_saved_at'])
+    except Exception:
+        # Try again with the next flush
+        with _dirty_lock:
+            _dirty.update(session_ids)
+        logger.exception("Flushing autosaved answers failed")
+        raise
+    return len(sessions)
+
+
+def submit(session, raw_answers=None):
+    """
+    Grade the session from its stored answers and record the attempt.
+
+    Answers sent with the submission are merged first, unless the deadline
+    (plus grace) has passed; then only what was saved in time counts.
+    Returns (session, score, total).
+    """
+    with transaction.atomic():
+        # Lock the row so a double submit grades once
+        session = AttemptSession.objects.select_for_update().select_related('quiz', 'user').get(pk=session.pk)
+        if session.submitted_at is not None:
+            raise SessionClosed()
+        answers = get_answers(session)
+        if raw_answers and not is_expired(session):
+            answers.update(clean_answers(session, raw_answers))
+
+        # Only the drawn questions count in question-bank mode
+        answer_key = restrict_answer_key(get_answer_key(session.quiz_id), session.question_ids)
+        score = grade_compact(answer_key, answers)
+        # None when queued by batched ingestion; the ingestor links it later
+        session.attempt = record_attempt(
+            session.quiz, session.user, score, pack_answers(answer_key, answers), ingest_id=session.pk,
+        )
+        session.answers = answers
+        session.answers_saved_at = session.submitted_at = timezone.now()
+        session.save(update_fields=['attempt', 'answers', 'answers_saved_at', 'submitted_at'])
+
+    cache.delete(answers_cache_key(session.pk))
+    with _dirty_lock:
+        _dirty.discard(session.pk)
+    return session, score, len(answer_key)
@@ -0,0 +1,99 @@
+import json
+
+from django.db import transaction
+
+from . import search, stats
+from .fragments import bump_quiz_version
+from .models import Quiz, Question
+
+BULK_BATCH_SIZE = 500
+
+OPTION_MAX_LENGTH = Question._meta.get_field('option1').max_length
+TITLE_MAX_LENGTH = Quiz._meta.get_field('title').max_length
+DIFFICULTIES = {value for value, _ in Quiz.DIFFICULTY_CHOICES}
+
+
+class PayloadError(ValueError):
+    """A quiz payload that is too large or malformed; nothing was saved"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def read_json_body(request, max_bytes):
+    """
+    Parse a JSON request body, refusing to read more than max_bytes.
+
+    The body is pulled from the request stream in chunks, so an oversized
+    upload is rejected after max_bytes instead of being buffered whole.
+    """
+    declared = request.META.get('CONTENT_LENGTH')
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise PayloadError(f"Payload larger than {max_bytes} bytes", status=413)
+
+    chunks = []
+    received = 0
+    while True:
+        chunk = request.read(64 * 1024)
+        if not chunk:
+            break
+        received += len(chunk)
+        if received > max_bytes:
+            raise PayloadError(f"Payload larger than {max_bytes} bytes", status=413)
+        chunks.append(chunk)
+    try:
+        return json.loads(b''.join(chunks))
+    except ValueError as e:
+        raise PayloadError(f"Invalid JSON: {e}")
+
+
+def _text(value, field, index, max_length=None, required=True):
+    if value is None and not required:
+        return ''
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise PayloadError(f"Question {index + 1}: '{field}' must be a non-empty string")
+    if max_length and len(value) > max_length:
+        raise PayloadError(f"Question {index + 1}: '{field}' is longer than {max_length} characters")
+    return value
+
+
+def question_from_ai(q_data, index):
+    """Validate one AI-format question and build an unsaved Question"""
+    if not isinstance(q_data, dict):
+        raise PayloadError(f"Question {index + 1} is not an object")
+    options = q_data.get('options')
+    if not isinstance(options, list) or len(options) != 4:
+        raise PayloadError(f"Question {index + 1}: 'options' must be a list of 4 strings")
+    answer = q_data.get('correct_answer')
+    if not isinstance(answer, int) or isinstance(answer, bool) or not 0 <= answer <= 3:
+        raise PayloadError(f"Question {index + 1}: 'correct_answer' must be 0-3")
+
+    return Question(
+        question_text=_text(q_data.get('question_text'), 'question_text', index),
+        option1=_text(options[0], 'options', index, OPTION_MAX_LENGTH),
+        option2=_text(options[1], 'options', index, OPTION_MAX_LENGTH),
+        option3=_text(options[2], 'options', index, OPTION_MAX_LENGTH),
+        option4=_text(options[3], 'options', index, OPTION_MAX_LENGTH),
+        correct_option=answer + 1,  # Convert to 1-based
+        explanation=_text(q_data.get('explanation'), 'explanation', index, required=False),
+    )
+
+
+def create_quiz_with_questions(quiz, questions, batch_size=BULK_BATCH_SIZE):
+    """
+    Save a quiz and its questions atomically, inserting questions in bulk.
+
+    Either everything is saved or nothing is. bulk_create sends no signals,
+    so the site counters and the search index are updated here.
+    """
+    with transaction.atomic():
+        quiz.save()
+        for question in questions:
+            question.quiz = quiz
+        Question.objects.bulk_create(questions, batch_size=batch_size)
+        if questions:
+            stats.questions_added(quiz.id, len(questions))
+            bump_quiz_version(quiz.id)
+            search.index_questions(questions)
+    return quiz
@@ -0,0 +1,71 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Quiz, Question
+
+CATALOG_PAGE_SIZE = 12
+
+
+def encode_cursor(quiz):
+    """Encode the (created_at, id) position of a quiz as an opaque cursor"""
+    raw = f"{quiz.created_at.isoformat()}|{quiz.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back into (created_at, id), or None if it is invalid"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, quiz_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(quiz_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def catalog_queryset():
+    """Quizzes with their creator joined and question count annotated"""
+    # A correlated subquery rather than a GROUP BY join, so the page can be
+    # read straight off the (created_at, id) index and only counted per row
+    question_count = (
+        Question.objects.filter(quiz=OuterRef('pk'))
+        .order_by()
+        .values('quiz')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return (
+        Quiz.objects
+        .select_related('created_by')
+        .annotate(question_count=Coalesce(Subquery(question_count, output_field=IntegerField()), 0))
+        .order_by('-created_at', '-id')
+    )
+
+
+def get_catalog_page(cursor=None, page_size=CATALOG_PAGE_SIZE):
+    """
+    Return one page of the quiz catalog, newest first.
+
+    Pages are addressed by a keyset cursor on (created_at, id) rather than an
+    OFFSET, so every page costs a single query no matter how deep it is.
+    Returns (quizzes, next_cursor); next_cursor is None on the last page.
+    """
+    quizzes = catalog_queryset()
+    position = decode_cursor(cursor)
+    if position:
+        created_at, quiz_id = position
+        quizzes = quizzes.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=quiz_id)
+        )
+
+    # Fetch one extra row to find out whether another page exists
+    page = list(quizzes[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1])
+    return page, next_cursor
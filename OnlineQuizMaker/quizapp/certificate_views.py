@@ -0,0 +1,86 @@
+"""Certificate downloads; ReportLab is only imported by the render pool"""
+import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect, get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from .models import Quiz, QuizAttempt
+from .certificates import certificate_context, certificate_etag, certificate_path, get_renderer
+from .cohorts import stream_cohort_zip
+from .sampling import questions_per_attempt
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_later():
+    response = HttpResponse("Your certificate is being prepared, please retry in a moment.", status=503)
+    response['Retry-After'] = '2'
+    return response
+
+
+@login_required
+def export_quiz_certificate(request, quiz_id):
+    """Serve the PDF certificate for the user's best attempt at a quiz"""
+    quiz = get_object_or_404(Quiz, id=quiz_id)
+    
+    # Get user's best attempt
+    attempt = QuizAttempt.objects.filter(
+        quiz=quiz, 
+        user=request.user
+    ).order_by('-score', '-attempted_at').first()
+    
+    if not attempt:
+        return redirect('take_quiz', quiz_id=quiz_id)
+    
+    total_questions = questions_per_attempt(quiz)
+    context = certificate_context(attempt, quiz, request.user.username, total_questions)
+    etag = certificate_etag(context)
+    
+    # The certificate only changes with its content, so the browser's copy
+    # is still good if the digest matches
+    not_modified = get_conditional_response(request, etag=quote_etag(etag))
+    if not_modified is not None:
+        return not_modified
+    
+    # Rendered once on the pool, then served straight from disk
+    renderer = get_renderer()
+    try:
+        future = renderer.submit(context, certificate_path(attempt.pk, etag))
+        path = future.result(timeout=settings.CERTIFICATE_RENDER_TIMEOUT)
+    except FutureTimeoutError:
+        return _retry_later()
+    except BrokenProcessPool:
+        # A render worker died; the next request starts a fresh pool
+        logger.exception("Certificate render pool is broken, restarting it")
+        renderer.shutdown()
+        return _retry_later()
+    except Exception:
+        logger.exception("Rendering the certificate for attempt %s failed", attempt.pk)
+        return _retry_later()
+    
+    response = FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f"certificate_{quiz.title}_{request.user.username}.pdf",
+        content_type='application/pdf'
+    )
+    response['ETag'] = quote_etag(etag)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@login_required
+def cohort_certificates(request, quiz_id):
+    """Stream a ZIP with the certificate of every student who took the instructor's quiz"""
+    quiz = get_object_or_404(Quiz, id=quiz_id, created_by=request.user)
+    try:
+        min_score = max(int(request.GET.get('min_score', 0)), 0)
+    except ValueError:
+        min_score = 0
+    
+    response = StreamingHttpResponse(stream_cohort_zip(quiz, min_score), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="certificates_quiz_{quiz.id}.zip"'
+    return response
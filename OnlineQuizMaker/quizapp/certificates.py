@@ -0,0 +1,238 @@
+"""
+Quiz completion certificates, rendered once and served from disk.
+
+A certificate is identified by a digest of everything printed on it plus
+CERTIFICATE_TEMPLATE_VERSION, so it is rendered once per attempt and
+re-rendered only when the template or the quiz it describes changes. The
+digest doubles as the ETag.
+
+ReportLab layout is CPU bound, so rendering runs on a small process pool
+(CERTIFICATE_RENDER_WORKERS) instead of in the web workers; concurrent
+requests for the same certificate share one render. With 0 workers the
+certificate is rendered in the request.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the layout below changes, so stored certificates are redrawn
+CERTIFICATE_TEMPLATE_VERSION = 1
+
+
+def performance_label(percentage):
+    if percentage >= 90:
+        return "Excellent - Master Level! 🌟"
+    if percentage >= 75:
+        return "Very Good - Advanced Level! 👍"
+    if percentage >= 60:
+        return "Good - Proficient Level! ✅"
+    return "Completed - Good Effort! 💪"
+
+
+def certificate_context(attempt, quiz, username, total_questions):
+    """Everything printed on a certificate, as plain JSON-able values"""
+    percentage = (attempt.score / total_questions) * 100 if total_questions else 0.0
+    return {
+        'username': username,
+        'quiz_title': quiz.title,
+        'category': quiz.difficulty.title() if quiz.difficulty else 'General',
+        'score': attempt.score,
+        'total_questions': total_questions,
+        'percentage': round(percentage, 1),
+        'date': attempt.attempted_at.strftime('%B %d, %Y'),
+        'time': attempt.attempted_at.strftime('%I:%M %p'),
+    }
+
+
+def certificate_etag(context):
+    raw = json.dumps([CERTIFICATE_TEMPLATE_VERSION, context], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def certificate_path(attempt_id, etag):
+    return Path(settings.CERTIFICATE_DIR) / f"v{CERTIFICATE_TEMPLATE_VERSION}" / f"attempt-{attempt_id}-{etag}.pdf"
+
+
+@lru_cache(maxsize=None)
+def _styles():
+    """Paragraph styles, built once per process"""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+
+    styles = getSampleStyleSheet()
+    return {
+        'body': styles['BodyText'],
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.darkblue,
+            spaceAfter=30,
+            alignment=1  # Center aligned
+        ),
+        'content': ParagraphStyle(
+            'CustomContent',
+            parent=styles['BodyText'],
+            fontSize=14,
+            spaceAfter=12,
+            alignment=1  # Center aligned
+        ),
+        'footer': ParagraphStyle('Footer', parent=styles['BodyText'], fontSize=10, textColor=colors.gray),
+    }
+
+
+def render_certificate(context, path):
+    """
+    Lay out a certificate and write it to path.
+
+    Runs in the render pool, so it takes only plain values and touches
+    nothing but ReportLab and the file system. The file is written under a
+    temporary name and renamed, so readers never see half a PDF. Older
+    renders of the same attempt (other ETags or template versions) are
+    deleted once it is in place.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    styles = _styles()
+    content_style = styles['content']
+    username = escape(context['username'])
+    quiz_title = escape(context['quiz_title'])
+
+    story = [
+        Paragraph("🎓 Certificate of Achievement", styles['title']),
+        Spacer(1, 20),
+        Paragraph("<hr width='80%' color='darkblue'/>", styles['body']),
+        Spacer(1, 30),
+        Paragraph("This certificate is proudly presented to", content_style),
+        Paragraph(f"<b><font size='18' color='darkblue'>{username}</font></b>", content_style),
+        Spacer(1, 20),
+        Paragraph("for successfully completing the quiz", content_style),
+        Paragraph(f"<b><font size='16' color='darkgreen'>'{quiz_title}'</font></b>", content_style),
+        Spacer(1, 20),
+        Paragraph("with an outstanding score of", content_style),
+        Paragraph(f"<b><font size='16' color='red'>{context['score']}/{context['total_questions']}</font></b>", content_style),
+        Paragraph(f"({context['percentage']:.1f}% Accuracy)", content_style),
+        Spacer(1, 20),
+        Paragraph(f"Performance: <b>{performance_label(context['percentage'])}</b>", content_style),
+        Spacer(1, 30),
+        Paragraph("<b>Quiz Details:</b>", content_style),
+        Paragraph(f"Category: {escape(context['category'])}", content_style),
+        Paragraph(f"Date Completed: {context['date']}", content_style),
+        Paragraph(f"Time: {context['time']}", content_style),
+        Spacer(1, 30),
+        Paragraph("<hr width='80%' color='darkblue'/>", styles['body']),
+        Spacer(1, 10),
+        Paragraph("Generated by QuizMaster - Your Learning Companion", styles['footer']),
+    ]
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        SimpleDocTemplate(str(tmp_path), pagesize=A4, topMargin=0.5 * inch).build(story)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    _remove_older_renders(path)
+    return str(path)
+
+
+def _remove_older_renders(path):
+    """Delete the attempt's certificates other than path, across template versions"""
+    attempt_prefix = path.name.rsplit('-', 1)[0]
+    for old_path in path.parent.parent.glob(f"v*/{attempt_prefix}-*.pdf"):
+        if old_path != path:
+            old_path.unlink(missing_ok=True)
+
+
+class CertificateRenderer:
+    """Renders certificates on a process pool, one render per file at a time"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.pid = os.getpid()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def submit(self, context, path):
+        """Return a Future for path, rendering it unless it exists or is underway"""
+        path = Path(path)
+        with self._lock:
+            future = self._inflight.get(path)
+            if future is None and not path.exists() and self.workers:
+                future = self._get_executor().submit(render_certificate, context, str(path))
+                self._inflight[path] = future
+                pooled = True
+            else:
+                pooled = False
+        if pooled:
+            future.add_done_callback(lambda _future: self._forget(path))
+            return future
+        if future is not None:
+            return future
+
+        future = Future()
+        try:
+            # Already on disk, or no pool: render in the calling thread
+            future.set_result(str(path) if path.exists() else render_certificate(context, path))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _forget(self, path):
+        with self._lock:
+            self._inflight.pop(path, None)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """The process-wide renderer, created on first use (and again after fork)"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None or _renderer.pid != os.getpid():
+            _renderer = CertificateRenderer(settings.CERTIFICATE_RENDER_WORKERS)
+            atexit.register(_renderer.shutdown)
+        return _renderer
+
+
+def prerender(attempt, quiz, username, total_questions):
+    """Queue a certificate in the background so the first download is a file read"""
+    if not settings.CERTIFICATE_PRERENDER or not settings.CERTIFICATE_RENDER_WORKERS:
+        return
+    context = certificate_context(attempt, quiz, username, total_questions)
+    future = get_renderer().submit(context, certificate_path(attempt.pk, certificate_etag(context)))
+    future.add_done_callback(_log_failure)
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Pre-rendering a certificate failed", exc_info=future.exception())
@@ -0,0 +1,26 @@
+"""
+System checks for what the app needs from a production deployment.
+"""
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+from django.utils.module_loading import import_string
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Cached answer keys, fragment versions and profile stats are invalidated
+    by deleting the key in the process that saved the change, and autosaved
+    answers are read back by whichever worker takes the submission. A cache
+    local to each process leaves every other worker with old or no values.
+    """
+    backend = import_string(settings.CACHES['default']['BACKEND'])
+    if issubclass(backend, (LocMemCache, DummyCache)):
+        return [Error(
+            "The default cache is local to each process, so invalidations don't reach other workers.",
+            hint="Set REDIS_URL to a Redis server shared by all workers.",
+            id='quizapp.E001',
+        )]
+    return []
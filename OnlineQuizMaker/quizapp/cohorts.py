@@ -0,0 +1,87 @@
+"""
+Certificates for a whole quiz cohort at once.
+
+Every student's best attempt is rendered in parallel on a certificate
+renderer's process pool, and the finished PDFs are streamed out as one ZIP,
+a file at a time, so nothing but the PDF being copied is held in memory.
+"""
+import time
+import zipfile
+from concurrent.futures import as_completed
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .certificates import certificate_context, certificate_etag, certificate_path, get_renderer
+from .models import QuizAttempt
+from .sampling import questions_per_attempt
+
+
+def cohort_attempts(quiz, min_score=0):
+    """Each user's best attempt at the quiz (the one their certificate shows)"""
+    ranked = (
+        QuizAttempt.objects.filter(quiz=quiz)
+        .annotate(rank=Window(
+            RowNumber(), partition_by=F('user_id'), order_by=[F('score').desc(), F('attempted_at').desc()]
+        ))
+    )
+    return (
+        ranked.filter(rank=1, score__gte=min_score)
+        .select_related('user')
+        .order_by('user__username')
+    )
+
+
+def render_cohort(quiz, min_score=0, renderer=None):
+    """
+    Submit every qualifying certificate to the pool.
+
+    Yields (attempt, path) as renders finish, fastest first. Certificates
+    already on disk come back immediately.
+    """
+    renderer = renderer or get_renderer()
+    total_questions = questions_per_attempt(quiz)
+    futures = {}
+    for attempt in cohort_attempts(quiz, min_score):
+        context = certificate_context(attempt, quiz, attempt.user.username, total_questions)
+        path = certificate_path(attempt.pk, certificate_etag(context))
+        futures[renderer.submit(context, path)] = attempt
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+
+class _ZipStream:
+    """Write-only file object that hands everything written back out in pieces"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_cohort_zip(quiz, min_score=0, renderer=None):
+    """Yield a ZIP of the cohort's certificates, one PDF's worth of bytes at a time"""
+    stream = _ZipStream()
+    # PDF content streams are already compressed, deflating them again buys little
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for attempt, path in render_cohort(quiz, min_score, renderer):
+            archive.write(path, arcname=f"certificate_{attempt.user.username}.pdf")
+            yield stream.take()
+    yield stream.take()
+
+
+def render_cohort_timed(quiz, min_score=0, renderer=None):
+    """Render the cohort, returning (certificates, seconds)"""
+    start = time.perf_counter()
+    count = sum(1 for _ in render_cohort(quiz, min_score, renderer))
+    return count, time.perf_counter() - start
@@ -4,12 +4,14 @@ from .models import Quiz, Question
 class QuizForm(forms.ModelForm):
     class Meta:
         model = Quiz
-        fields = ['title', 'description', 'has_time_limit', 'time_limit']
+        fields = ['title', 'description', 'has_time_limit', 'time_limit', 'question_bank', 'number_of_questions']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
              'time_limit': forms.NumberInput(attrs={'class': 'form-control'}),
             'has_time_limit': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'question_bank': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'number_of_questions': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
         }
 
 class QuestionForm(forms.ModelForm):
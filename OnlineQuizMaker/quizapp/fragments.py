@@ -0,0 +1,100 @@
+"""
+Rendered take_quiz fragments, cached per quiz content version.
+
+Every Quiz or Question change bumps the quiz's version, which moves it to
+fresh cache keys; fragments for older versions are simply never read again
+and age out. A hit skips both the question query and the template render.
+Only the question markup is cached: the CSRF token and everything
+user-specific are rendered by the page around it on every request.
+"""
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Question
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+VERSION_TIMEOUT = None  # versions must outlive the fragments keyed on them
+
+_lock = threading.Lock()
+_metrics = {'hits': 0, 'misses': 0}
+
+
+def quiz_version_key(quiz_id):
+    return f"quizapp:quiz_version:{quiz_id}"
+
+
+def quiz_fragment_key(quiz_id, version):
+    return f"quizapp:take_quiz:{quiz_id}:{version}"
+
+
+def get_quiz_version(quiz_id):
+    key = quiz_version_key(quiz_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        # Another process may have set one first; use whichever won
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key) or version
+    return version
+
+
+def bump_quiz_version(quiz_id):
+    """Invalidate every cached fragment of the quiz"""
+    cache.set(quiz_version_key(quiz_id), uuid.uuid4().hex[:12], VERSION_TIMEOUT)
+
+
+def _count(metric):
+    with _lock:
+        _metrics[metric] += 1
+
+
+def metrics():
+    """Hit and miss counts of this process, with the hit ratio"""
+    with _lock:
+        counts = dict(_metrics)
+    lookups = counts['hits'] + counts['misses']
+    counts['hit_ratio'] = counts['hits'] / lookups if lookups else 0.0
+    return counts
+
+
+def _render(quiz, questions):
+    context = {'quiz': quiz, 'questions': questions}
+    return {
+        'navigation': render_to_string('partials/quiz_navigation.html', context),
+        'questions': render_to_string('partials/quiz_questions.html', context),
+        'question_count': len(questions),
+    }
+
+
+def _safe(fragments):
+    return dict(fragments, navigation=mark_safe(fragments['navigation']), questions=mark_safe(fragments['questions']))
+
+
+def get_quiz_fragments(quiz, question_ids=None):
+    """
+    Return {'navigation': ..., 'questions': ..., 'question_count': ...} for take_quiz.
+
+    The markup is rendered from the quiz's questions once per content
+    version and served from the cache after that. A question-bank draw
+    (question_ids) is different for every attempt, so it is rendered from
+    just the drawn rows and not cached.
+    """
+    if question_ids is not None:
+        by_id = Question.objects.filter(quiz=quiz, id__in=question_ids).in_bulk()
+        return _safe(_render(quiz, [by_id[question_id] for question_id in question_ids if question_id in by_id]))
+
+    key = quiz_fragment_key(quiz.id, get_quiz_version(quiz.id))
+    fragments = cache.get(key)
+    if fragments is not None:
+        _count('hits')
+    else:
+        _count('misses')
+        # From the primary, like everything kept in the shared cache
+        fragments = _render(quiz, list(Question.objects.using(DEFAULT_DB_ALIAS).filter(quiz=quiz).order_by('id')))
+        cache.set(key, fragments, FRAGMENT_TIMEOUT)
+    return _safe(fragments)
@@ -0,0 +1,319 @@
+"""
+Write-behind ingestion of QuizAttempt rows.
+
+With QUIZ_ATTEMPT_INGESTION = 'batched', graded submissions are appended to
+an on-disk journal and an in-process queue, and a background thread writes
+them with bulk_create in batches. The journal is the durable fallback: any
+records a dead process accepted but never flushed are replayed on the next
+start, and every record carries an ingest_id so a replay never duplicates a
+row that did reach the database. An attempt submitted from an AttemptSession
+uses the session id as its ingest_id, and the session is linked to the row
+when it is written.
+"""
+import atexit
+import base64
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import leaderboard, stats
+from .models import AttemptSession, Quiz, QuizAttempt
+from .profiles import invalidate_profile_stats
+
+try:
+    import fcntl
+except ImportError:  # Windows: orphaned journals are replayed by the command
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PREFIX = 'attempts-'
+
+
+def _journal_pid(path):
+    """Owning process id from a journal or lock file name"""
+    try:
+        return int(path.name[len(JOURNAL_PREFIX):].split('-')[0].split('.')[0])
+    except ValueError:
+        return None
+
+
+def read_journal(path):
+    """Read journal records, ignoring a torn final line from a crash"""
+    records = []
+    with open(path, encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def write_records(records, batch_size=500):
+    """
+    Insert journal records as QuizAttempt rows in one transaction.
+
+    Records already present (by ingest_id), or whose quiz or user has been
+    deleted since they were accepted, are skipped. Returns rows inserted.
+    """
+    ingest_ids = [record['id'] for record in records]
+    existing = {str(pk) for pk in QuizAttempt.objects.filter(ingest_id__in=ingest_ids).values_list('ingest_id', flat=True)}
+    # A session resubmitted after its first transaction rolled back is queued twice
+    unique_records = {}
+    for record in records:
+        unique_records.setdefault(record['id'], record)
+    records = list(unique_records.values())
+    quiz_ids = set(Quiz.objects.filter(id__in={r['quiz'] for r in records}).values_list('id', flat=True))
+    user_ids = set(User.objects.filter(id__in={r['user'] for r in records}).values_list('id', flat=True))
+
+    attempts = [
+        QuizAttempt(
+            quiz_id=record['quiz'],
+            user_id=record['user'],
+            score=record['score'],
+            attempted_at=datetime.fromisoformat(record['at']),
+            ingest_id=uuid.UUID(record['id']),
+            answers=base64.b64decode(record['answers']) if record.get('answers') else None,
+        )
+        for record in records
+        if record['id'] not in existing and record['quiz'] in quiz_ids and record['user'] in user_ids
+    ]
+    if not attempts:
+        return 0
+
+    with transaction.atomic():
+        QuizAttempt.objects.bulk_create(attempts, batch_size=batch_size)
+        # bulk_create sends no post_save signals
+        stats.adjust(total_attempts=len(attempts))
+        leaderboard.record_attempts(attempts)
+        _link_sessions(attempts, batch_size)
+    for user_id in {attempt.user_id for attempt in attempts}:
+        invalidate_profile_stats(user_id)
+    return len(attempts)
+
+
+def _link_sessions(attempts, batch_size):
+    """Point the sessions whose id is an attempt's ingest_id at the attempt"""
+    by_ingest_id = {attempt.ingest_id: attempt for attempt in attempts}
+    sessions = list(AttemptSession.objects.filter(pk__in=by_ingest_id, attempt__isnull=True).only('pk'))
+    for session in sessions:
+        session.attempt = by_ingest_id[session.pk]
+    AttemptSession.objects.bulk_update(sessions, ['attempt'], batch_size=batch_size)
+
+
+class AttemptIngestor:
+    """Bounded in-process queue of attempts backed by a per-process journal"""
+
+    def __init__(self, spool_dir, batch_size=200, flush_interval=0.5, max_queue=5000, start_thread=True):
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.pid = os.getpid()
+        self._token = uuid.uuid4().hex[:8]
+
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._inflight = []  # [(records, journal_path)] taken but not yet written
+        self._closed = False
+        self._seq = 0
+
+        self.recover()
+        self._lock_file = self._acquire_lock()
+        self._journal_path, self._journal = self._open_journal()
+
+        self._thread = None
+        if start_thread:
+            self._thread = threading.Thread(target=self._run, name='attempt-ingestor', daemon=True)
+            self._thread.start()
+
+    # Journal files
+
+    def _lock_path(self, pid):
+        return self.spool_dir / f"{JOURNAL_PREFIX}{pid}.lock"
+
+    def _acquire_lock(self):
+        lock_file = open(self._lock_path(self.pid), 'w')
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+
+    def _open_journal(self):
+        self._seq += 1
+        path = self.spool_dir / f"{JOURNAL_PREFIX}{self.pid}-{self._token}-{self._seq}.jsonl"
+        return path, open(path, 'a', encoding='utf-8')
+
+    def _is_orphan(self, pid):
+        if pid == self.pid:
+            # Left behind by an earlier process that had our pid
+            return True
+        if fcntl is None:
+            return False
+        lock_path = self._lock_path(pid)
+        try:
+            lock_file = open(lock_path, 'r')
+        except FileNotFoundError:
+            return True
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return True
+
+    def recover(self):
+        """Replay journals left behind by processes that are no longer running"""
+        recovered = 0
+        for path in sorted(self.spool_dir.glob(f"{JOURNAL_PREFIX}*.jsonl")):
+            pid = _journal_pid(path)
+            if pid is None or not self._is_orphan(pid):
+                continue
+            recovered += write_records(read_journal(path), self.batch_size)
+            path.unlink()
+            self._lock_path(pid).unlink(missing_ok=True)
+        if recovered:
+            logger.warning("Recovered %d unflushed quiz attempts from %s", recovered, self.spool_dir)
+        return recovered
+
+    # Queue
+
+    def submit(self, quiz_id, user_id, score, answers=None, ingest_id=None):
+        """
+        Accept an attempt for write-behind storage.
+
+        Returns False when the queue is full or shutting down; the caller
+        should then save the attempt directly.
+        """
+        record = {
+            'id': str(ingest_id or uuid.uuid4()),
+            'quiz': quiz_id,
+            'user': user_id,
+            'score': score,
+            'at': timezone.now().isoformat(),
+        }
+        if answers:
+            record['answers'] = base64.b64encode(answers).decode()
+        with self._cond:
+            if self._closed or len(self._pending) >= self.max_queue:
+                return False
+            self._journal.write(json.dumps(record) + '\n')
+            self._journal.flush()
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending) + sum(len(records) for records, _ in self._inflight)
+
+    def flush(self):
+        """Write every accepted attempt to the database, returning rows written"""
+        with self._flush_lock:
+            with self._cond:
+                if self._pending:
+                    self._journal.close()
+                    self._inflight.append((self._pending, self._journal_path))
+                    self._pending = []
+                    self._journal_path, self._journal = self._open_journal()
+
+            written = 0
+            while self._inflight:
+                records, path = self._inflight[0]
+                # On error the batch stays in flight and is retried next time
+                written += write_records(records, self.batch_size)
+                path.unlink(missing_ok=True)
+                with self._cond:
+                    self._inflight.pop(0)
+            return written
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing quiz attempts failed, will retry")
+            if closed:
+                break
+        connection.close()
+
+    def shutdown(self):
+        """Stop accepting attempts and drain everything to the database"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Draining quiz attempts failed, journal kept for recovery")
+            return
+        self._journal.close()
+        self._journal_path.unlink(missing_ok=True)
+        self._lock_file.close()
+        self._lock_path(self.pid).unlink(missing_ok=True)
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    """The process-wide ingestor, created on first use (and again after fork)"""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None or _ingestor.pid != os.getpid():
+            _ingestor = AttemptIngestor(
+                settings.QUIZ_ATTEMPT_SPOOL_DIR,
+                batch_size=settings.QUIZ_ATTEMPT_BATCH_SIZE,
+                flush_interval=settings.QUIZ_ATTEMPT_FLUSH_INTERVAL,
+                max_queue=settings.QUIZ_ATTEMPT_QUEUE_SIZE,
+            )
+            atexit.register(_ingestor.shutdown)
+        return _ingestor
+
+
+def record_attempt(quiz, user, score, answers=None, ingest_id=None):
+    """
+    Store a graded attempt, write-behind when batched ingestion is enabled.
+
+    `answers` is the attempt's packed answers (item_analysis.pack_answers),
+    and `ingest_id` an id to find the attempt by once it is written (the
+    session id for session submissions; random if not given).
+
+    Returns the saved QuizAttempt, or None if it was queued.
+    """
+    if getattr(settings, 'QUIZ_ATTEMPT_INGESTION', 'direct') == 'batched':
+        if get_ingestor().submit(quiz.id, user.id, score, answers, ingest_id):
+            return None
+    return save_attempt(quiz, user, score, answers, ingest_id)
+
+
+def save_attempt(quiz, user, score, answers=None, ingest_id=None):
+    """Store a graded attempt now, whatever the ingestion mode"""
+    attempt = QuizAttempt(quiz=quiz, user=user, score=score, answers=answers, ingest_id=ingest_id)
+    # Commit the attempt together with the counters and leaderboard rows
+    # its post_save handlers update
+    with transaction.atomic():
+        attempt.save()
+    return attempt
@@ -0,0 +1,369 @@
+"""
+Per-request instrumentation: wall time, database queries, cache lookups and
+AI upstream time, aggregated per view.
+
+InstrumentationMiddleware opens a RequestMetrics for every request in a
+context variable. A query recorder installed on every database connection,
+the instrumented cache backend and upstream_call() all add to it, so it
+works with DEBUG off and follows sync_to_async hops. When the response is
+ready the request is folded into per-view histograms and counters, which
+snapshot() and prometheus_text() expose. Like the other metrics, the totals
+belong to the worker process that served the requests.
+
+Within a request, a statement repeated with identical parameters counts as
+a duplicate, and a statement shape repeated INSTRUMENTATION_N_PLUS_ONE_THRESHOLD
+times or more with different parameters flags the request as a likely N+1.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+N_PLUS_ONE_SAMPLES = 5
+
+_current = ContextVar('quizapp_request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """What one request spent; may be written from the request's worker threads"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_seconds = 0.0
+        self.statements = Counter()
+        self.executions = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, params, many, seconds):
+        with self._lock:
+            self.query_seconds += seconds
+            self.statements[sql] += 1
+            if not many:
+                self.executions[(sql, repr(params))] += 1
+
+    def add_cache_lookup(self, hit):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def add_upstream(self, seconds):
+        with self._lock:
+            self.upstream_calls += 1
+            self.upstream_seconds += seconds
+
+    @property
+    def query_count(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicate_queries(self):
+        return sum(count - 1 for count in self.executions.values())
+
+    def repeated_statements(self, threshold):
+        """Statements run threshold times or more with varying parameters"""
+        variants = Counter(sql for sql, _ in self.executions)
+        return {
+            sql: self.statements[sql]
+            for sql, count in variants.items()
+            if count > 1 and self.statements[sql] >= threshold
+        }
+
+
+# Recording hooks
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper; a pass-through outside a request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, params, many, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def upstream_call():
+    """Time a call to the AI service"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _add_upstream(seconds, _current.get())
+
+
+def timed_iter(iterable):
+    """Yield from a streamed upstream response, timing only the waits for it"""
+    metrics = _current.get()
+    iterator = iter(iterable)
+    waited = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - start
+            yield item
+    finally:
+        _add_upstream(waited, metrics)
+
+
+class CacheInstrumentation:
+    """Cache backend mixin counting get() hits and misses against the current request"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        _record_cache(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        metrics = _current.get()
+        if metrics is not None:
+            for key in keys:
+                metrics.add_cache_lookup(key in found)
+        return found
+
+
+class InstrumentedLocMemCache(CacheInstrumentation, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(CacheInstrumentation, RedisCache):
+    pass
+
+
+def _record_cache(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_cache_lookup(hit)
+
+
+# Aggregation
+
+_lock = threading.Lock()
+_views = {}
+_upstream = {'calls': 0, 'seconds': 0.0}
+
+
+def _new_view_stats():
+    return {
+        'requests': 0,
+        'server_errors': 0,
+        'duration_buckets': [0] * (len(DURATION_BUCKETS) + 1),
+        'duration_seconds': 0.0,
+        'query_buckets': [0] * (len(QUERY_COUNT_BUCKETS) + 1),
+        'queries': 0,
+        'query_seconds': 0.0,
+        'duplicate_queries': 0,
+        'n_plus_one_requests': 0,
+        'n_plus_one_samples': {},
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'upstream_calls': 0,
+        'upstream_seconds': 0.0,
+    }
+
+
+def _bucket(bounds, value):
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds)
+
+
+def _add_upstream(seconds, metrics):
+    # Process totals include calls made outside any request
+    with _lock:
+        _upstream['calls'] += 1
+        _upstream['seconds'] += seconds
+    if metrics is not None:
+        metrics.add_upstream(seconds)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unresolved>'
+
+
+def record_request(view, status, metrics):
+    """Fold a finished request into its view's totals"""
+    duration = time.perf_counter() - metrics.started
+    query_count = metrics.query_count
+    repeated = metrics.repeated_statements(settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD)
+    with _lock:
+        stats = _views.setdefault(view, _new_view_stats())
+        stats['requests'] += 1
+        stats['server_errors'] += status >= 500
+        stats['duration_buckets'][_bucket(DURATION_BUCKETS, duration)] += 1
+        stats['duration_seconds'] += duration
+        stats['query_buckets'][_bucket(QUERY_COUNT_BUCKETS, query_count)] += 1
+        stats['queries'] += query_count
+        stats['query_seconds'] += metrics.query_seconds
+        stats['duplicate_queries'] += metrics.duplicate_queries
+        stats['cache_hits'] += metrics.cache_hits
+        stats['cache_misses'] += metrics.cache_misses
+        stats['upstream_calls'] += metrics.upstream_calls
+        stats['upstream_seconds'] += metrics.upstream_seconds
+        if repeated:
+            stats['n_plus_one_requests'] += 1
+            samples = stats['n_plus_one_samples']
+            for sql, count in repeated.items():
+                if sql in samples or len(samples) < N_PLUS_ONE_SAMPLES:
+                    samples[sql] = max(samples.get(sql, 0), count)
+    for sql, count in repeated.items():
+        logger.warning("Possible N+1 in %s: %d queries like %s", view, count, sql[:300])
+
+
+def snapshot():
+    """Per-view totals and histograms of this process, JSON-ready"""
+    with _lock:
+        views = {
+            view: dict(stats, n_plus_one_samples=dict(stats['n_plus_one_samples']))
+            for view, stats in _views.items()
+        }
+        upstream = dict(_upstream)
+    for stats in views.values():
+        requests = stats['requests']
+        stats['mean_ms'] = round(stats['duration_seconds'] * 1000 / requests, 2) if requests else 0.0
+        stats['queries_per_request'] = round(stats['queries'] / requests, 2) if requests else 0.0
+        lookups = stats['cache_hits'] + stats['cache_misses']
+        stats['cache_hit_ratio'] = stats['cache_hits'] / lookups if lookups else 0.0
+    return {
+        'duration_buckets': list(DURATION_BUCKETS),
+        'query_count_buckets': list(QUERY_COUNT_BUCKETS),
+        'views': views,
+        'ai_upstream': upstream,
+    }
+
+
+def reset():
+    with _lock:
+        _views.clear()
+        _upstream.update(calls=0, seconds=0.0)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram(lines, name, bounds, view, buckets, total):
+    cumulative = 0
+    for bound, count in zip(list(bounds) + ['+Inf'], buckets):
+        cumulative += count
+        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{view="{view}"}} {total}')
+    lines.append(f'{name}_count{{view="{view}"}} {cumulative}')
+
+
+def prometheus_text():
+    """The aggregates in the Prometheus text exposition format"""
+    data = snapshot()
+    views = sorted(data['views'].items())
+    lines = []
+
+    lines += [
+        '# HELP quizapp_request_duration_seconds Wall time of requests by view.',
+        '# TYPE quizapp_request_duration_seconds histogram',
+    ]
+    for view, stats in views:
+        _histogram(lines, 'quizapp_request_duration_seconds', DURATION_BUCKETS, _label(view),
+                   stats['duration_buckets'], stats['duration_seconds'])
+
+    lines += [
+        '# HELP quizapp_request_db_queries Database queries per request by view.',
+        '# TYPE quizapp_request_db_queries histogram',
+    ]
+    for view, stats in views:
+        _histogram(lines, 'quizapp_request_db_queries', QUERY_COUNT_BUCKETS, _label(view),
+                   stats['query_buckets'], stats['queries'])
+
+    counters = [
+        ('quizapp_request_server_errors_total', 'Responses with a 5xx status.', 'server_errors'),
+        ('quizapp_db_query_seconds_total', 'Time spent in database queries.', 'query_seconds'),
+        ('quizapp_db_duplicate_queries_total', 'Queries repeated with identical parameters within a request.', 'duplicate_queries'),
+        ('quizapp_n_plus_one_requests_total', 'Requests that repeated one query shape past the N+1 threshold.', 'n_plus_one_requests'),
+        ('quizapp_cache_hits_total', 'Cache lookups that found a value.', 'cache_hits'),
+        ('quizapp_cache_misses_total', 'Cache lookups that found nothing.', 'cache_misses'),
+        ('quizapp_ai_upstream_seconds_total', 'Time spent waiting on the AI service within requests.', 'upstream_seconds'),
+    ]
+    for name, help_text, key in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{{view="{_label(view)}"}} {stats[key]}' for view, stats in views]
+
+    lines += [
+        '# HELP quizapp_ai_upstream_calls_total Calls to the AI service, inside requests or not.',
+        '# TYPE quizapp_ai_upstream_calls_total counter',
+        f"quizapp_ai_upstream_calls_total {data['ai_upstream']['calls']}",
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+class InstrumentationMiddleware:
+    """Measures each request and records it under its view name"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            _current.reset(token)
+            record_request(view_name(request), status, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status = 500
+        try:
+            response = await self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            _current.reset(token)
+            record_request(view_name(request), status, metrics)
@@ -0,0 +1,148 @@
+"""
+Per-question answer analytics.
+
+Each QuizAttempt stores its answers as one packed binary value: for every
+question shown, in question id order, an 8-byte id and a 1-byte option
+(0 = left blank). The analysis job folds attempts not yet marked analyzed
+into QuestionStats running sums and marks them in the same transaction, so
+every run only reads new attempts, and the instructor report is a plain
+read of those rows. A flag rather than an id watermark, because attempt ids
+need not commit in order: with concurrent writers or batched ingestion,
+attempt N can commit after N + 1 has been read.
+
+Attempts are graded against the answer key at the time they are folded,
+not the one they were taken with. Changing a question's correct option
+therefore leaves earlier attempts counted under the old key until the
+statistics are rebuilt with `analyze_items --rebuild`.
+"""
+import struct
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .answer_keys import get_answer_key
+from .models import ItemAnalysisState, QuestionStats, QuizAttempt
+
+STATE_PK = 1
+ENTRY = struct.Struct('<QB')
+
+
+def pack_answers(answer_key, answers):
+    """
+    Pack the answers to the questions in answer_key.
+
+    `answers` maps question id (int or str) to the option picked; questions
+    without an answer are stored as left blank.
+    """
+    entries = []
+    for question_id, _ in sorted(answer_key):
+        try:
+            option = int(answers.get(question_id, answers.get(str(question_id), 0)))
+        except (TypeError, ValueError):
+            option = 0
+        entries.append(ENTRY.pack(question_id, option if 1 <= option <= 4 else 0))
+    return b''.join(entries)
+
+
+def unpack_answers(packed):
+    """[(question id, option)] from pack_answers; option 0 means left blank"""
+    return list(ENTRY.iter_unpack(bytes(packed))) if packed else []
+
+
+def _new_sums():
+    return {'responses': 0, 'correct': 0, 'options': [0] * 5, 'score': 0.0, 'score_sq': 0.0, 'correct_score': 0.0}
+
+
+def _fold(sums, attempts):
+    """Add attempts' answers, graded against the current answer keys, to per-question sums"""
+    keys = {}
+    for _, quiz_id, packed in attempts:
+        entries = unpack_answers(packed)
+        if not entries:
+            continue
+        if quiz_id not in keys:
+            keys[quiz_id] = dict(get_answer_key(quiz_id))
+        answer_key = keys[quiz_id]
+        # Questions deleted since the attempt are left out
+        entries = [(question_id, option) for question_id, option in entries if question_id in answer_key]
+        if not entries:
+            continue
+        results = [(question_id, option, option == answer_key[question_id]) for question_id, option in entries]
+        fraction = sum(right for _, _, right in results) / len(results)
+        for question_id, option, right in results:
+            item = sums[(quiz_id, question_id)]
+            item['responses'] += 1
+            item['options'][option] += 1
+            item['score'] += fraction
+            item['score_sq'] += fraction * fraction
+            if right:
+                item['correct'] += 1
+                item['correct_score'] += fraction
+
+
+def _store(sums):
+    question_ids = [question_id for _, question_id in sums]
+    existing = QuestionStats.objects.in_bulk(question_ids)
+    to_create, to_update = [], []
+    for (quiz_id, question_id), item in sums.items():
+        stats = existing.get(question_id)
+        if stats is None:
+            stats = QuestionStats(question_id=question_id, quiz_id=quiz_id, option_counts=[0] * 5)
+            to_create.append(stats)
+        else:
+            to_update.append(stats)
+        stats.responses += item['responses']
+        stats.correct += item['correct']
+        stats.option_counts = [a + b for a, b in zip(stats.option_counts or [0] * 5, item['options'])]
+        stats.score_sum += item['score']
+        stats.score_sq_sum += item['score_sq']
+        stats.correct_score_sum += item['correct_score']
+    QuestionStats.objects.bulk_create(to_create)
+    QuestionStats.objects.bulk_update(
+        to_update, ['responses', 'correct', 'option_counts', 'score_sum', 'score_sq_sum', 'correct_score_sum'],
+    )
+
+
+def run(batch_size=2000, rebuild=False):
+    """
+    Fold attempts not yet analyzed into QuestionStats.
+
+    Runs one batch_size slice of attempts per transaction, marking each
+    slice analyzed. With rebuild, the statistics start over from the first
+    attempt (needed after attempts are deleted or answer keys change).
+    Returns the number of attempts read.
+    """
+    processed = 0
+    if rebuild:
+        with transaction.atomic():
+            ItemAnalysisState.objects.select_for_update().get_or_create(pk=STATE_PK)
+            QuestionStats.objects.all().delete()
+            QuizAttempt.objects.filter(analyzed=True).update(analyzed=False)
+
+    while True:
+        with transaction.atomic():
+            # The row lock keeps two runs from counting the same attempts
+            state, _ = ItemAnalysisState.objects.select_for_update().get_or_create(pk=STATE_PK)
+            attempts = list(
+                QuizAttempt.objects.filter(analyzed=False)
+                .order_by('id')
+                .values_list('id', 'quiz_id', 'answers')[:batch_size]
+            )
+            if not attempts:
+                state.run_at = timezone.now()
+                state.save(update_fields=['run_at'])
+                return processed
+
+            sums = defaultdict(_new_sums)
+            _fold(sums, attempts)
+            _store(sums)
+            QuizAttempt.objects.filter(id__in=[attempt_id for attempt_id, _, _ in attempts]).update(analyzed=True)
+            state.run_at = timezone.now()
+            state.save(update_fields=['run_at'])
+            processed += len(attempts)
+
+
+def quiz_item_stats(quiz):
+    """The precomputed statistics of a quiz's questions, in question order"""
+    return QuestionStats.objects.filter(quiz=quiz).select_related('question').order_by('question_id')
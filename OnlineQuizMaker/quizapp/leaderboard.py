@@ -0,0 +1,154 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, FloatField, Sum, Window
+from django.db.models.functions import Cast, RowNumber
+
+from .models import QuizAttempt, QuizTopScore, UserStats
+
+QUIZ_TOP_K = 10
+GLOBAL_LEADERBOARD_SIZE = 20
+
+QUIZ_RANKING = ('-score', 'attempted_at')
+
+
+def global_leaders(limit=GLOBAL_LEADERBOARD_SIZE):
+    return (
+        UserStats.objects.select_related('user')
+        .filter(quiz_count__gt=0)
+        .order_by('-avg_score', '-quiz_count')[:limit]
+    )
+
+
+def quiz_leaders(quiz, limit=QUIZ_TOP_K):
+    return (
+        QuizTopScore.objects.select_related('user')
+        .filter(quiz=quiz)
+        .order_by(*QUIZ_RANKING)[:limit]
+    )
+
+
+def _add_user_totals(user_id, count, total):
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        quiz_count=F('quiz_count') + count,
+        total_score=F('total_score') + total,
+        avg_score=(Cast(F('total_score'), FloatField()) + total) / (F('quiz_count') + count),
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(
+                user_id=user_id, quiz_count=count, total_score=total, avg_score=total / count
+            )
+    except IntegrityError:
+        # Another request created the row first
+        _add_user_totals(user_id, count, total)
+
+
+def _add_top_scores(quiz_id, attempts):
+    entries = QuizTopScore.objects.filter(quiz_id=quiz_id)
+    cutoff = entries.order_by(*QUIZ_RANKING).values_list('score', flat=True)[QUIZ_TOP_K - 1:QUIZ_TOP_K]
+    cutoff = cutoff[0] if cutoff else None
+    # A tie with the current K-th score ranks below it (it was attempted later)
+    qualifying = [a for a in attempts if cutoff is None or a.score > cutoff]
+    if not qualifying:
+        return
+
+    QuizTopScore.objects.bulk_create([
+        QuizTopScore(
+            quiz_id=quiz_id,
+            attempt_id=attempt.pk,
+            user_id=attempt.user_id,
+            score=attempt.score,
+            attempted_at=attempt.attempted_at,
+        )
+        for attempt in qualifying
+    ])
+    keep = list(entries.order_by(*QUIZ_RANKING).values_list('id', flat=True)[:QUIZ_TOP_K])
+    entries.exclude(id__in=keep).delete()
+
+
+def record_attempts(attempts):
+    """Fold newly saved attempts into the leaderboard tables"""
+    attempts = [attempt for attempt in attempts if attempt.pk is not None]
+    user_totals = defaultdict(lambda: [0, 0])
+    by_quiz = defaultdict(list)
+    for attempt in attempts:
+        user_totals[attempt.user_id][0] += 1
+        user_totals[attempt.user_id][1] += attempt.score
+        by_quiz[attempt.quiz_id].append(attempt)
+
+    with transaction.atomic():
+        for user_id, (count, total) in user_totals.items():
+            _add_user_totals(user_id, count, total)
+        for quiz_id, quiz_attempts in by_quiz.items():
+            _add_top_scores(quiz_id, quiz_attempts)
+
+
+def remove_attempt(attempt, refill_top_scores=True):
+    """Take a deleted attempt back out of the leaderboard tables"""
+    with transaction.atomic():
+        user_stats = UserStats.objects.filter(user_id=attempt.user_id)
+        user_stats.filter(quiz_count__lte=1).delete()
+        user_stats.update(
+            quiz_count=F('quiz_count') - 1,
+            total_score=F('total_score') - attempt.score,
+            avg_score=(Cast(F('total_score'), FloatField()) - attempt.score) / (F('quiz_count') - 1),
+        )
+        # Its QuizTopScore row is removed by cascade; pull the next best
+        # attempt up if that left a gap
+        if refill_top_scores and QuizTopScore.objects.filter(quiz_id=attempt.quiz_id).count() < QUIZ_TOP_K:
+            rebuild_quiz_top_scores(attempt.quiz_id)
+
+
+def rebuild_quiz_top_scores(quiz_id):
+    QuizTopScore.objects.filter(quiz_id=quiz_id).delete()
+    best = QuizAttempt.objects.filter(quiz_id=quiz_id).order_by(*QUIZ_RANKING)[:QUIZ_TOP_K]
+    QuizTopScore.objects.bulk_create([
+        QuizTopScore(
+            quiz_id=quiz_id,
+            attempt_id=attempt.pk,
+            user_id=attempt.user_id,
+            score=attempt.score,
+            attempted_at=attempt.attempted_at,
+        )
+        for attempt in best
+    ])
+
+
+def rebuild(batch_size=1000):
+    """Recompute both leaderboard tables from the attempts table"""
+    with transaction.atomic():
+        UserStats.objects.all().delete()
+        totals = (
+            QuizAttempt.objects.values('user_id')
+            .annotate(quiz_count=Count('id'), total_score=Sum('score'), avg_score=Avg('score'))
+            .order_by()
+        )
+        UserStats.objects.bulk_create(
+            (UserStats(**row) for row in totals.iterator(chunk_size=batch_size)),
+            batch_size=batch_size,
+        )
+
+        QuizTopScore.objects.all().delete()
+        ranked = (
+            QuizAttempt.objects
+            .annotate(rank=Window(RowNumber(), partition_by=F('quiz_id'), order_by=[F('score').desc(), F('attempted_at').asc()]))
+            .filter(rank__lte=QUIZ_TOP_K)
+            .values('id', 'quiz_id', 'user_id', 'score', 'attempted_at')
+        )
+        QuizTopScore.objects.bulk_create(
+            (
+                QuizTopScore(
+                    quiz_id=row['quiz_id'],
+                    attempt_id=row['id'],
+                    user_id=row['user_id'],
+                    score=row['score'],
+                    attempted_at=row['attempted_at'],
+                )
+                for row in ranked.iterator(chunk_size=batch_size)
+            ),
+            batch_size=batch_size,
+        )
+    return UserStats.objects.count(), QuizTopScore.objects.count()
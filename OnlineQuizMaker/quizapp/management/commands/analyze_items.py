@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from quizapp import item_analysis
+
+
+class Command(BaseCommand):
+    help = "Fold quiz attempts added since the last run into the per-question statistics"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Start over from the first attempt (e.g. after attempts were deleted)",
+        )
+
+    def handle(self, *args, **options):
+        processed = item_analysis.run(batch_size=options['batch_size'], rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f"Analysed {processed} new attempts"))
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quizapp.models import Quiz
+from quizapp.transfer import EXPORT_CHUNK_SIZE, FORMATS, export_quizzes
+
+
+class Command(BaseCommand):
+    help = "Stream quizzes and their questions out as JSON Lines or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help="file to write, '-' for stdout")
+        parser.add_argument('--format', choices=FORMATS, help="defaults to the output file extension, else jsonl")
+        parser.add_argument('--user', help="only export quizzes created by this username")
+        parser.add_argument('--quiz', type=int, action='append', help="only export this quiz id (repeatable)")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or ('csv' if output.endswith('.csv') else 'jsonl')
+
+        quizzes = Quiz.objects.all()
+        if options['user']:
+            quizzes = quizzes.filter(created_by__username=options['user'])
+        if options['quiz']:
+            quizzes = quizzes.filter(id__in=options['quiz'])
+
+        lines = export_quizzes(quizzes, fmt, options['chunk_size'])
+        if output == '-':
+            for line in lines:
+                sys.stdout.write(line)
+            return
+        try:
+            with open(output, 'w', encoding='utf-8', newline='') as out:
+                out.writelines(lines)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stderr.write(self.style.SUCCESS(f"Exported to {output}"))
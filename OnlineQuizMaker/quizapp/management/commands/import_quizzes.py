@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from quizapp.bulk import BULK_BATCH_SIZE, PayloadError
+from quizapp.transfer import FORMATS, import_quizzes
+
+
+class Command(BaseCommand):
+    help = "Import quizzes and questions from a JSON Lines or CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="file to read")
+        parser.add_argument('--user', required=True, help="username that will own the imported quizzes")
+        parser.add_argument('--format', choices=FORMATS, help="defaults to the input file extension, else jsonl")
+        parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['input']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['user']}'")
+
+        try:
+            with open(path, encoding='utf-8', newline='') as lines:
+                quizzes, questions = import_quizzes(lines, user, fmt, options['batch_size'])
+        except (OSError, PayloadError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Imported {quizzes} quizzes with {questions} questions"))
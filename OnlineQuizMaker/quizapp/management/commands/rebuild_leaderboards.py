@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from quizapp import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the leaderboard tables from the existing quiz attempts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users, top_scores = leaderboard.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt leaderboards: {users} user rows, {top_scores} top score rows"
+        ))
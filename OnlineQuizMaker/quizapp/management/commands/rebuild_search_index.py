@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from quizapp import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from the quiz and question tables"
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            self.stdout.write("The database has no full-text index; search uses plain filters")
+            return
+        rows = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {rows} quizzes and questions"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from quizapp import stats
+from quizapp.models import SiteStats
+
+
+class Command(BaseCommand):
+    help = "Recount the site-wide statistics counters from the real tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report drift without writing the corrected counters",
+        )
+
+    def handle(self, *args, **options):
+        stored = SiteStats.objects.filter(pk=stats.STATS_PK).values(*stats.COUNTER_FIELDS).first() or {}
+        actual = stats.count_actual()
+
+        drift = False
+        for field in stats.COUNTER_FIELDS:
+            before = stored.get(field)
+            if before != actual[field]:
+                drift = True
+                self.stdout.write(f"{field}: {before} -> {actual[field]}")
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Site stats are up to date"))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry run, counters not changed"))
+            return
+
+        stats.reconcile(actual)
+        self.stdout.write(self.style.SUCCESS("Site stats reconciled"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quizapp.certificates import CertificateRenderer
+from quizapp.cohorts import render_cohort_timed, stream_cohort_zip
+from quizapp.models import Quiz
+
+
+class Command(BaseCommand):
+    help = "Render the certificates of every student who took a quiz, optionally into a ZIP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument('--output', help="also write the certificates to this ZIP file")
+        parser.add_argument('--workers', type=int, default=None, help="render processes (default: CERTIFICATE_RENDER_WORKERS)")
+        parser.add_argument('--min-score', type=int, default=0, help="only students whose best score reaches this")
+
+    def handle(self, *args, **options):
+        try:
+            quiz = Quiz.objects.get(id=options['quiz_id'])
+        except Quiz.DoesNotExist:
+            raise CommandError(f"Quiz {options['quiz_id']} does not exist")
+
+        renderer = None
+        if options['workers'] is not None:
+            renderer = CertificateRenderer(options['workers'])
+        try:
+            count, seconds = render_cohort_timed(quiz, options['min_score'], renderer)
+            if options['output']:
+                # Everything is on disk now, so this only copies files
+                with open(options['output'], 'wb') as out:
+                    for chunk in stream_cohort_zip(quiz, options['min_score'], renderer):
+                        out.write(chunk)
+        finally:
+            if renderer is not None:
+                renderer.shutdown()
+
+        rate = count / seconds if seconds else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {count} certificates for '{quiz.title}' in {seconds:.2f}s ({rate:.1f}/s)"
+        ))
@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quizapp.ingestion import JOURNAL_PREFIX, read_journal, write_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Write every journaled quiz attempt to the database. Run this only "
+        "while the web workers are stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spool-dir', default=settings.QUIZ_ATTEMPT_SPOOL_DIR)
+
+    def handle(self, *args, **options):
+        spool_dir = Path(options['spool_dir'])
+        written = 0
+        for path in sorted(spool_dir.glob(f"{JOURNAL_PREFIX}*.jsonl")):
+            records = read_journal(path)
+            count = write_records(records)
+            written += count
+            self.stdout.write(f"{path.name}: {len(records)} records, {count} written")
+            path.unlink()
+        for path in spool_dir.glob(f"{JOURNAL_PREFIX}*.lock"):
+            path.unlink()
+        self.stdout.write(self.style.SUCCESS(f"Replayed {written} quiz attempts"))
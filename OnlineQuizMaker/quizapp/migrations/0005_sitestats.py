@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizapp', '0004_question_explanation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_quizzes', models.BigIntegerField(default=0)),
+                ('total_questions', models.BigIntegerField(default=0)),
+                ('total_attempts', models.BigIntegerField(default=0)),
+                ('total_users', models.BigIntegerField(default=0)),
+                ('active_quizzes', models.BigIntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'site stats',
+            },
+        ),
+    ]
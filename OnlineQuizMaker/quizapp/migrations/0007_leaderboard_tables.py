@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('quizapp', '0006_quizattempt_ingest_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('quiz_count', models.IntegerField(default=0)),
+                ('total_score', models.BigIntegerField(default=0)),
+                ('avg_score', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'user stats',
+                'indexes': [models.Index(fields=['-avg_score', '-quiz_count'], name='userstats_ranking_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizTopScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField()),
+                ('attempted_at', models.DateTimeField()),
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='quizapp.quizattempt')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quizapp.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['quiz', '-score', 'attempted_at'], name='quiztopscore_ranking_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizapp', '0008_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedQuizCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('topic', models.CharField(max_length=200)),
+                ('difficulty', models.CharField(max_length=10)),
+                ('num_questions', models.IntegerField()),
+                ('prompt_version', models.CharField(max_length=16)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('hit_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'generated quiz cache entries',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizapp', '0010_attempt_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attemptsession',
+            name='question_ids',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='question_bank',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+CREATE = """
+CREATE VIRTUAL TABLE quizapp_search USING fts5(
+    quiz_id UNINDEXED,
+    title,
+    description,
+    question,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# rowid 2 * quiz id holds a quiz's title and description, 2 * question id + 1
+# one question's text
+POPULATE = [
+    "INSERT INTO quizapp_search (rowid, quiz_id, title, description, question) "
+    "SELECT 2 * id, id, title, description, '' FROM quizapp_quiz",
+    "INSERT INTO quizapp_search (rowid, quiz_id, title, description, question) "
+    "SELECT 2 * id + 1, quiz_id, '', '', question_text FROM quizapp_question",
+]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE)
+    for statement in POPULATE:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS quizapp_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizapp', '0012_item_analysis'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
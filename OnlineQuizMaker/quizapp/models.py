@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Quiz(models.Model):
     DIFFICULTY_CHOICES = [
@@ -18,10 +21,20 @@ class Quiz(models.Model):
     number_of_questions = models.IntegerField(default=15)
     time_limit = models.IntegerField(default=10, help_text="Time limit in minutes")
     has_time_limit = models.BooleanField(default=False)
+    # Question-bank mode: each attempt draws number_of_questions at random
+    question_bank = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     
+    class Meta:
+        indexes = [
+            # Home catalog keyset pagination
+            models.Index(fields=['-created_at', '-id'], name='quiz_catalog_idx'),
+            # My quizzes
+            models.Index(fields=['created_by', '-created_at'], name='quiz_creator_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.title} ({self.difficulty})"
 
@@ -35,6 +48,12 @@ class Question(models.Model):
     correct_option = models.IntegerField(choices=[(1, 'Option 1'), (2, 'Option 2'), (3, 'Option 3'), (4, 'Option 4')])
     explanation = models.TextField(blank=True, null=True)  # Added explanation field
     
+    class Meta:
+        indexes = [
+            # Questions of a quiz in order, covering the answer key columns
+            models.Index(fields=['quiz', 'id', 'correct_option'], name='question_quiz_order_idx'),
+        ]
+    
     def __str__(self):
         return self.question_text[:50]
 
@@ -42,7 +61,180 @@ class QuizAttempt(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     score = models.IntegerField()
-    attempted_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add so write-behind ingestion can keep the submission time
+    attempted_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Set by write-behind ingestion so journal replays are idempotent
+    ingest_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # Every question shown and the option picked, packed by item_analysis.pack_answers
+    answers = models.BinaryField(null=True, blank=True, editable=False)
+    # Set once the item analysis job has folded the attempt into QuestionStats
+    analyzed = models.BooleanField(default=False, editable=False)
     
+    class Meta:
+        indexes = [
+            # Quiz leaderboard
+            models.Index(fields=['quiz', '-score', 'attempted_at'], name='attempt_quiz_rank_idx'),
+            # Profile recent activity
+            models.Index(fields=['user', '-attempted_at'], name='attempt_user_recent_idx'),
+            # Best attempt of a user on a quiz, for certificates
+            models.Index(fields=['quiz', 'user', '-score', '-attempted_at'], name='attempt_user_best_idx'),
+            # Attempts the item analysis job has yet to read; stays small
+            models.Index(fields=['id'], condition=models.Q(analyzed=False), name='attempt_unanalyzed_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz.title}"
+
+class SiteStats(models.Model):
+    """Single-row table of site-wide counters, kept current by signals"""
+    total_quizzes = models.BigIntegerField(default=0)
+    total_questions = models.BigIntegerField(default=0)
+    total_attempts = models.BigIntegerField(default=0)
+    total_users = models.BigIntegerField(default=0)
+    active_quizzes = models.BigIntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'site stats'
+
+    def __str__(self):
+        return f"Site stats ({self.total_quizzes} quizzes, {self.total_attempts} attempts)"
+
+
+class UserStats(models.Model):
+    """Per-user attempt totals for the global leaderboard"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    quiz_count = models.IntegerField(default=0)
+    total_score = models.BigIntegerField(default=0)
+    avg_score = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'user stats'
+        indexes = [
+            models.Index(fields=['-avg_score', '-quiz_count'], name='userstats_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.quiz_count} quizzes, avg {self.avg_score:.1f}"
+
+
+class QuizTopScore(models.Model):
+    """One of the best K attempts of a quiz, for the quiz leaderboard"""
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    score = models.IntegerField()
+    attempted_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quiz', '-score', 'attempted_at'], name='quiztopscore_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quiz.title}: {self.user.username} ({self.score})"
+
+
+class GeneratedQuizCacheEntry(models.Model):
+    """A stored AI generation result, keyed by normalized request and prompt version"""
+    key = models.CharField(max_length=64, unique=True)
+    topic = models.CharField(max_length=200)
+    difficulty = models.CharField(max_length=10)
+    num_questions = models.IntegerField()
+    prompt_version = models.CharField(max_length=16)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    hit_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'generated quiz cache entries'
+
+    def __str__(self):
+        return f"{self.topic} ({self.difficulty}, {self.num_questions})"
+
+
+class AttemptSession(models.Model):
+    """A quiz being taken: server-side start time, deadline and autosaved answers"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    started_at = models.DateTimeField(default=timezone.now)
+    # None when the quiz has no time limit
+    deadline = models.DateTimeField(null=True, blank=True)
+    # {"<question id>": <option>}, last flushed from the cache
+    answers = models.JSONField(default=dict)
+    answers_saved_at = models.DateTimeField(null=True, blank=True)
+    # Question ids drawn for this attempt in question-bank mode, else None
+    question_ids = models.JSONField(null=True, blank=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    attempt = models.OneToOneField(QuizAttempt, null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        indexes = [
+            # Open session of a user on a quiz, to resume it
+            models.Index(fields=['user', 'quiz', 'submitted_at'], name='attemptsession_open_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz.title} ({self.started_at:%Y-%m-%d %H:%M})"
+
+
+class QuestionStats(models.Model):
+    """
+    Item statistics of a question, accumulated by the item analysis job.
+
+    Only running sums are stored, so new attempts can be folded in without
+    rereading old ones; the statistics are derived from them.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
+    responses = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    # Times each choice was picked: [left blank, option 1, ..., option 4]
+    option_counts = models.JSONField(default=list)
+    # Sums of the attempts' score fraction (score / questions shown), for discrimination
+    score_sum = models.FloatField(default=0)
+    score_sq_sum = models.FloatField(default=0)
+    correct_score_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'question stats'
+
+    @property
+    def difficulty(self):
+        """Share of responses that were correct (the classical p-value)"""
+        return self.correct / self.responses if self.responses else None
+
+    @property
+    def discrimination(self):
+        """Point-biserial correlation between getting this right and the attempt score"""
+        n, right = self.responses, self.correct
+        if not n or right in (0, n):
+            return None
+        mean = self.score_sum / n
+        variance = self.score_sq_sum / n - mean * mean
+        if variance <= 1e-12:
+            return None
+        mean_right = self.correct_score_sum / right
+        mean_wrong = (self.score_sum - self.correct_score_sum) / (n - right)
+        p = right / n
+        return (mean_right - mean_wrong) / variance ** 0.5 * (p * (1 - p)) ** 0.5
+
+    @property
+    def option_frequencies(self):
+        """Share of responses per choice, [left blank, option 1, ..., option 4]"""
+        counts = self.option_counts or [0] * 5
+        return [count / self.responses if self.responses else 0.0 for count in counts]
+
+    def __str__(self):
+        return f"Stats for question {self.question_id} ({self.responses} responses)"
+
+
+class ItemAnalysisState(models.Model):
+    """Single row locked by each item analysis run, with when it last ran"""
+    run_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
-        return f"{self.user.username} - {self.quiz.title}"
\ No newline at end of file
+        return f"Item analysis run at {self.run_at}"
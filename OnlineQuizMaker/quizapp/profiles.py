@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Avg, Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, When
+from django.db.models.functions import Coalesce, Least
+
+from .models import Quiz, Question, QuizAttempt
+
+PROFILE_STATS_TIMEOUT = 60 * 60
+RECENT_ATTEMPTS = 5
+
+
+def profile_stats_cache_key(user_id):
+    return f"quizapp:profile_stats:{user_id}"
+
+
+def _scalar(queryset, group_field, aggregate, output_field):
+    """A correlated scalar subquery aggregating queryset per outer row"""
+    return Subquery(
+        queryset.order_by().values(group_field).annotate(value=aggregate).values('value'),
+        output_field=output_field,
+    )
+
+
+def compute_profile_stats(user_id):
+    """All profile statistics of a user in a single query, read from the primary since they are cached"""
+    attempts = QuizAttempt.objects.filter(user=OuterRef('pk'))
+    created = Quiz.objects.filter(created_by=OuterRef('pk'))
+    return User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).annotate(
+        total_quizzes_taken=Coalesce(_scalar(attempts, 'user', Count('id'), IntegerField()), 0),
+        average_score=Coalesce(_scalar(attempts, 'user', Avg('score'), FloatField()), 0.0),
+        total_quizzes_created=Coalesce(_scalar(created, 'created_by', Count('id'), IntegerField()), 0),
+    ).values('total_quizzes_taken', 'average_score', 'total_quizzes_created').get()
+
+
+def get_profile_stats(user_id):
+    key = profile_stats_cache_key(user_id)
+    profile_stats = cache.get(key)
+    if profile_stats is None:
+        profile_stats = compute_profile_stats(user_id)
+        cache.set(key, profile_stats, PROFILE_STATS_TIMEOUT)
+    return profile_stats
+
+
+def invalidate_profile_stats(user_id):
+    cache.delete(profile_stats_cache_key(user_id))
+
+
+def recent_attempts(user_id, limit=RECENT_ATTEMPTS):
+    """Latest attempts with their quiz joined and the questions they were out of annotated"""
+    question_count = Coalesce(
+        _scalar(Question.objects.filter(quiz=OuterRef('quiz_id')), 'quiz', Count('id'), IntegerField()), 0
+    )
+    # Question-bank attempts draw number_of_questions from a larger bank
+    question_total = Case(
+        When(quiz__question_bank=True, quiz__number_of_questions__gt=0,
+             then=Least(question_count, F('quiz__number_of_questions'))),
+        default=question_count,
+    )
+    return (
+        QuizAttempt.objects.filter(user_id=user_id)
+        .select_related('quiz')
+        .annotate(question_total=question_total)
+        .order_by('-attempted_at')[:limit]
+    )
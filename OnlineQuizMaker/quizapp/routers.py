@@ -0,0 +1,149 @@
+"""
+Read-replica routing.
+
+Writes always go to the primary ('default'). Reads of quizapp tables go to
+the REPLICA_DATABASE alias only inside views marked @replica_reads, which
+must not read-then-write. Everything else, and every read inside a
+transaction or after the request has written, stays on the primary.
+
+A request that writes pins its client to the primary for
+REPLICA_PIN_SECONDS through a cookie, so someone who just submitted a quiz
+sees their own attempt on the next page even before the replica catches
+up. Sessions and users are always read from the primary, so a stale
+replica never logs anyone out. Whatever fills the shared cache (answer
+keys, quiz fragments, profile stats) reads the primary with
+.using(DEFAULT_DB_ALIAS), since a stale replica read cached after a write
+invalidated it would outlive the write.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+REPLICA_APPS = {'quizapp'}
+
+_state = ContextVar('quizapp_replica_routing', default=None)
+
+
+class _RoutingState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            settings.REPLICA_DATABASE
+            and state is not None
+            and state.replica_reads
+            and not state.pinned
+            and not state.wrote
+            and model._meta.app_label in REPLICA_APPS
+            # Reads inside a transaction must see its writes
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return settings.REPLICA_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db != settings.REPLICA_DATABASE
+
+
+def replica_reads(view):
+    """Let a read-only view read quizapp tables from the replica"""
+
+    def route():
+        state = _state.get()
+        if state is not None:
+            state.replica_reads = True
+        return state
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            state = route()
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                if state is not None:
+                    state.replica_reads = False
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = route()
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            if state is not None:
+                state.replica_reads = False
+    return wrapper
+
+
+def _is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _pin(response):
+    expires = time.time() + settings.REPLICA_PIN_SECONDS
+    response.set_cookie(
+        PIN_COOKIE, f"{expires:.0f}", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+    )
+
+
+class PrimaryPinMiddleware:
+    """Tracks writes per request and pins clients that wrote to the primary"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = _RoutingState(_is_pinned(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and settings.REPLICA_DATABASE:
+            _pin(response)
+        return response
+
+    async def __acall__(self, request):
+        state = _RoutingState(_is_pinned(request))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and settings.REPLICA_DATABASE:
+            _pin(response)
+        return response
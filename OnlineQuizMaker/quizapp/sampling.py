@@ -0,0 +1,71 @@
+"""
+Question-bank mode: each attempt draws number_of_questions at random.
+
+The draw is made from the quiz's cached answer key (question ids only),
+so neither ORDER BY RANDOM() nor a load of the whole bank is needed; only
+the drawn rows are fetched to render the page. The drawn ids are kept on
+the attempt session (or, for anonymous visitors, in a signed form field),
+and grading looks only at those entries of the answer key.
+"""
+import random
+
+from django.conf import settings
+from django.core import signing
+
+from .answer_keys import get_answer_key
+
+DRAW_SALT = 'quizapp.sampling.draw'
+
+
+def uses_bank(quiz, answer_key=None):
+    """True if attempts at this quiz get a random subset of its questions"""
+    if not quiz.question_bank:
+        return False
+    answer_key = get_answer_key(quiz.id) if answer_key is None else answer_key
+    return 0 < quiz.number_of_questions < len(answer_key)
+
+
+def questions_per_attempt(quiz, answer_key=None):
+    """How many questions one attempt is graded out of"""
+    answer_key = get_answer_key(quiz.id) if answer_key is None else answer_key
+    if uses_bank(quiz, answer_key):
+        return quiz.number_of_questions
+    return len(answer_key)
+
+
+def draw_question_ids(quiz, rng=random):
+    """A random sample of question ids for one attempt, or None to serve them all"""
+    answer_key = get_answer_key(quiz.id)
+    if not uses_bank(quiz, answer_key):
+        return None
+    return rng.sample([question_id for question_id, _ in answer_key], quiz.number_of_questions)
+
+
+def restrict_answer_key(answer_key, question_ids):
+    """The entries of the answer key for the drawn questions only"""
+    if question_ids is None:
+        return answer_key
+    drawn = set(question_ids)
+    return [(question_id, correct) for question_id, correct in answer_key if question_id in drawn]
+
+
+def sign_draw(quiz_id, question_ids):
+    return signing.dumps([quiz_id, question_ids], salt=DRAW_SALT, compress=True)
+
+
+def draw_max_age(quiz):
+    """Seconds a signed draw stays valid: the time limit plus grace, if the quiz has one"""
+    if quiz.has_time_limit:
+        return quiz.time_limit * 60 + settings.ATTEMPT_SESSION_GRACE
+    return settings.QUESTION_DRAW_MAX_AGE
+
+
+def unsign_draw(quiz, token):
+    """The question ids from sign_draw, or None if the token is missing, expired or forged"""
+    try:
+        signed_quiz_id, question_ids = signing.loads(token, salt=DRAW_SALT, max_age=draw_max_age(quiz))
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if signed_quiz_id != quiz.id:
+        return None
+    return question_ids
@@ -0,0 +1,202 @@
+"""
+Full-text search over quiz titles, descriptions and question text.
+
+On SQLite the text lives in the quizapp_search FTS5 table (migration
+0013): one row per quiz (rowid 2 * id) and one per question (rowid
+2 * id + 1), kept current by signals and by the bulk insert paths. A
+search ranks quizzes by their best-matching row with bm25, title matches
+weighing most, and pages by a keyset cursor on (rank, quiz id). Other
+databases fall back to icontains filters.
+"""
+import base64
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .catalog import CATALOG_PAGE_SIZE, catalog_queryset, decode_cursor, encode_cursor
+from .models import Quiz, Question
+
+MAX_TERMS = 8
+
+# bm25 column weights: quiz_id, title, description, question
+RANK = "bm25(quizapp_search, 0.0, 10.0, 4.0, 1.0)"
+
+
+def _write_connection():
+    return connections[router.db_for_write(Question)]
+
+
+def enabled(connection=None):
+    return (connection or _write_connection()).vendor == 'sqlite'
+
+
+def search_terms(text):
+    """Lowercased word tokens of a query, at most MAX_TERMS"""
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def fts_query(terms):
+    """FTS5 MATCH expression: all terms must appear, the last one as a prefix"""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+# Index maintenance
+
+def index_quiz(quiz):
+    connection = _write_connection()
+    if not enabled(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM quizapp_search WHERE rowid = %s", [2 * quiz.pk])
+        cursor.execute(
+            "INSERT INTO quizapp_search (rowid, quiz_id, title, description, question) VALUES (%s, %s, %s, %s, '')",
+            [2 * quiz.pk, quiz.pk, quiz.title, quiz.description],
+        )
+
+
+def index_questions(questions):
+    connection = _write_connection()
+    if not questions or not enabled(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "DELETE FROM quizapp_search WHERE rowid = %s",
+            [[2 * question.pk + 1] for question in questions],
+        )
+        cursor.executemany(
+            "INSERT INTO quizapp_search (rowid, quiz_id, title, description, question) VALUES (%s, %s, '', '', %s)",
+            [[2 * question.pk + 1, question.quiz_id, question.question_text] for question in questions],
+        )
+
+
+def remove_quiz(quiz_id):
+    connection = _write_connection()
+    if enabled(connection):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM quizapp_search WHERE rowid = %s", [2 * quiz_id])
+
+
+def remove_question(question_id):
+    connection = _write_connection()
+    if enabled(connection):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM quizapp_search WHERE rowid = %s", [2 * question_id + 1])
+
+
+def rebuild():
+    """Rebuild the whole index from the quiz and question tables"""
+    connection = _write_connection()
+    if not enabled(connection):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM quizapp_search")
+        cursor.execute(
+            "INSERT INTO quizapp_search (rowid, quiz_id, title, description, question) "
+            "SELECT 2 * id, id, title, description, '' FROM quizapp_quiz"
+        )
+        cursor.execute(
+            "INSERT INTO quizapp_search (rowid, quiz_id, title, description, question) "
+            "SELECT 2 * id + 1, quiz_id, '', '', question_text FROM quizapp_question"
+        )
+        cursor.execute("INSERT INTO quizapp_search (quizapp_search) VALUES ('optimize')")
+        cursor.execute("SELECT count(*) FROM quizapp_search")
+        return cursor.fetchone()[0]
+
+
+# Queries
+
+def _encode_rank_cursor(rank, quiz_id):
+    return base64.urlsafe_b64encode(f"{rank!r}|{quiz_id}".encode()).decode()
+
+
+def _decode_rank_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        rank, quiz_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return float(rank), int(quiz_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def _ranked_quiz_ids(connection, terms, difficulty, position, limit):
+    # bm25() cannot be used inside an aggregate, so matching rows are ranked
+    # in a materialized CTE and folded to each quiz's best rank outside it
+    sql = [
+        "WITH hits AS MATERIALIZED (",
+        f"SELECT rowid, quiz_id, {RANK} AS rank FROM quizapp_search WHERE quizapp_search MATCH %s)",
+        "SELECT hits.quiz_id, MIN(hits.rank) AS score, SUM(hits.rowid %% 2) AS question_hits FROM hits",
+    ]
+    params = [fts_query(terms)]
+    if difficulty:
+        sql.append("JOIN quizapp_quiz ON quizapp_quiz.id = hits.quiz_id AND quizapp_quiz.difficulty = %s")
+        params.append(difficulty)
+    sql.append("GROUP BY hits.quiz_id")
+    if position:
+        sql.append("HAVING score > %s OR (score = %s AND hits.quiz_id > %s)")
+        params.extend([position[0], position[0], position[1]])
+    sql.append("ORDER BY score, hits.quiz_id LIMIT %s")
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(' '.join(sql), params)
+        return cursor.fetchall()
+
+
+def search_quizzes(text, difficulty=None, cursor=None, page_size=CATALOG_PAGE_SIZE):
+    """
+    Return (quizzes, next_cursor) for a search, best match first.
+
+    Quizzes come from catalog_queryset (creator and question count loaded)
+    with `question_hits`, the number of their questions that matched.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return [], None
+
+    connection = connections[router.db_for_read(Quiz)]
+    if not enabled(connection):
+        return _search_fallback(terms, difficulty, cursor, page_size)
+
+    rows = _ranked_quiz_ids(connection, terms, difficulty, _decode_rank_cursor(cursor), page_size + 1)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_rank_cursor(rows[-1][1], rows[-1][0])
+
+    quizzes = catalog_queryset().in_bulk([quiz_id for quiz_id, _, _ in rows])
+    results = []
+    for quiz_id, _, question_hits in rows:
+        # An index row can briefly outlive its quiz
+        quiz = quizzes.get(quiz_id)
+        if quiz is not None:
+            quiz.question_hits = question_hits
+            results.append(quiz)
+    return results, next_cursor
+
+
+def _search_fallback(terms, difficulty, cursor, page_size):
+    """Unranked icontains search, newest first, for databases without FTS5"""
+    quizzes = catalog_queryset()
+    for term in terms:
+        matching_questions = Question.objects.filter(question_text__icontains=term).values('quiz_id')
+        quizzes = quizzes.filter(
+            Q(title__icontains=term) | Q(description__icontains=term) | Q(id__in=matching_questions)
+        )
+    if difficulty:
+        quizzes = quizzes.filter(difficulty=difficulty)
+    position = decode_cursor(cursor)
+    if position:
+        created_at, quiz_id = position
+        quizzes = quizzes.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=quiz_id))
+
+    page = list(quizzes[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1])
+    for quiz in page:
+        quiz.question_hits = None
+    return page, next_cursor
@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import leaderboard, search, stats
+from .answer_keys import invalidate_answer_key
+from .fragments import bump_quiz_version
+from .models import Quiz, Question, QuizAttempt
+from .profiles import invalidate_profile_stats
+
+
+def _emptied_quizzes(origin):
+    """
+    Quiz ids already counted as no longer active during one delete() call.
+
+    A cascading delete removes all of a quiz's questions in one batch before
+    any post_delete signal is sent, so every one of them sees an empty quiz.
+    Remembering the ids on the delete origin keeps that to a single decrement.
+    """
+    if origin is None:
+        return set()
+    if not hasattr(origin, '_stats_emptied_quizzes'):
+        origin._stats_emptied_quizzes = set()
+    return origin._stats_emptied_quizzes
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_saved(sender, instance, created, **kwargs):
+    bump_quiz_version(instance.pk)
+    search.index_quiz(instance)
+    if created:
+        stats.adjust(total_quizzes=1)
+        invalidate_profile_stats(instance.created_by_id)
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_deleted(sender, instance, **kwargs):
+    bump_quiz_version(instance.pk)
+    search.remove_quiz(instance.pk)
+    stats.adjust(total_quizzes=-1)
+    invalidate_profile_stats(instance.created_by_id)
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, **kwargs):
+    invalidate_answer_key(instance.quiz_id)
+    bump_quiz_version(instance.quiz_id)
+    search.index_questions([instance])
+    if created:
+        stats.questions_added(instance.quiz_id, 1)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, origin=None, **kwargs):
+    invalidate_answer_key(instance.quiz_id)
+    bump_quiz_version(instance.quiz_id)
+    search.remove_question(instance.pk)
+    deltas = {'total_questions': -1}
+    emptied = _emptied_quizzes(origin)
+    if instance.quiz_id not in emptied and not Question.objects.filter(quiz_id=instance.quiz_id).exists():
+        emptied.add(instance.quiz_id)
+        deltas['active_quizzes'] = -1
+    stats.adjust(**deltas)
+
+
+@receiver(post_save, sender=QuizAttempt)
+def attempt_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(total_attempts=1)
+        leaderboard.record_attempts([instance])
+        invalidate_profile_stats(instance.user_id)
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def attempt_deleted(sender, instance, origin=None, **kwargs):
+    stats.adjust(total_attempts=-1)
+    invalidate_profile_stats(instance.user_id)
+    # No point refilling the top scores of a quiz that is being deleted
+    leaderboard.remove_attempt(instance, refill_top_scores=not isinstance(origin, Quiz))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(total_users=1)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    stats.adjust(total_users=-1)
@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Quiz, Question, QuizAttempt, SiteStats
+
+STATS_PK = 1
+
+COUNTER_FIELDS = (
+    'total_quizzes',
+    'total_questions',
+    'total_attempts',
+    'total_users',
+    'active_quizzes',
+)
+
+
+def count_actual():
+    """Count everything from the real tables (slow, used for reconciling)"""
+    return {
+        'total_quizzes': Quiz.objects.count(),
+        'total_questions': Question.objects.count(),
+        'total_attempts': QuizAttempt.objects.count(),
+        'total_users': User.objects.count(),
+        'active_quizzes': Quiz.objects.filter(question__isnull=False).distinct().count(),
+    }
+
+
+def reconcile(values=None):
+    """Overwrite the counters with exact values from the real tables"""
+    if values is None:
+        values = count_actual()
+    stats, _ = SiteStats.objects.update_or_create(
+        pk=STATS_PK,
+        defaults={**values, 'reconciled_at': timezone.now()},
+    )
+    return stats
+
+
+def get_site_stats():
+    """Return all counters as a dict with a single primary-key lookup"""
+    stats = SiteStats.objects.filter(pk=STATS_PK).values(*COUNTER_FIELDS).first()
+    if stats is None:
+        stats = {field: getattr(reconcile(), field) for field in COUNTER_FIELDS}
+    return stats
+
+
+def adjust(**deltas):
+    """Apply counter deltas atomically, e.g. adjust(total_quizzes=1)"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = SiteStats.objects.filter(pk=STATS_PK).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated:
+        # No counters row yet: build it from the tables, which already
+        # include this change
+        reconcile()
+
+
+def questions_added(quiz_id, count):
+    """
+    Account for `count` new questions on a quiz.
+
+    Signals are not sent for bulk_create, so bulk insert paths call this
+    directly after inserting.
+    """
+    has_older = Question.objects.filter(quiz_id=quiz_id).count() > count
+    adjust(total_questions=count, active_quizzes=0 if has_older else 1)
@@ -0,0 +1,28 @@
+"""
+Test runner that keeps the suite's side effects out of the working tree.
+"""
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class QuizTestRunner(DiscoverRunner):
+    """
+    Runs the suite with certificates written to a temporary directory and
+    no pre-rendering, so taking a quiz in a test neither starts a process
+    pool nor leaves PDFs in CERTIFICATE_DIR.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._certificate_dir = tempfile.TemporaryDirectory()
+        self._overrides = override_settings(
+            CERTIFICATE_DIR=self._certificate_dir.name, CERTIFICATE_PRERENDER=False,
+        )
+        self._overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._overrides.disable()
+        self._certificate_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
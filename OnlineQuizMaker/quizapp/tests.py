@@ -1,3 +1,1403 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import ai_views, attempt_sessions, certificates, checks, cohorts, fragments, ingestion, instrumentation, item_analysis, leaderboard, routers, sampling, search, stats
+from .ai_cache import QuizResultCache
+from .ai_quiz_generator import AIQuizGenerator
+from .ai_streaming import QuestionStreamParser
+from .bulk import PayloadError
+from .answer_keys import answer_key_cache_key, get_answer_key
+from .catalog import CATALOG_PAGE_SIZE, get_catalog_page
+from .models import (
+    AttemptSession, GeneratedQuizCacheEntry, Quiz, Question, QuestionStats, QuizAttempt, QuizTopScore, SiteStats,
+    UserStats,
+)
+from .profiles import get_profile_stats, profile_stats_cache_key
+from .transfer import export_quizzes, import_quizzes
+
+
+def make_question(quiz, correct_option=1, **kwargs):
+    return Question.objects.create(
+        quiz=quiz,
+        question_text=kwargs.pop('question_text', 'What is 2 + 2?'),
+        option1='4', option2='3', option3='5', option4='22',
+        correct_option=correct_option,
+        **kwargs
+    )
+
+
+def fake_quiz_json(num_questions, title="Fake Quiz"):
+    return json.dumps({
+        "quiz_title": title,
+        "questions": [
+            {
+                "question_text": f"Fake question {i}?",
+                "options": ["A", "B", "C", "D"],
+                "correct_answer": i % 4,
+                "explanation": "Because.",
+            }
+            for i in range(num_questions)
+        ],
+    })
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for genai.GenerativeModel"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _num_questions(self, prompt):
+        return int(prompt.split("EXACTLY ", 1)[1].split()[0])
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+        text = fake_quiz_json(self._num_questions(prompt))
+        if stream:
+            return [FakeResponse(text[i:i + 7]) for i in range(0, len(text), 7)]
+        return FakeResponse(text)
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return FakeResponse(fake_quiz_json(self._num_questions(prompt)))
+
+
+class HomeCatalogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass12345')
+
+    def make_quizzes(self, count, questions_per_quiz=2):
+        quizzes = []
+        for i in range(count):
+            quiz = Quiz.objects.create(
+                title=f"Quiz {i}", description="desc", created_by=self.user
+            )
+            for _ in range(questions_per_quiz):
+                make_question(quiz)
+            quizzes.append(quiz)
+        return quizzes
+
+    def test_query_count_does_not_grow_with_catalog(self):
+        self.make_quizzes(3)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('home'))
+
+        self.make_quizzes(CATALOG_PAGE_SIZE * 2)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['quizzes']), CATALOG_PAGE_SIZE)
+
+    def test_question_counts_are_annotated(self):
+        self.make_quizzes(1, questions_per_quiz=3)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['quizzes'][0].question_count, 3)
+
+    def test_cursor_walks_every_quiz_once(self):
+        created = self.make_quizzes(CATALOG_PAGE_SIZE + 5, questions_per_quiz=0)
+        # Force identical timestamps so the id tiebreaker is exercised
+        Quiz.objects.update(created_at=created[0].created_at)
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = get_catalog_page(cursor)
+            seen.extend(quiz.id for quiz in page)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(quiz.id for quiz in created))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        self.make_quizzes(2, questions_per_quiz=0)
+        response = self.client.get(reverse('home'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['quizzes']), 2)
+
+
+class SiteStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass12345')
+        self.quiz = Quiz.objects.create(title="Quiz", description="desc", created_by=self.user)
+
+    def test_counters_follow_creates(self):
+        make_question(self.quiz)
+        make_question(self.quiz)
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.user, score=1)
+        self.assertEqual(stats.get_site_stats(), stats.count_actual())
+        self.assertEqual(stats.get_site_stats()['active_quizzes'], 1)
+
+    def test_counters_follow_cascading_deletes(self):
+        make_question(self.quiz)
+        make_question(self.quiz)
+        other = Quiz.objects.create(title="Other", description="desc", created_by=self.user)
+        make_question(other)
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.user, score=2)
+
+        self.quiz.delete()
+        self.assertEqual(stats.get_site_stats(), stats.count_actual())
+
+        Question.objects.filter(quiz=other).delete()
+        self.assertEqual(stats.get_site_stats()['active_quizzes'], 0)
+
+        self.user.delete()
+        self.assertEqual(stats.get_site_stats(), stats.count_actual())
+
+    def test_reconcile_command_fixes_drift(self):
+        SiteStats.objects.filter(pk=stats.STATS_PK).update(total_quizzes=99, active_quizzes=7)
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        self.assertIn('total_quizzes: 99 -> 1', out.getvalue())
+        self.assertEqual(stats.get_site_stats(), stats.count_actual())
+
+
+class AnswerKeyGradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('teacher', password='pass12345')
+        self.quiz = Quiz.objects.create(title="Quiz", description="desc", created_by=self.user)
+        self.q1 = make_question(self.quiz, correct_option=1)
+        self.q2 = make_question(self.quiz, correct_option=3)
+
+    def test_grading_reads_no_questions_when_key_is_cached(self):
+        get_answer_key(self.quiz.id)
+        answers = {f'question_{self.q1.id}': '1', f'question_{self.q2.id}': '2'}
+        # Only the quiz itself is fetched
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('take_quiz', args=[self.quiz.id]), answers)
+        self.assertEqual(response.context['score'], 1)
+        self.assertEqual(response.context['total'], 2)
+
+    def test_malformed_answers_score_zero(self):
+        answers = {f'question_{self.q1.id}': 'abc'}
+        response = self.client.post(reverse('take_quiz', args=[self.quiz.id]), answers)
+        self.assertEqual(response.context['score'], 0)
+
+    def test_question_changes_invalidate_key(self):
+        self.assertEqual(len(get_answer_key(self.quiz.id)), 2)
+        self.q2.correct_option = 4
+        self.q2.save()
+        self.assertIsNone(cache.get(answer_key_cache_key(self.quiz.id)))
+        self.assertIn((self.q2.id, 4), get_answer_key(self.quiz.id))
+
+        self.q1.delete()
+        self.assertEqual(get_answer_key(self.quiz.id), [(self.q2.id, 4)])
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        self.assertEqual([error.id for error in checks.check_shared_cache(None)], ['quizapp.E001'])
+        redis = {'default': {'BACKEND': 'quizapp.instrumentation.InstrumentedRedisCache', 'LOCATION': 'redis://cache:6379/0'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+
+class AttemptIngestionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='pass12345')
+        self.quiz = Quiz.objects.create(title="Quiz", description="desc", created_by=self.user)
+        self.spool_dir = tempfile.mkdtemp()
+
+    def make_ingestor(self):
+        return ingestion.AttemptIngestor(self.spool_dir, batch_size=2, start_thread=False)
+
+    def test_flush_writes_queued_attempts_in_bulk(self):
+        ingestor = self.make_ingestor()
+        for score in (1, 2, 3):
+            self.assertTrue(ingestor.submit(self.quiz.id, self.user.id, score))
+        self.assertEqual(QuizAttempt.objects.count(), 0)
+
+        self.assertEqual(ingestor.flush(), 3)
+        self.assertEqual(sorted(QuizAttempt.objects.values_list('score', flat=True)), [1, 2, 3])
+        self.assertEqual(stats.get_site_stats()['total_attempts'], 3)
+        ingestor.shutdown()
+
+    def test_unflushed_journal_is_replayed_once(self):
+        crashed = self.make_ingestor()
+        crashed.submit(self.quiz.id, self.user.id, 5)
+        crashed.submit(self.quiz.id, self.user.id, 4)
+        # Simulate the process dying: its lock goes away, its queue is lost
+        crashed._lock_file.close()
+
+        journal = crashed._journal_path
+        records = ingestion.read_journal(journal)
+        self.assertEqual(ingestion.write_records(records[:1]), 1)
+
+        recovered = self.make_ingestor()
+        self.assertEqual(QuizAttempt.objects.count(), 2)
+        self.assertFalse(journal.exists())
+        recovered.shutdown()
+
+    def test_full_queue_falls_back_to_direct_save(self):
+        ingestor = ingestion.AttemptIngestor(self.spool_dir, max_queue=0, start_thread=False)
+        with mock.patch.object(ingestion, '_ingestor', ingestor), \
+                override_settings(QUIZ_ATTEMPT_INGESTION='batched'):
+            attempt = ingestion.record_attempt(self.quiz, self.user, 1)
+        self.assertIsNotNone(attempt.pk)
+        ingestor.shutdown()
+
+    def test_take_quiz_queues_session_attempts_in_batched_mode(self):
+        ingestor = self.make_ingestor()
+        self.client.login(username='student', password='pass12345')
+        with mock.patch.object(ingestion, '_ingestor', ingestor), \
+                override_settings(QUIZ_ATTEMPT_INGESTION='batched'):
+            url = reverse('take_quiz', args=[self.quiz.id])
+            session = self.client.get(url).context['session']
+            self.assertEqual(self.client.post(url, {'session_id': session.id}).status_code, 200)
+        self.assertEqual(ingestor.pending_count(), 1)
+        session.refresh_from_db()
+        self.assertIsNotNone(session.submitted_at)
+        self.assertIsNone(session.attempt)
+
+        ingestor.shutdown()
+        session.refresh_from_db()
+        self.assertEqual(session.attempt, QuizAttempt.objects.get(user=self.user, ingest_id=session.id))
+
+
+class LeaderboardTableTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pass12345')
+        self.bob = User.objects.create_user('bob', password='pass12345')
+        self.quiz = Quiz.objects.create(title="Quiz", description="desc", created_by=self.alice)
+
+    def snapshot(self):
+        users = sorted(UserStats.objects.values_list('user_id', 'quiz_count', 'total_score', 'avg_score'))
+        top = sorted(QuizTopScore.objects.values_list('quiz_id', 'attempt_id', 'score'))
+        return users, top
+
+    def test_tables_match_rebuild(self):
+        for score in range(15):
+            QuizAttempt.objects.create(quiz=self.quiz, user=self.alice, score=score % 7)
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.bob, score=9)
+        QuizAttempt.objects.filter(score=6).first().delete()
+        QuizAttempt.objects.filter(user=self.bob).delete()
+
+        incremental = self.snapshot()
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(QuizTopScore.objects.filter(quiz=self.quiz).count(), leaderboard.QUIZ_TOP_K)
+
+    def test_views_read_ranked_rows(self):
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.alice, score=2)
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.bob, score=4)
+
+        response = self.client.get(reverse('leaderboard'))
+        self.assertEqual([leader.user for leader in response.context['leaders']], [self.bob, self.alice])
+
+        response = self.client.get(reverse('quiz_leaderboard', args=[self.quiz.id]))
+        self.assertEqual([entry.score for entry in response.context['attempts']], [4, 2])
+
+
+class ProfileDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', password='pass12345')
+        self.quizzes = [
+            Quiz.objects.create(title=f"Quiz {i}", description="desc", created_by=self.user)
+            for i in range(3)
+        ]
+        for quiz in self.quizzes:
+            make_question(quiz)
+            make_question(quiz)
+            QuizAttempt.objects.create(quiz=quiz, user=self.user, score=1)
+        self.client.login(username='student', password='pass12345')
+
+    def test_query_count_is_pinned(self):
+        # session, user, aggregated stats, recent attempts
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.context['total_quizzes_taken'], 3)
+        self.assertEqual(response.context['total_quizzes_created'], 3)
+        self.assertEqual(response.context['average_score'], 1.0)
+        self.assertContains(response, '1/2')
+
+        # Stats now come from the cache
+        with self.assertNumQueries(3):
+            self.client.get(reverse('profile'))
+
+    def test_new_attempt_and_quiz_invalidate_stats(self):
+        get_profile_stats(self.user.id)
+        QuizAttempt.objects.create(quiz=self.quizzes[0], user=self.user, score=3)
+        self.assertIsNone(cache.get(profile_stats_cache_key(self.user.id)))
+        self.assertEqual(get_profile_stats(self.user.id)['average_score'], 1.5)
+
+        Quiz.objects.create(title="New", description="desc", created_by=self.user)
+        self.assertEqual(get_profile_stats(self.user.id)['total_quizzes_created'], 4)
+
+
+class AsyncGenerationTests(SimpleTestCase):
+    def test_identical_requests_share_one_upstream_call(self):
+        model = FakeGenerativeModel(delay=0.05)
+        generator = AIQuizGenerator(model=model)
+
+        async def burst():
+            return await asyncio.gather(*[
+                generator.agenerate_quiz(topic, 'medium', 3)
+                for topic in ['Python basics', ' python   BASICS', 'Python basics']
+            ])
+
+        results = asyncio.run(burst())
+        self.assertEqual(model.calls, 1)
+        self.assertTrue(all(len(quiz['questions']) == 3 for quiz in results))
+        # Callers get independent copies of the shared result
+        self.assertIsNot(results[0], results[1])
+
+    def test_concurrency_limiter_caps_outbound_calls(self):
+        model = FakeGenerativeModel(delay=0.02)
+        generator = AIQuizGenerator(model=model, max_concurrent_calls=2)
+
+        async def burst():
+            await asyncio.gather(*[generator.agenerate_quiz(f"topic {i}", 'easy', 2) for i in range(6)])
+
+        asyncio.run(burst())
+        self.assertEqual(model.calls, 6)
+        self.assertLessEqual(model.max_active, 2)
+
+    def test_concurrency_limiter_caps_parallel_chunk_calls(self):
+        model = FakeGenerativeModel(delay=0.02)
+        generator = AIQuizGenerator(model=model, max_concurrent_calls=2)
+        generator.chunk_size, generator.chunk_workers = 2, 4
+
+        async def burst():
+            await asyncio.gather(
+                generator.agenerate_quiz('big topic', 'easy', 8),
+                *[generator.agenerate_quiz(f"topic {i}", 'easy', 2) for i in range(3)],
+            )
+
+        asyncio.run(burst())
+        self.assertGreaterEqual(model.calls, 7)
+        self.assertLessEqual(model.max_active, 2)
+
+    def test_async_view_uses_generator(self):
+        generator = AIQuizGenerator(model=FakeGenerativeModel())
+        with mock.patch.object(ai_views, 'get_ai_generator', return_value=generator):
+            response = self.client.post(
+                reverse('generate_ai_quiz'),
+                data=json.dumps({'topic': 'space', 'difficulty': 'easy', 'num_questions': 4}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.json()['generated_questions'], 4)
+        self.assertEqual(response.json()['quiz']['quiz_title'], 'Fake Quiz')
+
+
+class GeneratedQuizCacheTests(TestCase):
+    def make_generator(self, model=None, **cache_options):
+        return AIQuizGenerator(model=model or FakeGenerativeModel(), result_cache=QuizResultCache(**cache_options))
+
+    def test_normalized_requests_hit_the_cache(self):
+        generator = self.make_generator()
+        first = generator.generate_quiz('Python Basics', 'medium', 3)
+        second = generator.generate_quiz('  python basics ', 'Medium', 3)
+        self.assertEqual(generator.model.calls, 1)
+        self.assertEqual(first, second)
+        metrics = generator.result_cache.metrics()
+        self.assertEqual((metrics['hits'], metrics['misses'], metrics['stores']), (1, 1, 1))
+
+        generator.generate_quiz('Python Basics', 'medium', 4)
+        self.assertEqual(generator.model.calls, 2)
+
+    def test_demo_fallbacks_are_not_cached(self):
+        broken = FakeGenerativeModel()
+        broken.generate_content = mock.Mock(side_effect=RuntimeError("quota exceeded"))
+        generator = self.make_generator(model=broken)
+        quiz = generator.generate_quiz('history', 'easy', 2)
+        self.assertTrue(quiz['demo'])
+        self.assertFalse(GeneratedQuizCacheEntry.objects.exists())
+
+    def test_short_chunked_quizzes_are_not_cached(self):
+        generator = self.make_generator()
+        generator.chunk_size = 2
+        # Every chunk returns the same questions, so duplicates leave it short
+        quiz = generator.generate_quiz('geology', 'easy', 6)
+        self.assertLess(len(quiz['questions']), 6)
+        self.assertFalse(GeneratedQuizCacheEntry.objects.exists())
+
+    def test_prompt_version_is_part_of_the_key(self):
+        generator = self.make_generator()
+        generator.generate_quiz('chemistry', 'hard', 2)
+        with mock.patch.object(AIQuizGenerator, 'prompt_version', return_value='changed'):
+            generator.generate_quiz('chemistry', 'hard', 2)
+        self.assertEqual(generator.model.calls, 2)
+
+    def test_stale_entry_is_served_and_refreshed(self):
+        generator = self.make_generator(ttl=0)
+        generator.generate_quiz('biology', 'easy', 2)
+        with mock.patch.object(generator, '_refresh_in_background') as refresh:
+            quiz = generator.generate_quiz('biology', 'easy', 2)
+        self.assertEqual(len(quiz['questions']), 2)
+        self.assertEqual(generator.model.calls, 1)
+        refresh.assert_called_once()
+        self.assertEqual(generator.result_cache.metrics()['stale_hits'], 1)
+
+        no_stale = self.make_generator(ttl=0, serve_stale=False)
+        no_stale.generate_quiz('biology', 'easy', 2)
+        self.assertEqual(no_stale.model.calls, 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        generator = self.make_generator(max_entries=2)
+        for topic in ('one', 'two', 'three'):
+            generator.generate_quiz(topic, 'easy', 1)
+        self.assertEqual(
+            sorted(GeneratedQuizCacheEntry.objects.values_list('topic', flat=True)), ['three', 'two']
+        )
+
+
+class ChunkedGenerationTests(SimpleTestCase):
+    def test_large_quiz_keeps_partial_chunks_and_tops_up(self):
+        prompts = []
+
+        def generate_content(prompt, generation_config=None):
+            prompts.append(prompt)
+            requested = int(prompt.split("EXACTLY ", 1)[1].split()[0])
+            if "This is part" not in prompt:
+                texts = [f"Top-up question {i}?" for i in range(requested)]
+            else:
+                # Every chunk comes back one question short, plus a duplicate
+                part = prompt.split("This is part ", 1)[1].split()[0]
+                texts = [f"Part {part} question {i}?" for i in range(requested - 1)] + ["Shared question?"]
+            return FakeResponse(json.dumps({
+                "quiz_title": "Big Quiz",
+                "questions": [
+                    {"question_text": text, "options": ["A", "B", "C", "D"], "correct_answer": 0}
+                    for text in texts
+                ],
+            }))
+
+        model = mock.Mock(spec=['generate_content'])
+        model.generate_content.side_effect = generate_content
+        generator = AIQuizGenerator(model=model)
+        quiz = generator.generate_quiz('geography', 'medium', 25)
+
+        # 3 parallel chunks (10, 10, 5) and one top-up call
+        self.assertEqual(len(prompts), 4)
+        self.assertEqual(len(quiz['questions']), 25)
+        self.assertNotIn('demo', quiz)
+        texts = [q['question_text'] for q in quiz['questions']]
+        self.assertEqual(len(texts), len(set(texts)))
+        self.assertIn("Do NOT repeat", prompts[-1])
+
+    def test_top_ups_are_split_into_chunks(self):
+        requested = []
+
+        def generate_content(prompt, generation_config=None):
+            count = int(prompt.split("EXACTLY ", 1)[1].split()[0])
+            requested.append((count, "Do NOT repeat" in prompt))
+            # Every call comes back with a single new question
+            return FakeResponse(json.dumps({"questions": [
+                {"question_text": f"Question {len(requested)}?", "options": ["A", "B", "C", "D"], "correct_answer": 0}
+            ]}))
+
+        model = mock.Mock(spec=['generate_content'])
+        model.generate_content.side_effect = generate_content
+        generator = AIQuizGenerator(model=model)
+        generator.chunk_size, generator.top_up_rounds = 2, 1
+        quiz = generator.generate_quiz('geography', 'medium', 6)
+
+        # 3 chunks give 3 questions; the 3 missing are asked for as 2 + 1
+        self.assertEqual(sorted(requested), [(1, True), (2, False), (2, False), (2, False), (2, True)])
+        self.assertEqual(len(quiz['questions']), 5)
+
+    def test_malformed_questions_are_dropped(self):
+        content = json.dumps({"questions": [
+            {"question_text": "Good?", "options": ["A", "B", "C", "D"], "correct_answer": 2},
+            {"question_text": "Three options?", "options": ["A", "B", "C"], "correct_answer": 0},
+            {"question_text": "Bad answer?", "options": ["A", "B", "C", "D"], "correct_answer": 7},
+        ]})
+        title, questions = AIQuizGenerator(model=FakeGenerativeModel())._extract_questions(content)
+        self.assertIsNone(title)
+        self.assertEqual([q['question_text'] for q in questions], ["Good?"])
+
+
+class StreamingGenerationTests(SimpleTestCase):
+    def test_parser_emits_each_question_once_complete(self):
+        text = json.dumps({
+            "quiz_title": "Tricky {braces}",
+            "questions": [
+                {"question_text": 'Is "}" a brace?', "options": ["A", "B", "C", "D"], "correct_answer": 1},
+                {"question_text": "Second?", "options": ["A", "B", "C", "D"], "correct_answer": 0},
+            ],
+        })
+        parser = QuestionStreamParser()
+        emitted = []
+        first_emitted_at = None
+        for i in range(0, len(text), 3):
+            emitted.extend(q['question_text'] for q in parser.feed(text[i:i + 3]))
+            if emitted and first_emitted_at is None:
+                first_emitted_at = len(parser.buffer)
+        # The first question was out before the second had started arriving
+        self.assertLess(first_emitted_at, text.index("Second"))
+        self.assertEqual(emitted, ['Is "}" a brace?', "Second?"])
+        self.assertEqual(parser.title, "Tricky {braces}")
+        self.assertTrue(parser.finished)
+
+    def test_stream_view_sends_ndjson_events(self):
+        generator = AIQuizGenerator(model=FakeGenerativeModel())
+        with mock.patch.object(ai_views, 'get_ai_generator', return_value=generator):
+            response = self.client.post(
+                reverse('stream_ai_quiz'),
+                data=json.dumps({'topic': 'rivers', 'num_questions': 3}),
+                content_type='application/json',
+            )
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        events = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([event['type'] for event in events], ['title', 'question', 'question', 'question', 'done'])
+        self.assertEqual(len(events[-1]['quiz']['questions']), 3)
+
+    def test_short_stream_is_topped_up(self):
+        model = FakeGenerativeModel()
+
+        def short_stream(prompt, generation_config=None, stream=False):
+            if stream:
+                text = fake_quiz_json(2)
+                return [FakeResponse(text[:len(text) // 2]), FakeResponse(text[len(text) // 2:])]
+            return FakeResponse(fake_quiz_json(1).replace("Fake question 0", "Extra question"))
+
+        model.generate_content = short_stream
+        events = list(AIQuizGenerator(model=model).stream_quiz('lakes', 'easy', 3))
+        self.assertEqual(len(events[-1]['quiz']['questions']), 3)
+        self.assertEqual(events[-2]['question']['question_text'], "Extra question?")
+
+    def test_large_stream_yields_each_chunk_as_it_finishes(self):
+        release = threading.Event()
+
+        def generate_content(prompt, generation_config=None, stream=False):
+            self.assertFalse(stream)
+            part = prompt.split("This is part ", 1)[1].split()[0]
+            if part == '1':
+                release.wait(5)
+            return FakeResponse(json.dumps({"quiz_title": f"Part {part}", "questions": [
+                {"question_text": f"Part {part} question {i}?", "options": ["A", "B", "C", "D"], "correct_answer": 0}
+                for i in range(2)
+            ]}))
+
+        model = mock.Mock(spec=['generate_content'])
+        model.generate_content.side_effect = generate_content
+        generator = AIQuizGenerator(model=model)
+        generator.chunk_size = 2
+        events = generator.stream_quiz('oceans', 'easy', 4)
+
+        # Part 2 is out while part 1 is still waiting on the model
+        self.assertEqual(next(events), {'type': 'title', 'quiz_title': 'Part 2'})
+        self.assertEqual(next(events)['question']['question_text'], "Part 2 question 0?")
+        release.set()
+        events = list(events)
+        self.assertEqual(len(events[-1]['quiz']['questions']), 4)
+        self.assertEqual(model.generate_content.call_count, 2)
+
+
+class SaveAIQuizTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass12345')
+        self.client.login(username='teacher', password='pass12345')
+
+    def save(self, quiz, **extra):
+        return self.client.post(
+            reverse('save_ai_quiz'),
+            data=json.dumps({'quiz': quiz, 'topic': 'space', 'difficulty': 'easy', **extra}),
+            content_type='application/json',
+        )
+
+    def test_round_trips_do_not_grow_with_question_count(self):
+        query_counts = []
+        for size in (5, 50):
+            with CaptureQueriesContext(connection) as context:
+                response = self.save(json.loads(fake_quiz_json(size)))
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(context.captured_queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+        quiz = Quiz.objects.get(id=response.json()['quiz_id'])
+        self.assertEqual(quiz.question_set.count(), 50)
+        self.assertEqual(stats.get_site_stats(), stats.count_actual())
+
+    def test_invalid_question_saves_nothing(self):
+        payload = json.loads(fake_quiz_json(10))
+        payload['questions'][9]['correct_answer'] = 4
+        response = self.save(payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Question 10', response.json()['error'])
+        self.assertFalse(Quiz.objects.exists())
+
+    @override_settings(AI_QUIZ_MAX_PAYLOAD_BYTES=1000)
+    def test_oversized_payload_is_rejected(self):
+        response = self.save(json.loads(fake_quiz_json(30)))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Quiz.objects.exists())
+
+
+class QuizTransferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass12345')
+        self.other = User.objects.create_user('other', password='pass12345')
+        for n in range(3):
+            quiz = Quiz.objects.create(
+                title=f'Quiz {n}', description='a, "quoted"\nline', created_by=self.user,
+                number_of_questions=n + 1, time_limit=5 * (n + 1), question_bank=n == 2,
+            )
+            for i in range(n * 2):
+                make_question(quiz, correct_option=i % 4 + 1, question_text=f'Q{n}.{i}')
+
+    def round_trip(self, fmt):
+        lines = list(export_quizzes(Quiz.objects.all(), fmt, chunk_size=2))
+        source = StringIO(''.join(lines)) if fmt == 'csv' else lines
+        imported = import_quizzes(source, self.other, fmt, batch_size=3)
+        self.assertEqual(imported, (3, 6))
+
+        copies = Quiz.objects.filter(created_by=self.other).order_by('title')
+        for original, copy in zip(Quiz.objects.filter(created_by=self.user).order_by('title'), copies):
+            self.assertEqual(copy.description, original.description)
+            for field in ('number_of_questions', 'time_limit', 'has_time_limit', 'question_bank'):
+                self.assertEqual(getattr(copy, field), getattr(original, field))
+            self.assertEqual(
+                list(copy.question_set.order_by('id').values_list('question_text', 'correct_option')),
+                list(original.question_set.order_by('id').values_list('question_text', 'correct_option')),
+            )
+        self.assertEqual(stats.get_site_stats(), stats.count_actual())
+
+    def test_jsonl_round_trip(self):
+        self.round_trip('jsonl')
+
+    def test_csv_round_trip(self):
+        self.round_trip('csv')
+
+    def test_export_queries_do_not_grow_with_quiz_count(self):
+        with CaptureQueriesContext(connection) as context:
+            list(export_quizzes(Quiz.objects.all(), 'jsonl'))
+        self.assertEqual(len(context.captured_queries), 2)
+
+    def test_invalid_line_imports_nothing(self):
+        lines = list(export_quizzes(Quiz.objects.all(), 'jsonl'))
+        lines.insert(4, '{"type": "question", "question_text": "Broken"}\n')
+        with self.assertRaisesMessage(PayloadError, 'Line 5'):
+            import_quizzes(lines, self.other)
+        self.assertFalse(Quiz.objects.filter(created_by=self.other).exists())
+
+    def test_out_of_range_quiz_fields_are_rejected(self):
+        for record in ('"number_of_questions": 0', '"time_limit": -5', '"time_limit": 100000'):
+            with self.assertRaisesMessage(PayloadError, 'Line 1'):
+                import_quizzes(['{"type": "quiz", "title": "Bad", %s}\n' % record], self.other)
+        self.assertFalse(Quiz.objects.filter(created_by=self.other).exists())
+
+    def test_export_view_streams_only_own_quizzes(self):
+        Quiz.objects.create(title='Not mine', created_by=self.other)
+        self.client.login(username='teacher', password='pass12345')
+        response = self.client.get(reverse('export_quizzes'), {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('Quiz 2', body)
+        self.assertNotIn('Not mine', body)
+
+    def test_export_view_rejects_non_integer_quiz(self):
+        self.client.login(username='teacher', password='pass12345')
+        response = self.client.get(reverse('export_quizzes'), {'quiz': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_undecodable_or_malformed_upload_is_a_payload_error(self):
+        with self.assertRaisesMessage(PayloadError, 'Line 2'):
+            import_quizzes([b'{"type": "quiz", "title": "Ok"}\n', b'\xff\xfe\n'], self.other)
+        with self.assertRaisesMessage(PayloadError, 'invalid CSV'):
+            import_quizzes(StringIO('quiz_ref,title\n1,' + 'x' * 200000), self.other, 'csv')
+        self.assertFalse(Quiz.objects.filter(created_by=self.other).exists())
+
+        self.client.login(username='other', password='pass12345')
+        upload = SimpleUploadedFile('quizzes.csv', b'quiz_ref,title\n1,\xff\n')
+        response = self.client.post(reverse('import_quizzes'), {'file': upload})
+        self.assertRedirects(response, reverse('my_quizzes'))
+        self.assertFalse(Quiz.objects.filter(created_by=self.other).exists())
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            f.writelines(export_quizzes(Quiz.objects.all(), 'jsonl'))
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_quizzes', f.name, user='other', stdout=out)
+        self.assertIn('Imported 3 quizzes with 6 questions', out.getvalue())
+
+
+class CertificateTests(TestCase):
+    def setUp(self):
+        self.spool = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spool.cleanup)
+        overrides = override_settings(CERTIFICATE_DIR=self.spool.name, CERTIFICATE_RENDER_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        certificates._renderer = None
+
+        self.user = User.objects.create_user('student', password='pass12345')
+        self.quiz = Quiz.objects.create(title='Rivers & <Lakes>', created_by=self.user)
+        for _ in range(4):
+            make_question(self.quiz)
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.user, score=3)
+        self.client.login(username='student', password='pass12345')
+
+    def download(self, **headers):
+        return self.client.get(reverse('export_certificate', args=[self.quiz.id]), headers=headers)
+
+    def test_rendered_once_and_revalidated_by_etag(self):
+        with mock.patch.object(certificates, 'render_certificate', wraps=certificates.render_certificate) as render:
+            first = self.download()
+            self.assertEqual(first.status_code, 200)
+            self.assertTrue(b''.join(first.streaming_content).startswith(b'%PDF'))
+            self.assertEqual(self.download().status_code, 200)
+            self.assertEqual(render.call_count, 1)
+
+        etag = first['ETag']
+        self.assertEqual(self.download(if_none_match=etag).status_code, 304)
+
+    def test_quiz_change_renders_a_new_certificate(self):
+        etag = self.download()['ETag']
+        make_question(self.quiz)
+        self.assertNotEqual(self.download()['ETag'], etag)
+        # The superseded render is removed
+        attempt = QuizAttempt.objects.get()
+        self.assertEqual(len(list(Path(self.spool.name).glob(f'v*/attempt-{attempt.pk}-*.pdf'))), 1)
+
+    def test_suite_never_writes_to_the_real_certificate_dir(self):
+        self.assertFalse(settings.CERTIFICATE_PRERENDER)
+        overrides = override_settings(CERTIFICATE_RENDER_WORKERS=2)
+        with overrides, mock.patch.object(certificates, 'get_renderer') as get_renderer:
+            session = self.client.get(reverse('take_quiz', args=[self.quiz.id])).context['session']
+            self.client.post(reverse('take_quiz', args=[self.quiz.id]), {'session_id': session.id})
+        get_renderer.assert_not_called()
+
+    def test_render_failure_answers_503(self):
+        with mock.patch.object(certificates, 'render_certificate', side_effect=ValueError("bad template")), \
+                self.assertLogs('quizapp.certificate_views', 'ERROR'):
+            response = self.download()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+
+    def test_without_attempt_redirects_to_quiz(self):
+        QuizAttempt.objects.all().delete()
+        self.assertRedirects(self.download(), reverse('take_quiz', args=[self.quiz.id]))
+
+    def test_pool_renders_in_another_process(self):
+        renderer = certificates.CertificateRenderer(workers=1)
+        self.addCleanup(renderer.shutdown)
+        context = certificates.certificate_context(
+            QuizAttempt.objects.get(), self.quiz, 'student', 4
+        )
+        path = certificates.certificate_path(1, certificates.certificate_etag(context))
+        futures = [renderer.submit(context, path) for _ in range(3)]
+        self.assertEqual(len({id(future) for future in futures}), 1)
+        self.assertEqual(futures[0].result(timeout=60), str(path))
+        self.assertTrue(path.exists())
+
+
+class CohortCertificateTests(TestCase):
+    def setUp(self):
+        self.spool = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spool.cleanup)
+        overrides = override_settings(CERTIFICATE_DIR=self.spool.name, CERTIFICATE_RENDER_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        certificates._renderer = None
+
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.quiz = Quiz.objects.create(title='Cohort Quiz', created_by=self.teacher)
+        make_question(self.quiz)
+        make_question(self.quiz)
+        for name, scores in (('ann', [1, 2]), ('bob', [0]), ('cy', [2, 0, 1])):
+            student = User.objects.create_user(name, password='pass12345')
+            for score in scores:
+                QuizAttempt.objects.create(quiz=self.quiz, user=student, score=score)
+
+    def test_best_attempt_per_student(self):
+        best = {a.user.username: a.score for a in cohorts.cohort_attempts(self.quiz)}
+        self.assertEqual(best, {'ann': 2, 'bob': 0, 'cy': 2})
+        self.assertEqual(len(cohorts.cohort_attempts(self.quiz, min_score=1)), 2)
+
+    def test_view_streams_zip_for_the_quiz_owner(self):
+        self.client.login(username='teacher', password='pass12345')
+        response = self.client.get(reverse('cohort_certificates', args=[self.quiz.id]))
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(
+            sorted(archive.namelist()),
+            ['certificate_ann.pdf', 'certificate_bob.pdf', 'certificate_cy.pdf'],
+        )
+        self.assertTrue(archive.read('certificate_ann.pdf').startswith(b'%PDF'))
+
+    def test_view_is_limited_to_the_quiz_owner(self):
+        self.client.login(username='ann', password='pass12345')
+        response = self.client.get(reverse('cohort_certificates', args=[self.quiz.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_command_reports_throughput(self):
+        out = StringIO()
+        call_command('render_certificates', self.quiz.id, min_score=1, stdout=out)
+        self.assertIn('Rendered 2 certificates', out.getvalue())
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_loading_urls_skips_heavy_dependencies(self):
+        # A fresh interpreter, since this one has long since imported them
+        result = subprocess.run(
+            [sys.executable, '-c', (
+                "import django, sys; django.setup(); from django.urls import resolve; resolve('/'); "
+                "print([m for m in ('google.generativeai', 'reportlab', 'dotenv') if m in sys.modules])"
+            )],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'quizproject.settings'},
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.splitlines()[-1], '[]')
+
+
+class QuizFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', password='pass12345')
+        self.quiz = Quiz.objects.create(title='Fragments', created_by=self.user)
+        self.question = make_question(self.quiz, question_text='Capital of France?')
+        self.url = reverse('take_quiz', args=[self.quiz.id])
+
+    def test_repeat_visit_skips_question_query_and_render(self):
+        self.client.get(self.url)
+        before = fragments.metrics()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertFalse(any('quizapp_question' in q['sql'] for q in context.captured_queries))
+        self.assertContains(response, 'Capital of France?')
+        self.assertEqual(fragments.metrics()['hits'], before['hits'] + 1)
+
+    def test_question_change_bumps_version(self):
+        self.client.get(self.url)
+        self.question.question_text = 'Capital of Spain?'
+        self.question.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Capital of Spain?')
+        self.assertNotContains(response, 'Capital of France?')
+
+    def test_csrf_token_is_rendered_per_request(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        tokens = []
+        for _ in range(2):
+            client.cookies.clear()
+            response = client.get(self.url)
+            tokens.append(response.context['csrf_token'])
+            self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotEqual(str(tokens[0]), str(tokens[1]))
+
+    def test_metrics_are_staff_only(self):
+        self.client.login(username='student', password='pass12345')
+        self.assertEqual(self.client.get(reverse('cache_metrics')).status_code, 302)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.get(reverse('cache_metrics'))
+        self.assertIn('hit_ratio', response.json()['take_quiz_fragments'])
+
+
+@override_settings(ATTEMPT_AUTOSAVE_FLUSH_INTERVAL=3600, ATTEMPT_AUTOSAVE_WRITE_THROUGH_AGE=3600)
+class AttemptSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        attempt_sessions.flush()
+        self.user = User.objects.create_user('student', password='pass12345')
+        self.quiz = Quiz.objects.create(title='Timed', created_by=self.user, has_time_limit=True, time_limit=5)
+        self.questions = [make_question(self.quiz, correct_option=n) for n in (1, 2, 3)]
+        self.client.login(username='student', password='pass12345')
+        self.url = reverse('take_quiz', args=[self.quiz.id])
+
+    def start(self):
+        return self.client.get(self.url).context['session']
+
+    def autosave(self, session, answers):
+        return self.client.post(
+            reverse('autosave_attempt', args=[session.id]),
+            data=json.dumps({'answers': answers}), content_type='application/json',
+        )
+
+    def test_reload_resumes_the_running_session(self):
+        session = self.start()
+        self.assertEqual(self.start().id, session.id)
+        self.assertLessEqual(self.client.get(self.url).context['remaining_seconds'], 5 * 60)
+
+    def test_autosaves_stay_in_cache_until_batched_flush(self):
+        session = self.start()
+        first, second, third = self.questions
+        with CaptureQueriesContext(connection) as context:
+            self.autosave(session, {first.id: 1})
+            self.autosave(session, {second.id: 2, third.id: 4, 'bogus': 1})
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in context.captured_queries))
+        session.refresh_from_db()
+        self.assertEqual(session.answers, {})
+
+        self.assertEqual(attempt_sessions.flush(), 1)
+        session.refresh_from_db()
+        self.assertEqual(session.answers, {str(first.id): 1, str(second.id): 2, str(third.id): 4})
+
+    @override_settings(ATTEMPT_AUTOSAVE_FLUSH_INTERVAL=5, ATTEMPT_AUTOSAVE_WRITE_THROUGH_AGE=30)
+    def test_copy_a_few_flush_intervals_old_is_left_to_the_timer(self):
+        session = self.start()
+        first, second, _ = self.questions
+        AttemptSession.objects.filter(pk=session.pk).update(answers_saved_at=timezone.now() - timedelta(seconds=10))
+        with CaptureQueriesContext(connection) as context:
+            self.autosave(session, {first.id: 1})
+            self.autosave(session, {second.id: 2})
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in context.captured_queries))
+
+    def test_stale_database_copy_is_written_through(self):
+        session = self.start()
+        first, second, _ = self.questions
+        with override_settings(ATTEMPT_AUTOSAVE_WRITE_THROUGH_AGE=0):
+            self.autosave(session, {first.id: 1, second.id: 2})
+        session.refresh_from_db()
+        self.assertEqual(session.answers, {str(first.id): 1, str(second.id): 2})
+
+        # A worker that never saw the cached store still grades what was saved
+        cache.delete(attempt_sessions.answers_cache_key(session.pk))
+        response = self.client.post(self.url, {'session_id': session.id})
+        self.assertEqual(response.context['score'], 2)
+
+    def test_submit_grades_the_stored_answers(self):
+        session = self.start()
+        first, second, third = self.questions
+        self.autosave(session, {first.id: 1, second.id: 2})
+        response = self.client.post(self.url, {'session_id': session.id, f'question_{third.id}': '3'})
+        self.assertEqual(response.context['score'], 3)
+
+        session.refresh_from_db()
+        self.assertIsNotNone(session.submitted_at)
+        self.assertEqual(session.attempt.score, 3)
+        self.assertEqual(self.autosave(session, {first.id: 2}).status_code, 410)
+
+    def test_answers_after_the_deadline_do_not_count(self):
+        session = self.start()
+        first, second, _ = self.questions
+        self.autosave(session, {first.id: 1})
+        AttemptSession.objects.filter(pk=session.pk).update(deadline=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(self.autosave(session, {second.id: 2}).status_code, 410)
+        response = self.client.post(self.url, {'session_id': session.id, f'question_{second.id}': '2'})
+        self.assertEqual(response.context['score'], 1)
+
+    def test_submit_without_a_session_is_not_graded(self):
+        first = self.questions[0]
+        for session_id in (None, 'not-a-session', '00000000-0000-0000-0000-000000000000'):
+            post = {f'question_{first.id}': '1'}
+            if session_id is not None:
+                post['session_id'] = session_id
+            self.assertRedirects(self.client.post(self.url, post), self.url)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+
+class QuestionBankTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', password='pass12345')
+        self.quiz = Quiz.objects.create(
+            title='Bank', created_by=self.user, question_bank=True, number_of_questions=5
+        )
+        self.questions = {q.id: q for q in (make_question(self.quiz, correct_option=n % 4 + 1) for n in range(30))}
+        self.url = reverse('take_quiz', args=[self.quiz.id])
+
+    def correct_answers(self, question_ids):
+        return {f'question_{qid}': str(self.questions[qid].correct_option) for qid in question_ids}
+
+    def test_draw_fetches_only_the_drawn_rows(self):
+        get_answer_key(self.quiz.id)
+        self.client.login(username='student', password='pass12345')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        drawn = response.context['session'].question_ids
+        self.assertEqual(len(set(drawn)), 5)
+        self.assertEqual(response.context['fragments']['question_count'], 5)
+
+        sql = [q['sql'] for q in context.captured_queries]
+        self.assertFalse(any('RANDOM' in s.upper() for s in sql))
+        question_selects = [s for s in sql if s.startswith('SELECT') and 'FROM "quizapp_question"' in s]
+        self.assertEqual(len(question_selects), 1)
+        self.assertIn(' IN (', question_selects[0])
+
+    def test_session_grades_only_the_drawn_questions(self):
+        self.client.login(username='student', password='pass12345')
+        session = self.client.get(self.url).context['session']
+        undrawn = [qid for qid in self.questions if qid not in session.question_ids][:3]
+        post = {'session_id': session.id, **self.correct_answers(session.question_ids + undrawn)}
+        response = self.client.post(self.url, post)
+        self.assertEqual((response.context['score'], response.context['total']), (5, 5))
+        self.assertEqual(self.client.get(reverse('profile')).context['recent_attempts'][0].question_total, 5)
+
+    def test_anonymous_draw_is_signed(self):
+        response = self.client.get(self.url)
+        draw = response.context['draw']
+        drawn = sampling.unsign_draw(self.quiz, draw)
+        response = self.client.post(self.url, {'draw': draw, **self.correct_answers(drawn)})
+        self.assertEqual((response.context['score'], response.context['total']), (5, 5))
+
+        for forged in (draw + 'x', '', None):
+            post = self.correct_answers(drawn)
+            if forged is not None:
+                post['draw'] = forged
+            response = self.client.post(self.url, post, follow=True)
+            self.assertRedirects(response, self.url)
+            self.assertContains(response, 'not graded')
+            self.assertIsNotNone(sampling.unsign_draw(self.quiz, response.context['draw']))
+
+    def test_anonymous_draw_expires(self):
+        draw = self.client.get(self.url).context['draw']
+        drawn = sampling.unsign_draw(self.quiz, draw)
+        later = time.time() + sampling.draw_max_age(self.quiz) + 1
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            self.assertIsNone(sampling.unsign_draw(self.quiz, draw))
+            response = self.client.post(self.url, {'draw': draw, **self.correct_answers(drawn)})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.quiz = Quiz.objects.create(title='Items', created_by=self.teacher)
+        self.easy = make_question(self.quiz, correct_option=1)
+        self.hard = make_question(self.quiz, correct_option=2)
+
+    def take(self, username, answers):
+        user, _ = User.objects.get_or_create(username=username)
+        self.client.force_login(user)
+        url = reverse('take_quiz', args=[self.quiz.id])
+        post = {f'question_{question.id}': str(option) for question, option in answers.items()}
+        post['session_id'] = self.client.get(url).context['session'].id
+        return self.client.post(url, post)
+
+    def test_answers_are_packed_into_one_value(self):
+        self.take('ann', {self.easy: 1})
+        attempt = QuizAttempt.objects.get()
+        self.assertEqual(len(attempt.answers), 2 * item_analysis.ENTRY.size)
+        self.assertEqual(
+            item_analysis.unpack_answers(attempt.answers),
+            [(self.easy.id, 1), (self.hard.id, 0)],
+        )
+        # Question ids are 64-bit
+        big_id = 2 ** 32 + 7
+        self.assertEqual(item_analysis.unpack_answers(item_analysis.pack_answers([(big_id, 2)], {big_id: 3})), [(big_id, 3)])
+
+    def test_statistics_fold_in_only_new_attempts(self):
+        self.take('ann', {self.easy: 1, self.hard: 2})
+        self.take('bob', {self.easy: 1, self.hard: 3})
+        self.take('cy', {self.easy: 4, self.hard: 3})
+        self.assertEqual(item_analysis.run(), 3)
+        self.assertEqual(item_analysis.run(), 0)
+
+        hard = QuestionStats.objects.get(question=self.hard)
+        self.assertEqual((hard.responses, hard.correct), (3, 1))
+        self.assertEqual(hard.option_counts, [0, 0, 1, 2, 0])
+        self.assertGreater(hard.discrimination, 0)
+
+        self.take('dan', {self.hard: 2})
+        self.assertEqual(item_analysis.run(), 1)
+        easy = QuestionStats.objects.get(question=self.easy)
+        self.assertEqual(easy.option_counts, [1, 2, 0, 0, 1])
+        self.assertAlmostEqual(easy.difficulty, 0.5)
+
+        incremental = list(QuestionStats.objects.order_by('pk').values_list('responses', 'correct', 'score_sum'))
+        item_analysis.run(rebuild=True)
+        self.assertEqual(list(QuestionStats.objects.order_by('pk').values_list('responses', 'correct', 'score_sum')), incremental)
+
+    def test_attempt_committed_out_of_id_order_is_not_skipped(self):
+        self.take('ann', {self.easy: 1})
+        late = QuizAttempt.objects.get()
+        self.take('bob', {self.easy: 2})
+        # ann's attempt commits after bob's has been read
+        QuizAttempt.objects.filter(pk=late.pk).update(analyzed=True)
+        self.assertEqual(item_analysis.run(), 1)
+        QuizAttempt.objects.filter(pk=late.pk).update(analyzed=False)
+        self.assertEqual(item_analysis.run(), 1)
+        self.assertEqual(QuestionStats.objects.get(question=self.easy).option_counts, [0, 1, 1, 0, 0])
+
+    def test_report_reads_precomputed_rows_for_the_owner(self):
+        self.take('ann', {self.easy: 1})
+        call_command('analyze_items', stdout=StringIO())
+        self.client.force_login(self.teacher)
+        # Session, user, quiz, job state and the stats rows
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('item_stats', args=[self.quiz.id]))
+        self.assertEqual(len(response.context['item_stats']), 2)
+
+        self.client.force_login(User.objects.get(username='ann'))
+        self.assertEqual(self.client.get(reverse('item_stats', args=[self.quiz.id])).status_code, 404)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+
+    def make_quiz(self, title, description='', difficulty='easy'):
+        return Quiz.objects.create(title=title, description=description, difficulty=difficulty, created_by=self.teacher)
+
+    def titles(self, text, **kwargs):
+        quizzes, _ = search.search_quizzes(text, **kwargs)
+        return [quiz.title for quiz in quizzes]
+
+    def test_title_matches_rank_above_question_matches(self):
+        in_question = self.make_quiz('General science')
+        make_question(in_question, question_text='What drives photosynthesis in leaves?')
+        self.make_quiz('Photosynthesis basics')
+        self.make_quiz('Unrelated')
+
+        quizzes, _ = search.search_quizzes('photosynth')
+        self.assertEqual([quiz.title for quiz in quizzes], ['Photosynthesis basics', 'General science'])
+        self.assertEqual(quizzes[1].question_hits, 1)
+        self.assertEqual(quizzes[1].question_count, 1)
+
+    def test_difficulty_filter_and_every_term_required(self):
+        self.make_quiz('Roman history', difficulty='easy')
+        self.make_quiz('Roman history deep dive', difficulty='hard')
+        self.make_quiz('Greek history', difficulty='hard')
+
+        self.assertEqual(self.titles('roman history', difficulty='hard'), ['Roman history deep dive'])
+        self.assertEqual(len(self.titles('history')), 3)
+        self.assertEqual(self.titles('"); DROP TABLE'), [])
+
+    def test_keyset_pages_cover_every_match_once(self):
+        for i in range(7):
+            self.make_quiz(f'Algebra set {i}')
+        seen, cursor = [], None
+        while True:
+            quizzes, cursor = search.search_quizzes('algebra', cursor=cursor, page_size=3)
+            seen += [quiz.title for quiz in quizzes]
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(f'Algebra set {i}' for i in range(7)))
+
+    def test_index_follows_edits_and_deletes(self):
+        quiz = self.make_quiz('Optics')
+        question = make_question(quiz, question_text='Which lens focuses light?')
+        self.assertEqual(self.titles('lens'), ['Optics'])
+
+        question.question_text = 'Which mirror reflects light?'
+        question.save()
+        self.assertEqual(self.titles('lens'), [])
+        self.assertEqual(self.titles('mirror'), ['Optics'])
+
+        quiz.title = 'Light'
+        quiz.save()
+        self.assertEqual(self.titles('optics'), [])
+
+        quiz.delete()
+        self.assertEqual(self.titles('mirror'), [])
+        self.assertEqual(search.rebuild(), 0)
+
+    def test_bulk_import_is_indexed_and_search_page_renders(self):
+        lines = [
+            json.dumps({'type': 'quiz', 'title': 'Imported', 'difficulty': 'medium'}),
+            json.dumps({'type': 'question', 'question_text': 'Name a noble gas', 'options': ['Neon', 'Iron', 'Tin', 'Zinc'], 'correct_answer': 0}),
+        ]
+        import_quizzes(lines, self.teacher)
+
+        response = self.client.get(reverse('search'), {'q': 'noble gas', 'difficulty': 'medium'})
+        self.assertContains(response, 'Imported')
+        self.assertContains(response, '1 matching')
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.reset()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+
+    def test_requests_are_recorded_per_view_without_debug(self):
+        self.assertFalse(settings.DEBUG)
+        quiz = Quiz.objects.create(title='Timed', created_by=self.teacher)
+        make_question(quiz)
+        self.client.get(reverse('take_quiz', args=[quiz.id]))
+        self.client.get(reverse('take_quiz', args=[quiz.id]))
+        take_quiz = instrumentation.snapshot()['views']['take_quiz']
+        self.assertEqual(take_quiz['requests'], 2)
+        self.assertEqual(sum(take_quiz['duration_buckets']), 2)
+        self.assertGreater(take_quiz['queries'], 0)
+        # The rendered questions come from the cache the second time
+        self.assertGreater(take_quiz['cache_hits'], 0)
+        self.assertGreater(take_quiz['cache_misses'], 0)
+
+    def test_duplicate_and_n_plus_one_queries_are_flagged(self):
+        metrics = instrumentation.RequestMetrics()
+        for quiz_id in range(6):
+            metrics.add_query('SELECT * FROM quizapp_question WHERE quiz_id = %s', (quiz_id,), False, 0.001)
+        metrics.add_query('SELECT * FROM quizapp_question WHERE quiz_id = %s', (0,), False, 0.001)
+        self.assertEqual(metrics.duplicate_queries, 1)
+
+        with self.assertLogs('quizapp.instrumentation', 'WARNING'):
+            instrumentation.record_request('example', 200, metrics)
+        stats = instrumentation.snapshot()['views']['example']
+        self.assertEqual(stats['n_plus_one_requests'], 1)
+        self.assertEqual(list(stats['n_plus_one_samples'].values()), [7])
+
+    def test_ai_upstream_time_includes_parallel_chunks(self):
+        self.client.force_login(self.teacher)
+        model = FakeGenerativeModel()
+        generator = AIQuizGenerator(model=model)
+        with mock.patch.object(ai_views, 'get_ai_generator', return_value=generator):
+            self.client.post(
+                reverse('generate_ai_quiz'),
+                data=json.dumps({'topic': 'space', 'num_questions': 25}),
+                content_type='application/json',
+            )
+        stats = instrumentation.snapshot()['views']['generate_ai_quiz']
+        self.assertGreater(model.calls, 1)
+        self.assertEqual(stats['upstream_calls'], model.calls)
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_prometheus_endpoint_needs_staff_or_token(self):
+        self.client.get(reverse('home'))
+        self.assertEqual(self.client.get(reverse('prometheus_metrics')).status_code, 403)
+
+        response = self.client.get(reverse('prometheus_metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+        text = response.content.decode()
+        self.assertIn('# TYPE quizapp_request_duration_seconds histogram', text)
+        self.assertIn('quizapp_request_duration_seconds_bucket{view="home",le="+Inf"} 1', text)
+        self.assertIn('quizapp_request_db_queries_count{view="home"} 1', text)
+
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(reverse('request_metrics')).status_code, 302)
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def test_new_sqlite_connections_are_tuned(self):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        with tempfile.TemporaryDirectory() as workdir:
+            probe = DatabaseWrapper(
+                dict(connection.settings_dict, NAME=os.path.join(workdir, 'probe.sqlite3')), alias='probe',
+            )
+            try:
+                with probe.cursor() as cursor:
+                    pragmas = {}
+                    for pragma in ('journal_mode', 'busy_timeout', 'synchronous'):
+                        cursor.execute(f"PRAGMA {pragma}")
+                        pragmas[pragma] = cursor.fetchone()[0]
+            finally:
+                probe.close()
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'busy_timeout': 20000, 'synchronous': 1})
+        self.assertEqual(probe.transaction_mode, 'IMMEDIATE')
+
+
+REPLICA_PROBE = """
+import django, json
+django.setup()
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import setup_test_environment
+from quizapp.answer_keys import get_answer_key
+from quizapp.models import Quiz, Question
+from quizapp.routers import PIN_COOKIE
+
+setup_test_environment()
+call_command('migrate', verbosity=0)
+teacher = User.objects.create_user('teacher')
+student = User.objects.create_user('student')
+call_command('sync_replica', verbosity=0)
+
+quiz = Quiz.objects.create(title='Fresh quiz', created_by=teacher)
+question = Question.objects.create(quiz=quiz, question_text='Q?', option1='a', option2='b',
+                                   option3='c', option4='d', correct_option=1)
+results = {'home_before_sync': 'Fresh quiz' in Client().get('/').content.decode()}
+call_command('sync_replica', verbosity=0)
+results['home_after_sync'] = 'Fresh quiz' in Client().get('/').content.decode()
+
+# A replica page that fills the shared answer-key cache still reads the primary
+Question.objects.create(quiz=quiz, question_text='Q2?', option1='a', option2='b',
+                        option3='c', option4='d', correct_option=2)
+assert Client().get(f'/leaderboard/{quiz.id}/').status_code == 200
+results['cached_answer_key'] = len(get_answer_key(quiz.id))
+
+client = Client()
+client.force_login(student)
+session = client.get(f'/quiz/{quiz.id}/').context['session']
+response = client.post(f'/quiz/{quiz.id}/', {'session_id': session.id, f'question_{question.id}': '1'})
+results['pinned'] = PIN_COOKIE in response.cookies
+results['own_attempt_seen'] = len(client.get('/profile/').context['recent_attempts'])
+del client.cookies[PIN_COOKIE]
+results['unpinned_attempts_seen'] = len(client.get('/profile/').context['recent_attempts'])
+print(json.dumps(results))
+"""
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, model=Quiz, pinned=False, replica_reads=True, wrote=False):
+        state = routers._RoutingState(pinned)
+        state.replica_reads, state.wrote = replica_reads, wrote
+        token = routers._state.set(state)
+        try:
+            return routers.PrimaryReplicaRouter().db_for_read(model)
+        finally:
+            routers._state.reset(token)
+
+    @override_settings(REPLICA_DATABASE='replica')
+    def test_only_marked_reads_of_quiz_tables_use_the_replica(self):
+        self.assertEqual(self.route(), 'replica')
+        self.assertEqual(self.route(replica_reads=False), 'default')
+        self.assertEqual(self.route(model=User), 'default')
+        self.assertEqual(self.route(pinned=True), 'default')
+        self.assertEqual(self.route(wrote=True), 'default')
+        self.assertEqual(routers.PrimaryReplicaRouter().db_for_read(Quiz), 'default')
+
+    def test_two_sqlite_files_with_read_your_writes_pinning(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            result = subprocess.run(
+                [sys.executable, '-c', REPLICA_PROBE],
+                cwd=settings.BASE_DIR,
+                env={
+                    **os.environ,
+                    'DJANGO_SETTINGS_MODULE': 'quizproject.settings',
+                    'SQLITE_PATH': os.path.join(workdir, 'primary.sqlite3'),
+                    'SQLITE_REPLICA_PATH': os.path.join(workdir, 'replica.sqlite3'),
+                    # Not run by the test runner, so keep certificates out of var/
+                    'CERTIFICATE_RENDER_WORKERS': '0',
+                },
+                capture_output=True, text=True, check=True,
+            )
+        self.assertEqual(json.loads(result.stdout.splitlines()[-1]), {
+            # The replica lags until it is synced
+            'home_before_sync': False,
+            'home_after_sync': True,
+            'cached_answer_key': 2,
+            'pinned': True,
+            'own_attempt_seen': 1,
+            'unpinned_attempts_seen': 0,
+        })
 
-# Create your tests here.
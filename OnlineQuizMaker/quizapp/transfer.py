@@ -0,0 +1,262 @@
+"""
+Streaming import and export of quizzes as JSON Lines or CSV.
+
+JSON Lines: a {"type": "quiz", ...} line starts a quiz and the
+{"type": "question", ...} lines after it belong to it. Questions use the
+same shape as AI-generated ones (four "options", 0-based "correct_answer").
+
+CSV: one row per question, with the quiz columns repeated; consecutive
+rows with the same quiz_ref belong to one quiz. A quiz without questions
+is a single row with empty question columns.
+
+Both directions work row by row, so memory stays flat however large the
+question bank is.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from . import search, stats
+from .bulk import BULK_BATCH_SIZE, DIFFICULTIES, TITLE_MAX_LENGTH, PayloadError, question_from_ai
+from .fragments import bump_quiz_version
+from .models import Quiz, Question
+
+EXPORT_CHUNK_SIZE = 2000
+
+QUIZ_FIELDS = (
+    'title', 'description', 'difficulty', 'number_of_questions', 'time_limit', 'has_time_limit', 'question_bank',
+)
+CSV_COLUMNS = (
+    'quiz_ref', 'title', 'description', 'difficulty', 'number_of_questions', 'time_limit', 'has_time_limit',
+    'question_bank', 'question_text', 'option1', 'option2', 'option3', 'option4', 'correct_option', 'explanation',
+)
+FORMATS = ('jsonl', 'csv')
+
+# Accepted ranges of the numeric quiz fields
+NUMBER_OF_QUESTIONS_RANGE = (1, 1000)
+TIME_LIMIT_RANGE = (1, 24 * 60)  # minutes
+
+
+def _quiz_record(quiz):
+    return {field: getattr(quiz, field) for field in QUIZ_FIELDS}
+
+
+def _question_record(question):
+    return {
+        'question_text': question.question_text,
+        'options': [question.option1, question.option2, question.option3, question.option4],
+        'correct_answer': question.correct_option - 1,
+        'explanation': question.explanation or '',
+    }
+
+
+def iter_quizzes_with_questions(quizzes, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield (quiz, [questions...]) pairs for a quiz queryset.
+
+    Quizzes and questions are read with two chunked iterators merged on
+    quiz id, so neither queryset is materialized and there is no query
+    per quiz. Only one quiz's questions are held at a time.
+    """
+    quizzes = quizzes.order_by('id')
+    questions = iter(
+        Question.objects.filter(quiz__in=quizzes.values('id'))
+        .order_by('quiz_id', 'id')
+        .iterator(chunk_size=chunk_size)
+    )
+    pending = next(questions, None)
+    for quiz in quizzes.iterator(chunk_size=chunk_size):
+        quiz_questions = []
+        while pending is not None and pending.quiz_id == quiz.id:
+            quiz_questions.append(pending)
+            pending = next(questions, None)
+        yield quiz, quiz_questions
+
+
+def export_jsonl(quizzes, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield JSON Lines for the quizzes, one line at a time"""
+    for quiz, questions in iter_quizzes_with_questions(quizzes, chunk_size):
+        yield json.dumps({'type': 'quiz', **_quiz_record(quiz)}) + '\n'
+        for question in questions:
+            yield json.dumps({'type': 'question', **_question_record(question)}) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(quizzes, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield CSV lines for the quizzes, one line at a time"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for quiz, questions in iter_quizzes_with_questions(quizzes, chunk_size):
+        quiz_columns = [quiz.id] + [getattr(quiz, field) for field in QUIZ_FIELDS]
+        if not questions:
+            yield writer.writerow(quiz_columns + [''] * 7)
+        for question in questions:
+            yield writer.writerow(quiz_columns + [
+                question.question_text,
+                question.option1, question.option2, question.option3, question.option4,
+                question.correct_option,
+                question.explanation or '',
+            ])
+
+
+def export_quizzes(quizzes, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    if fmt == 'csv':
+        return export_csv(quizzes, chunk_size)
+    return export_jsonl(quizzes, chunk_size)
+
+
+def _quiz_from_record(record, user, line):
+    title = record.get('title')
+    if not isinstance(title, str) or not title.strip():
+        raise PayloadError(f"Line {line}: quiz 'title' is required")
+    difficulty = record.get('difficulty') or 'easy'
+    if difficulty not in DIFFICULTIES:
+        raise PayloadError(f"Line {line}: unknown difficulty '{difficulty}'")
+    try:
+        number_of_questions = int(_value_or(record.get('number_of_questions'), 15))
+        time_limit = int(_value_or(record.get('time_limit'), 10))
+    except (TypeError, ValueError):
+        raise PayloadError(f"Line {line}: numeric quiz fields must be integers")
+    for field, value, (low, high) in (
+        ('number_of_questions', number_of_questions, NUMBER_OF_QUESTIONS_RANGE),
+        ('time_limit', time_limit, TIME_LIMIT_RANGE),
+    ):
+        if not low <= value <= high:
+            raise PayloadError(f"Line {line}: quiz '{field}' must be between {low} and {high}")
+    return Quiz(
+        title=title[:TITLE_MAX_LENGTH],
+        description=record.get('description') or '',
+        difficulty=difficulty,
+        number_of_questions=number_of_questions,
+        time_limit=time_limit,
+        has_time_limit=_flag(record.get('has_time_limit')),
+        question_bank=_flag(record.get('question_bank')),
+        created_by=user,
+    )
+
+
+def _value_or(value, default):
+    """A missing field (absent in JSON, empty in CSV) takes the model default; 0 does not"""
+    return default if value in (None, '') else value
+
+
+def _flag(value):
+    """A boolean field from JSON (true) or CSV ('True', '1')"""
+    return str(value).lower() in ('true', '1')
+
+
+def _decoded(lines):
+    """Yield (line_number, text) with bytes decoded as UTF-8"""
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError:
+                raise PayloadError(f"Line {line_number}: not valid UTF-8 text")
+        yield line_number, line
+
+
+def _jsonl_records(lines):
+    """Yield (line_number, quiz_or_None, question_or_None) from JSON Lines"""
+    for line_number, line in _decoded(lines):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise PayloadError(f"Line {line_number}: invalid JSON ({e})")
+        if not isinstance(record, dict):
+            raise PayloadError(f"Line {line_number}: expected an object")
+        kind = record.get('type')
+        if kind == 'quiz':
+            yield line_number, record, None
+        elif kind == 'question':
+            yield line_number, None, record
+        else:
+            raise PayloadError(f"Line {line_number}: unknown record type '{kind}'")
+
+
+def _csv_records(lines):
+    """Yield (line_number, quiz_or_None, question_or_None) from CSV rows"""
+    if not isinstance(lines, io.TextIOBase):
+        lines = (line for _, line in _decoded(lines))
+    reader = csv.DictReader(lines)
+    try:
+        yield from _csv_rows(reader)
+    except csv.Error as e:
+        raise PayloadError(f"Line {reader.line_num}: invalid CSV ({e})")
+
+
+def _csv_rows(reader):
+    """Group DictReader rows into quiz and question records"""
+    current_ref = None
+    for row in reader:
+        line_number = reader.line_num
+        ref = row.get('quiz_ref') or row.get('title')
+        if ref != current_ref:
+            current_ref = ref
+            yield line_number, row, None
+        if (row.get('question_text') or '').strip():
+            try:
+                correct_answer = int(row.get('correct_option') or 0) - 1
+            except ValueError:
+                correct_answer = -1
+            yield line_number, None, {
+                'question_text': row['question_text'],
+                'options': [row.get('option1'), row.get('option2'), row.get('option3'), row.get('option4')],
+                'correct_answer': correct_answer,
+                'explanation': row.get('explanation') or '',
+            }
+
+
+def import_quizzes(lines, user, fmt='jsonl', batch_size=BULK_BATCH_SIZE):
+    """
+    Import quizzes from an iterable of lines, in one transaction.
+
+    Questions are buffered and written with bulk_create every batch_size
+    rows. Any invalid record aborts the whole import. Returns
+    (quizzes, questions) created.
+    """
+    records = _csv_records(lines) if fmt == 'csv' else _jsonl_records(lines)
+    quiz_count = question_count = 0
+    quiz = None
+    batch = []
+
+    def flush():
+        if batch:
+            Question.objects.bulk_create(batch, batch_size=batch_size)
+            # bulk_create sends no signals
+            stats.questions_added(quiz.id, len(batch))
+            bump_quiz_version(quiz.id)
+            search.index_questions(batch)
+            batch.clear()
+
+    with transaction.atomic():
+        for line_number, quiz_record, question_record in records:
+            if quiz_record is not None:
+                flush()
+                quiz = _quiz_from_record(quiz_record, user, line_number)
+                quiz.save()
+                quiz_count += 1
+                continue
+            if quiz is None:
+                raise PayloadError(f"Line {line_number}: question before any quiz")
+            try:
+                question = question_from_ai(question_record, question_count)
+            except PayloadError as e:
+                raise PayloadError(f"Line {line_number}: {e}")
+            question.quiz = quiz
+            batch.append(question)
+            question_count += 1
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    return quiz_count, question_count
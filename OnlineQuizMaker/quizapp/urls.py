@@ -1,24 +1,35 @@
 from django.urls import path
-from . import views
+from . import ai_views, certificate_views, views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('search/', views.search, name='search'),
     path('register/', views.register, name='register'),
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
     path('create-quiz/', views.create_quiz, name='create_quiz'),
     path('add-questions/<int:quiz_id>/', views.add_questions, name='add_questions'),
     path('quiz/<int:quiz_id>/', views.take_quiz, name='take_quiz'),
+    path('attempt/<uuid:session_id>/autosave/', views.autosave_attempt, name='autosave_attempt'),
     path('my-quizzes/', views.my_quizzes, name='my_quizzes'),
+    path('my-quizzes/<int:quiz_id>/item-stats/', views.item_stats, name='item_stats'),
+    path('my-quizzes/export/', views.export_my_quizzes, name='export_quizzes'),
+    path('my-quizzes/import/', views.import_my_quizzes, name='import_quizzes'),
     path('profile/', views.profile, name='profile'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('leaderboard/<int:quiz_id>/', views.leaderboard, name='quiz_leaderboard'),
+    path('metrics/cache/', views.cache_metrics, name='cache_metrics'),
+    path('metrics/requests/', views.request_metrics, name='request_metrics'),
+    path('metrics/prometheus/', views.prometheus_metrics, name='prometheus_metrics'),
     
     # AI Quiz Generator URLs
-    path('ai-quiz-generator/', views.ai_quiz_generator_page, name='ai_quiz_generator'),
-    path('generate-ai-quiz/', views.generate_ai_quiz, name='generate_ai_quiz'),
-    path('save-ai-quiz/', views.save_ai_quiz, name='save_ai_quiz'),
+    path('ai-quiz-generator/', ai_views.ai_quiz_generator_page, name='ai_quiz_generator'),
+    path('generate-ai-quiz/', ai_views.generate_ai_quiz, name='generate_ai_quiz'),
+    path('generate-ai-quiz/stream/', ai_views.stream_ai_quiz, name='stream_ai_quiz'),
+    path('save-ai-quiz/', ai_views.save_ai_quiz, name='save_ai_quiz'),
     path('delete-quiz/<int:quiz_id>/', views.delete_quiz, name='delete_quiz'),
-    path('certificate/<int:quiz_id>/', views.export_quiz_certificate, name='export_certificate'),
+    path('certificate/<int:quiz_id>/', certificate_views.export_quiz_certificate, name='export_certificate'),
+    path('certificate/<int:quiz_id>/cohort/', certificate_views.cohort_certificates, name='cohort_certificates'),
     # Remove or comment out these lines if they exist:
     # path('delete-quiz/<int:quiz_id>/', views.delete_quiz, name='delete_quiz'),
     # path('delete-question/<int:question_id>/', views.delete_question, name='delete_question'),
@@ -1,40 +1,59 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib import messages
 from django.contrib.auth.forms import UserCreationForm
-from django.contrib.auth.models import User
-from django.db.models import Avg, Count, Sum
-from django.http import JsonResponse
-import json
-from .models import Quiz, Question, QuizAttempt
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from .models import AttemptSession, ItemAnalysisState, Quiz, Question, QuizAttempt
 from .forms import QuizForm, QuestionForm
-from .ai_quiz_generator import ai_generator
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from django.http import HttpResponse
-import os
+from . import attempt_sessions, fragments, instrumentation
+from .answer_keys import get_answer_key, grade, grade_compact
+from .bulk import PayloadError, read_json_body
+from .catalog import get_catalog_page
+from .fragments import get_quiz_fragments
+from .certificates import prerender
+from .item_analysis import STATE_PK as ITEM_ANALYSIS_STATE_PK, quiz_item_stats
+from .leaderboard import global_leaders, quiz_leaders
+from .profiles import get_profile_stats, recent_attempts
+from .routers import replica_reads
+from .search import search_quizzes
+from .sampling import draw_question_ids, questions_per_attempt, restrict_answer_key, sign_draw, unsign_draw, uses_bank
+from .stats import get_site_stats
+from .transfer import FORMATS as TRANSFER_FORMATS, export_quizzes, import_quizzes
 
 
+@replica_reads
 def home(request):
-    quizzes = Quiz.objects.all()
-    # Enhanced statistics
-    total_quizzes = Quiz.objects.count()
-    total_questions = Question.objects.count()
-    total_attempts = QuizAttempt.objects.count()
-    total_users = User.objects.count()
-    active_quizzes = Quiz.objects.filter(question__isnull=False).distinct().count()
+    quizzes, next_cursor = get_catalog_page(request.GET.get('cursor'))
+    # Site-wide statistics, maintained incrementally by signals
+    site_stats = get_site_stats()
     
     return render(request, 'home.html', {
         'quizzes': quizzes,
-        'total_quizzes': total_quizzes,
-        'total_questions': total_questions,
-        'total_attempts': total_attempts,
-        'total_users': total_users,
-        'active_quizzes': active_quizzes,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        **site_stats,
+    })
+
+@replica_reads
+def search(request):
+    query = request.GET.get('q', '').strip()
+    difficulty = request.GET.get('difficulty', '')
+    if difficulty not in dict(Quiz.DIFFICULTY_CHOICES):
+        difficulty = ''
+    quizzes, next_cursor = search_quizzes(query, difficulty or None, request.GET.get('cursor'))
+    
+    return render(request, 'search.html', {
+        'query': query,
+        'difficulty': difficulty,
+        'difficulty_choices': Quiz.DIFFICULTY_CHOICES,
+        'quizzes': quizzes,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
     })
 
 def register(request):
@@ -94,30 +113,105 @@ def add_questions(request, quiz_id):
         'questions': questions
     })
 
+def _prerender_if_best(attempt, quiz, user, total):
+    if attempt is not None and settings.CERTIFICATE_PRERENDER and not QuizAttempt.objects.filter(
+        quiz=quiz, user=user, score__gt=attempt.score
+    ).exists():
+        # New best attempt: start on its certificate while the result page is read
+        prerender(attempt, quiz, user.username, total)
+
+def _user_session(request, quiz, session_id):
+    """The user's attempt session with this id, or None"""
+    try:
+        return AttemptSession.objects.get(pk=session_id, quiz=quiz, user=request.user)
+    except (AttemptSession.DoesNotExist, ValidationError, ValueError):
+        return None
+
 def take_quiz(request, quiz_id):
     quiz = get_object_or_404(Quiz, id=quiz_id)
-    questions = Question.objects.filter(quiz=quiz)
     
     if request.method == 'POST':
-        score = 0
-        for question in questions:
-            selected_option = request.POST.get(f'question_{question.id}')
-            if selected_option and int(selected_option) == question.correct_option:
-                score += 1
-        
+        # {question id: option} from the question_<id> radio buttons
+        posted = {
+            name[len('question_'):]: value
+            for name, value in request.POST.items() if name.startswith('question_')
+        }
         if request.user.is_authenticated:
-            attempt = QuizAttempt(quiz=quiz, user=request.user, score=score)
-            attempt.save()
+            # Recorded attempts are only graded through the server-side
+            # session, so the clock can't be skipped by leaving it out
+            session = _user_session(request, quiz, request.POST.get('session_id'))
+            if session is None:
+                messages.error(request, "That attempt could not be found, so it was not graded. Please try again.")
+                return redirect('take_quiz', quiz_id=quiz.id)
+            # Graded from the autosaved store; late answers don't count
+            try:
+                session, score, total = attempt_sessions.submit(session, posted)
+                _prerender_if_best(session.attempt, quiz, request.user, total)
+            except attempt_sessions.SessionClosed:
+                # Submitted twice: show the first result again
+                answer_key = restrict_answer_key(get_answer_key(quiz.id), session.question_ids)
+                score, total = grade_compact(answer_key, session.answers), len(answer_key)
+        else:
+            # Grade against the cached answer key, no question rows are loaded
+            answer_key = get_answer_key(quiz.id)
+            if uses_bank(quiz, answer_key):
+                # Only the questions drawn for this visitor, from the signed form field
+                drawn = unsign_draw(quiz, request.POST.get('draw'))
+                if not drawn:
+                    messages.error(request, "Those questions have expired, so the quiz was not graded. Here is a fresh set.")
+                    return redirect('take_quiz', quiz_id=quiz.id)
+                answer_key = restrict_answer_key(answer_key, drawn)
+            score, total = grade(answer_key, request.POST), len(answer_key)
         
         return render(request, 'quiz_result.html', {
             'quiz': quiz,
             'score': score,
-            'total': questions.count()
+            'total': total
         })
     
+    # The clock, saved answers and question draw live on the server, so a
+    # reload resumes the same attempt
+    session = draw = None
+    if request.user.is_authenticated:
+        session = attempt_sessions.start_session(quiz, request.user)
+        question_ids = session.question_ids
+    else:
+        question_ids = draw_question_ids(quiz)
+        if question_ids is not None:
+            draw = sign_draw(quiz.id, question_ids)
+    
+    # Question markup comes from the per-quiz fragment cache; the page
+    # around it (CSRF token, user menu) is rendered fresh
     return render(request, 'take_quiz.html', {
         'quiz': quiz,
-        'questions': questions
+        'fragments': get_quiz_fragments(quiz, question_ids),
+        'session': session,
+        'draw': draw,
+        'saved_answers': attempt_sessions.get_answers(session) if session else {},
+        'remaining_seconds': attempt_sessions.remaining_seconds(session) if session else None
+    })
+
+@login_required
+def autosave_attempt(request, session_id):
+    """Merge a few answers into a running attempt session"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST requests allowed'}, status=405)
+    session = AttemptSession.objects.filter(pk=session_id, user=request.user).first()
+    if session is None:
+        return JsonResponse({'error': 'Unknown attempt'}, status=404)
+    try:
+        data = read_json_body(request, settings.ATTEMPT_AUTOSAVE_MAX_BYTES)
+        if not isinstance(data, dict) or not isinstance(data.get('answers'), dict):
+            raise PayloadError("'answers' must be an object")
+        answers = attempt_sessions.autosave(session, data['answers'])
+    except PayloadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except attempt_sessions.SessionClosed:
+        return JsonResponse({'error': 'This attempt is over'}, status=410)
+    
+    return JsonResponse({
+        'saved': len(answers),
+        'remaining_seconds': attempt_sessions.remaining_seconds(session)
     })
 
 @login_required
@@ -125,6 +219,39 @@ def my_quizzes(request):
     quizzes = Quiz.objects.filter(created_by=request.user)
     return render(request, 'my_quizzes.html', {'quizzes': quizzes})
 
+@login_required
+def export_my_quizzes(request):
+    """Download the user's quizzes as JSON Lines or CSV, streamed row by row"""
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in TRANSFER_FORMATS:
+        fmt = 'jsonl'
+    quizzes = Quiz.objects.filter(created_by=request.user)
+    if request.GET.get('quiz'):
+        try:
+            quizzes = quizzes.filter(id=int(request.GET['quiz']))
+        except ValueError:
+            return HttpResponse("quiz must be a quiz id", status=400, content_type='text/plain')
+    
+    response = StreamingHttpResponse(
+        export_quizzes(quizzes, fmt),
+        content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    )
+    response['Content-Disposition'] = f'attachment; filename="quizzes_{request.user.username}.{fmt}"'
+    return response
+
+@login_required
+def import_my_quizzes(request):
+    """Import quizzes from an uploaded JSON Lines or CSV file"""
+    if request.method == 'POST' and request.FILES.get('file'):
+        upload = request.FILES['file']
+        fmt = 'csv' if upload.name.lower().endswith('.csv') else 'jsonl'
+        try:
+            quizzes, questions = import_quizzes(upload, request.user, fmt)
+            messages.success(request, f"Imported {quizzes} quizzes with {questions} questions.")
+        except PayloadError as e:
+            messages.error(request, f"Import failed, nothing was saved: {e}")
+    return redirect('my_quizzes')
+
 @login_required
 def delete_quiz(request, quiz_id):
     """Delete a quiz"""
@@ -133,221 +260,56 @@ def delete_quiz(request, quiz_id):
     return redirect('my_quizzes')
 
 @login_required
+@replica_reads
 def profile(request):
-    # Calculate user statistics
-    total_quizzes_taken = QuizAttempt.objects.filter(user=request.user).count()
-    total_quizzes_created = Quiz.objects.filter(created_by=request.user).count()
-    
-    # Calculate average score
-    attempts = QuizAttempt.objects.filter(user=request.user)
-    if attempts.exists():
-        average_score = attempts.aggregate(Avg('score'))['score__avg']
-    else:
-        average_score = 0
-    
-    recent_attempts = QuizAttempt.objects.filter(user=request.user).order_by('-attempted_at')[:5]
+    # Aggregated in one query and cached until the user's next attempt or quiz
+    profile_stats = get_profile_stats(request.user.id)
     
     return render(request, 'profile.html', {
-        'total_quizzes_taken': total_quizzes_taken,
-        'total_quizzes_created': total_quizzes_created,
-        'average_score': average_score,
-        'recent_attempts': recent_attempts,
+        **profile_stats,
+        'recent_attempts': recent_attempts(request.user.id),
     })
 
+@replica_reads
 def leaderboard(request, quiz_id=None):
     if quiz_id:
-        # Quiz-specific leaderboard
+        # Quiz-specific leaderboard, read from the maintained top-K table
         quiz = get_object_or_404(Quiz, id=quiz_id)
-        attempts = QuizAttempt.objects.filter(quiz=quiz).order_by('-score', 'attempted_at')[:10]
-        return render(request, 'quiz_leaderboard.html', {'quiz': quiz, 'attempts': attempts})
+        attempts = quiz_leaders(quiz)
+        return render(request, 'quiz_leaderboard.html', {
+            'quiz': quiz,
+            'attempts': attempts,
+            'total_questions': questions_per_attempt(quiz),
+        })
     else:
         # Global leaderboard - users with best average scores
-        from django.db.models import Avg, Count, Sum
-        
-        leaders = User.objects.annotate(
-            quiz_count=Count('quizattempt'),
-            avg_score=Avg('quizattempt__score'),
-            total_score=Sum('quizattempt__score')
-        ).filter(quiz_count__gt=0).order_by('-avg_score', '-quiz_count')[:20]
-        
+        leaders = global_leaders()
         return render(request, 'global_leaderboard.html', {'leaders': leaders})
 
-# AI QUIZ GENERATOR FUNCTIONS
-def ai_quiz_generator_page(request):
-    """Render AI quiz generator page"""
-    return render(request, 'ai_quiz_generator.html')
+@staff_member_required
+def cache_metrics(request):
+    """Hit ratios of this worker's caches, for staff"""
+    return JsonResponse({'take_quiz_fragments': fragments.metrics()})
 
-def generate_ai_quiz(request):
-    """API endpoint to generate quiz using AI"""
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            topic = data.get('topic', '').strip()
-            difficulty = data.get('difficulty', 'medium')
-            num_questions = int(data.get('num_questions', 5))
-            
-            print(f"🎯 VIEWS: Request received - {num_questions} questions about '{topic}'")
-            
-            if not topic:
-                return JsonResponse({'error': 'Topic is required'}, status=400)
-            
-            # Generate quiz using AI
-            ai_quiz = ai_generator.generate_quiz(topic, difficulty, num_questions)
-            
-            # Double-check we have the right number of questions
-            actual_questions = len(ai_quiz.get('questions', []))
-            print(f"✅ VIEWS: Sending {actual_questions} questions to frontend")
-            
-            return JsonResponse({
-                'success': True,
-                'quiz': ai_quiz,
-                'generated_questions': actual_questions,
-                'requested_questions': num_questions
-            })
-            
-        except Exception as e:
-            print(f"❌ VIEWS: Error: {e}")
-            return JsonResponse({'error': str(e)}, status=500)
-    
-    return JsonResponse({'error': 'Only POST requests allowed'}, status=405)
-def export_quiz_certificate(request, quiz_id):
-    """Generate PDF certificate for quiz completion"""
-    quiz = get_object_or_404(Quiz, id=quiz_id)
-    
-    # Get user's best attempt
-    attempt = QuizAttempt.objects.filter(
-        quiz=quiz, 
-        user=request.user
-    ).order_by('-score', '-attempted_at').first()
-    
-    if not attempt:
-        return redirect('quiz_result', quiz_id=quiz_id)
-    
-    # Create PDF response
-    response = HttpResponse(content_type='application/pdf')
-    filename = f"certificate_{quiz.title}_{request.user.username}.pdf"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(response, pagesize=A4, topMargin=0.5*inch)
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.darkblue,
-        spaceAfter=30,
-        alignment=1  # Center aligned
-    )
-    
-    content_style = ParagraphStyle(
-        'CustomContent',
-        parent=styles['BodyText'],
-        fontSize=14,
-        spaceAfter=12,
-        alignment=1  # Center aligned
-    )
-    
-    # Build PDF content
-    story = []
-    
-    # Title
-    story.append(Paragraph("🎓 Certificate of Achievement", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Decorative line
-    story.append(Paragraph("<hr width='80%' color='darkblue'/>", styles['BodyText']))
-    story.append(Spacer(1, 30))
-    
-    # User name
-    story.append(Paragraph(f"This certificate is proudly presented to", content_style))
-    story.append(Paragraph(f"<b><font size='18' color='darkblue'>{request.user.username}</font></b>", content_style))
-    story.append(Spacer(1, 20))
-    
-    # Achievement details
-    story.append(Paragraph(f"for successfully completing the quiz", content_style))
-    story.append(Paragraph(f"<b><font size='16' color='darkgreen'>'{quiz.title}'</font></b>", content_style))
-    story.append(Spacer(1, 20))
-    
-    # Score and performance
-    total_questions = quiz.question_set.count()
-    percentage = (attempt.score / total_questions) * 100
-    
-    story.append(Paragraph(f"with an outstanding score of", content_style))
-    story.append(Paragraph(f"<b><font size='16' color='red'>{attempt.score}/{total_questions}</font></b>", content_style))
-    story.append(Paragraph(f"({percentage:.1f}% Accuracy)", content_style))
-    story.append(Spacer(1, 20))
-    
-    # Performance rating
-    if percentage >= 90:
-        performance = "Excellent - Master Level! 🌟"
-    elif percentage >= 75:
-        performance = "Very Good - Advanced Level! 👍"
-    elif percentage >= 60:
-        performance = "Good - Proficient Level! ✅"
-    else:
-        performance = "Completed - Good Effort! 💪"
-    
-    story.append(Paragraph(f"Performance: <b>{performance}</b>", content_style))
-    story.append(Spacer(1, 30))
-    
-    # Quiz details
-    story.append(Paragraph(f"<b>Quiz Details:</b>", content_style))
-    story.append(Paragraph(f"Category: {quiz.difficulty.title() if quiz.difficulty else 'General'}", content_style))
-    story.append(Paragraph(f"Date Completed: {attempt.attempted_at.strftime('%B %d, %Y')}", content_style))
-    story.append(Paragraph(f"Time: {attempt.attempted_at.strftime('%I:%M %p')}", content_style))
-    story.append(Spacer(1, 30))
-    
-    # Footer
-    story.append(Paragraph("<hr width='80%' color='darkblue'/>", styles['BodyText']))
-    story.append(Spacer(1, 10))
-    story.append(Paragraph("Generated by QuizMaster - Your Learning Companion", 
-                          ParagraphStyle('Footer', parent=styles['BodyText'], fontSize=10, textColor=colors.gray)))
-    
-    # Build PDF
-    doc.build(story)
-    return response
-def save_ai_quiz(request):
-    """Save AI-generated quiz to database"""
-    if request.method == 'POST' and request.user.is_authenticated:
-        try:
-            data = json.loads(request.body)
-            quiz_data = data.get('quiz')
-            topic = data.get('topic', 'general knowledge')
-            difficulty = data.get('difficulty', 'medium')
-            
-            # Create quiz
-            quiz = Quiz(
-                title=quiz_data['quiz_title'],
-                description=f"AI-generated quiz about {topic}",
-                difficulty=difficulty,
-                created_by=request.user
-            )
-            quiz.save()
-            
-            # Create questions
-            for q_data in quiz_data['questions']:
-                question = Question(
-                    quiz=quiz,
-                    question_text=q_data['question_text'],
-                    option1=q_data['options'][0],
-                    option2=q_data['options'][1],
-                    option3=q_data['options'][2],
-                    option4=q_data['options'][3],
-                    correct_option=q_data['correct_answer'] + 1,  # Convert to 1-based
-                    explanation=q_data.get('explanation', '')
-                )
-                question.save()
-            
-            return JsonResponse({
-                'success': True,
-                'quiz_id': quiz.id,
-                'message': 'Quiz saved successfully!'
-            })
-            
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
-    
-    return JsonResponse({'error': 'Authentication required'}, status=401)
\ No newline at end of file
+@staff_member_required
+def request_metrics(request):
+    """Per-view latency, query and cache totals of this worker, for staff"""
+    return JsonResponse(instrumentation.snapshot())
+
+def prometheus_metrics(request):
+    """The request metrics for a Prometheus scraper (staff or METRICS_TOKEN)"""
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    authorized = bool(settings.METRICS_TOKEN) and constant_time_compare(token, settings.METRICS_TOKEN)
+    if not authorized and not (request.user.is_active and request.user.is_staff):
+        return HttpResponse("Forbidden", status=403, content_type='text/plain')
+    return HttpResponse(instrumentation.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@login_required
+def item_stats(request, quiz_id):
+    """Per-question difficulty, discrimination and distractors, for the quiz's creator"""
+    quiz = get_object_or_404(Quiz, id=quiz_id, created_by=request.user)
+    return render(request, 'item_stats.html', {
+        'quiz': quiz,
+        'item_stats': quiz_item_stats(quiz),
+        'analysis': ItemAnalysisState.objects.filter(pk=ITEM_ANALYSIS_STATE_PK).first(),
+    })
@@ -20,6 +20,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the whole stack is timed
+    'quizapp.instrumentation.InstrumentationMiddleware',
+    # Outside the session middleware, so session writes pin too
+    'quizapp.routers.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,13 +53,141 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'quizproject.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Database profile, picked with QUIZ_DATABASE: 'sqlite' (default) or 'postgres'
+QUIZ_DATABASE = os.getenv('QUIZ_DATABASE', 'sqlite')
+
+if QUIZ_DATABASE == 'postgres':
+    # Needs psycopg (pip install "psycopg[binary]")
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'quizmaker'),
+            'USER': os.getenv('POSTGRES_USER', 'quizmaker'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            # Keep connections open between requests, checking them before reuse
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so the busy
+                # timeout applies instead of failing on a lock upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
+
+# Optional read replica, used by the read-only views (quizapp.routers). To
+# try it locally, point SQLITE_REPLICA_PATH at a second SQLite file and copy
+# the primary into it with `manage.py sync_replica`
+if QUIZ_DATABASE == 'postgres' and os.getenv('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = dict(DATABASES['default'], HOST=os.getenv('POSTGRES_REPLICA_HOST'))
+elif QUIZ_DATABASE != 'postgres' and os.getenv('SQLITE_REPLICA_PATH'):
+    DATABASES['replica'] = dict(DATABASES['default'], NAME=os.getenv('SQLITE_REPLICA_PATH'))
+if 'replica' in DATABASES:
+    # Tests run both aliases against the one test database
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+REPLICA_PIN_SECONDS = 10  # reads stay on the primary this long after a client writes
+DATABASE_ROUTERS = ['quizapp.routers.PrimaryReplicaRouter']
+
+# Applied to every new SQLite connection (quizapp.database.configure_sqlite).
+# WAL lets readers run alongside the single writer; NORMAL sync is durable
+# across application crashes, and in WAL mode only risks the last
+# transactions on power loss
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 20000,  # milliseconds to wait for the write lock
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
 
+# Answer keys, quiz fragment versions, profile stats and autosaved answers
+# are invalidated by deleting cache keys, so every worker process must share
+# one cache: set REDIS_URL (needs the redis package). The LocMemCache
+# fallback is per process and only fits a single-process server;
+# `manage.py check --deploy` rejects it. Both count hits and misses per
+# request; for another backend, mix quizapp.instrumentation.CacheInstrumentation into it
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'quizapp.instrumentation.InstrumentedRedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'quizapp.instrumentation.InstrumentedLocMemCache',
+            'LOCATION': 'quizmaker',
+        }
+    }
+
+# QuizAttempt ingestion: 'direct' saves each attempt in the request,
+# 'batched' queues it and writes batches from a background thread
+QUIZ_ATTEMPT_INGESTION = os.getenv('QUIZ_ATTEMPT_INGESTION', 'direct')
+QUIZ_ATTEMPT_BATCH_SIZE = 200
+QUIZ_ATTEMPT_FLUSH_INTERVAL = 0.5  # seconds
+QUIZ_ATTEMPT_QUEUE_SIZE = 5000
+QUIZ_ATTEMPT_SPOOL_DIR = BASE_DIR / 'var' / 'attempt_spool'
+
+# Upper bound on concurrent Gemini calls per event loop (async generation)
+AI_MAX_CONCURRENT_CALLS = int(os.getenv('AI_MAX_CONCURRENT_CALLS', '4'))
+
+# Requests for more questions than AI_CHUNK_SIZE are generated in parallel chunks
+AI_CHUNK_SIZE = 10
+AI_CHUNK_WORKERS = 4
+AI_TOP_UP_ROUNDS = 2
+
+# Limits for saving an AI-generated quiz in one request
+AI_QUIZ_MAX_PAYLOAD_BYTES = 2 * 1024 * 1024
+AI_QUIZ_MAX_QUESTIONS = 500
+
+# Persistent cache of AI-generated quizzes
+AI_CACHE_ENABLED = True
+AI_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+AI_CACHE_MAX_ENTRIES = 1000
+AI_CACHE_SERVE_STALE = True  # serve expired entries while refreshing them
+
+# Server-side attempt sessions: answers autosaved to the cache are written
+# to the database in batches every flush interval; an autosave writes its
+# session through itself only once the database copy is older than the
+# write-through age (a worker died before flushing). Submissions this late
+# past the deadline are cut off
+ATTEMPT_AUTOSAVE_FLUSH_INTERVAL = 5  # seconds
+ATTEMPT_AUTOSAVE_WRITE_THROUGH_AGE = 6 * ATTEMPT_AUTOSAVE_FLUSH_INTERVAL  # seconds
+ATTEMPT_AUTOSAVE_MAX_BYTES = 16 * 1024
+ATTEMPT_SESSION_GRACE = 5  # seconds
+# How long an anonymous visitor's signed question draw is honoured on an
+# untimed bank quiz; timed quizzes use their time limit plus the grace
+QUESTION_DRAW_MAX_AGE = 6 * 60 * 60  # seconds
+
+# PDF certificates are rendered once on a process pool and kept on disk;
+# 0 workers renders them in the request instead
+CERTIFICATE_DIR = BASE_DIR / 'var' / 'certificates'
+CERTIFICATE_RENDER_WORKERS = int(os.getenv('CERTIFICATE_RENDER_WORKERS', '2'))
+CERTIFICATE_RENDER_TIMEOUT = 15  # seconds a download waits before answering 503
+CERTIFICATE_PRERENDER = True  # queue the certificate as soon as an attempt is saved
+
+# Tests write certificates to a temporary directory and skip pre-rendering
+TEST_RUNNER = 'quizapp.testing.QuizTestRunner'
+
+# Request instrumentation: a request running one query shape this many times
+# is flagged as a likely N+1. The metrics endpoints are for staff, or for a
+# scraper sending "Authorization: Bearer <METRICS_TOKEN>"
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 5
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',